@@ -1,6 +1,8 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import uvicorn
+import asyncio
 import tempfile
 import librosa
 import numpy as np
@@ -36,6 +38,69 @@ async def analyze(file: UploadFile = File(...)):
         traceback.print_exc()
         return {"error": str(e)}
 
+
+# 🎞️ Grabaciones largas: lectura por bloques y serie temporal por ventana.
+# Ruta síncrona a propósito: FastAPI la ejecuta en su threadpool y el
+# análisis (segundos en archivos de una hora) no bloquea el event loop.
+@app.post("/analyze/stream")
+def analyze_stream(file: UploadFile = File(...), window: float = Query(1.0, gt=0, le=3600)):
+    try:
+        from utils.audio_processing import analyze_audio_stream
+        return analyze_audio_stream(file, window)
+
+    except Exception as e:
+        import traceback
+        print("🔥 Error en /analyze/stream:", e)
+        traceback.print_exc()
+        return {"error": str(e)}
+
+
+# 📡 Monitoreo continuo: cada sensor abre un WebSocket y envía PCM mono
+# (mensajes binarios s16/f32 little-endian); cada `hop` segundos recibe el
+# análisis JSON de los últimos `window` segundos. El análisis corre en un
+# hilo (asyncio.to_thread): una ventana larga no frena a los demás sensores
+# ni a /analyze, y el await por mensaje conserva el orden de cada sesión.
+@app.websocket("/ws/monitor")
+async def monitor(
+    websocket: WebSocket,
+    sr: int = Query(22050, gt=0, le=384000),
+    format: str = Query("s16"),
+    window: float = Query(1.0, gt=0, le=60),
+    hop: float = Query(0.5, gt=0, le=60),
+):
+    from utils.monitor import MonitorSession
+
+    await websocket.accept()
+    try:
+        session = MonitorSession(sr, window, hop, format)
+    except ValueError as e:
+        await websocket.send_json({"error": str(e)})
+        await websocket.close(code=1003)
+        return
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is None:
+                await websocket.send_json({"error": "Se esperan mensajes binarios PCM"})
+                continue
+            result = await asyncio.to_thread(session.push, message["bytes"])
+            if result is not None:
+                await websocket.send_json(result)
+    except WebSocketDisconnect:
+        pass
+
+
+# 📦 Lotes: varios archivos y/o ZIP; decodificación y métricas en un pool de
+# procesos (BATCH_WORKERS). Responde NDJSON, una línea por archivo a medida
+# que termina, sin bloquear el event loop.
+@app.post("/analyze/batch")
+async def analyze_batch(files: list[UploadFile] = File(...)):
+    from utils.batch import analyze_many, iter_uploads, ndjson
+    return StreamingResponse(ndjson(analyze_many(iter_uploads(files))), media_type="application/x-ndjson")
+
 # 🚀 Punto de arranque
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,61 +1,194 @@
+import io
+import os
+import struct
+import tempfile
+
 import librosa
 import numpy as np
-import tempfile
-import os
+import soundfile as sf
 
+from utils.features import FeatureStream, extract_features
 
-async def analyze_audio(file):
-    with tempfile.NamedTemporaryFile(delete=False) as tmp:
-        tmp.write(await file.read())
-        tmp_path = tmp.name
 
+# 🎧 Decodificación en memoria
+# WAV PCM/float se lee directo del buffer subido (np.frombuffer, sin disco);
+# FLAC/OGG y demás formatos de libsndfile, vía soundfile sobre BytesIO. Solo
+# lo que ninguno de los dos entiende (mp3, m4a...) pasa por un archivo
+# temporal para librosa/audioread. Siempre: float32 mono, sr original
+# (igual que librosa.load(path, sr=None)).
+
+_WAV_PCM = 0x0001
+_WAV_FLOAT = 0x0003
+_WAV_EXTENSIBLE = 0xFFFE
+
+
+def _wav_chunks(buf: memoryview):
+    """Recorre los chunks RIFF: (id, contenido) sin copiar el buffer."""
+    pos = 12
+    while pos + 8 <= len(buf):
+        chunk_id = bytes(buf[pos:pos + 4])
+        size = int.from_bytes(buf[pos + 4:pos + 8], "little")
+        yield chunk_id, buf[pos + 8:pos + 8 + size]
+        pos += 8 + size + (size & 1)
+
+
+def _decode_wav(data) -> tuple[np.ndarray, int] | None:
+    """WAV PCM (8/16/24/32 bits) o float (32/64) desde memoria; None si no aplica."""
+    buf = memoryview(data)
+    if len(buf) < 12 or buf[:4] != b"RIFF" or buf[8:12] != b"WAVE":
+        return None
+
+    fmt = samples = None
+    for chunk_id, body in _wav_chunks(buf):
+        if chunk_id == b"fmt ":
+            fmt = body
+        elif chunk_id == b"data":
+            samples = body
+    if fmt is None or samples is None or len(fmt) < 16:
+        return None
+
+    tag, channels, sr, _, block, bits = struct.unpack_from("<HHIIHH", fmt)
+    if tag == _WAV_EXTENSIBLE and len(fmt) >= 26:
+        tag = struct.unpack_from("<H", fmt, 24)[0]  # primeros bytes del GUID de subformato
+    if not channels or not sr or not block or block % channels:
+        return None
+    width = block // channels
+
+    # Grabaciones cortadas: se descarta el último frame incompleto
+    samples = samples[:len(samples) - len(samples) % block]
+    if tag == _WAV_PCM and width == 1:
+        y = (np.frombuffer(samples, np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif tag == _WAV_PCM and width == 2:
+        y = np.frombuffer(samples, "<i2").astype(np.float32) / 32768.0
+    elif tag == _WAV_PCM and width == 3:
+        raw = np.frombuffer(samples, np.uint8).reshape(-1, 3).astype(np.int32)
+        # Se arma el entero de 24 bits en los bits altos para conservar el signo
+        y = ((raw[:, 0] << 8) | (raw[:, 1] << 16) | (raw[:, 2] << 24)).astype(np.float32) / 2.0**31
+    elif tag == _WAV_PCM and width == 4:
+        y = np.frombuffer(samples, "<i4").astype(np.float32) / 2.0**31
+    elif tag == _WAV_FLOAT and width == 4:
+        y = np.frombuffer(samples, "<f4").astype(np.float32)
+    elif tag == _WAV_FLOAT and width == 8:
+        y = np.frombuffer(samples, "<f8").astype(np.float32)
+    else:
+        return None
+
+    if channels > 1:
+        y = y.reshape(-1, channels).mean(axis=1)
+    return y, sr
+
+
+def _decode_soundfile(data) -> tuple[np.ndarray, int] | None:
     try:
-        # Cargar y normalizar
-        y, sr = librosa.load(tmp_path, sr=None)
-        y = librosa.util.normalize(y)
-
-        # FFT básica
-        spectrum = np.abs(np.fft.rfft(y))
-        freqs = np.fft.rfftfreq(len(y), 1 / sr)
-        dominant_freq = float(freqs[np.argmax(spectrum)])
-
-        # Métricas simples
-        rms = float(np.mean(librosa.feature.rms(y=y)))
-        snr = float(10 * np.log10(np.mean(y**2) /
-                    (np.mean((y - np.mean(y))**2) + 1e-10)))
-        flatness = float(np.mean(librosa.feature.spectral_flatness(y=y)))
-        crest = float(np.max(np.abs(y)) / np.sqrt(np.mean(y**2)))
-
-        # Energía por banda (dB)
-        bands = [0, 500, 1000, 4000, 8000, 12000]
-        band_levels = []
-        for i in range(len(bands) - 1):
-            idx = np.where((freqs >= bands[i]) & (freqs < bands[i + 1]))[0]
-            if len(idx) > 0:
-                energy = float(np.mean(spectrum[idx]))
-                band_levels.append(round(20 * np.log10(energy + 1e-6), 1))
-            else:
-                band_levels.append(-120.0)
-
-        # Regla simple de anomalía
-        anomaly = dominant_freq > 8500 or flatness > 0.3
-        estado = "Anómalo" if anomaly else "Normal"
-        mensaje = "⚠️ Vibración anómala detectada" if anomaly else "✅ Sin anomalías detectadas"
-        confianza = 85.0 if anomaly else 95.0
-
-        # Devolver resultado con solo tipos nativos de Python
-        return {
-            "rms_db": round(rms * 100, 1),
-            "dominant_freq_hz": int(dominant_freq),
-            "confidence_percent": float(confianza),
-            "status": estado,
-            "mensaje": mensaje,
-            "snr_db": round(snr, 2),
-            "flatness": round(flatness, 3),
-            "crest_factor": round(crest, 2),
-            "band_levels": [float(x) for x in band_levels],
-            "filename": file.filename,
-        }
+        y, sr = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+    except (sf.LibsndfileError, RuntimeError, TypeError):
+        return None
+    return (y.mean(axis=1) if y.shape[1] > 1 else y[:, 0]), sr
+
 
+def _decode_tempfile(data, filename: str | None) -> tuple[np.ndarray, int]:
+    # audioread/ffmpeg identifican el formato por la extensión
+    suffix = os.path.splitext(filename or "")[1]
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        tmp.write(data)
+        tmp_path = tmp.name
+    try:
+        return librosa.load(tmp_path, sr=None)
     finally:
         os.remove(tmp_path)
+
+
+def decode_audio(data, filename: str | None = None) -> tuple[np.ndarray, int]:
+    """Bytes de un archivo de audio -> (señal float32 mono, sample rate)."""
+    decoded = _decode_wav(data) or _decode_soundfile(data)
+    if decoded is None:
+        decoded = _decode_tempfile(data, filename)
+    return decoded
+
+
+# 🎞️ Grabaciones largas: lectura por bloques
+# soundfile.SoundFile sobre el archivo subido (UploadFile lo guarda en disco
+# pasado 1 MB) y FeatureStream: la memoria no crece con la duración. Los
+# formatos que libsndfile no lee (mp3, m4a...) se decodifican completos.
+STREAM_BLOCK = 65536  # muestras por bloque
+
+
+def stream_features(fileobj, filename: str | None = None, window_s: float = 1.0) -> tuple[dict, list[dict]]:
+    """Métricas globales y por ventana de un archivo, leído por bloques."""
+    fileobj.seek(0)
+    try:
+        sound = sf.SoundFile(fileobj)
+    except (sf.LibsndfileError, RuntimeError, TypeError):
+        fileobj.seek(0)
+        y, sr = decode_audio(fileobj.read(), filename)
+        stream = FeatureStream(sr, window_s)
+        stream.feed(y)
+        return stream.finish()
+
+    with sound:
+        stream = FeatureStream(sound.samplerate, window_s)
+        for block in sound.blocks(STREAM_BLOCK, dtype="float32", always_2d=True):
+            stream.feed(block.mean(axis=1) if block.shape[1] > 1 else block[:, 0])
+    return stream.finish()
+
+
+def analyze_audio_stream(file, window_s: float = 1.0) -> dict:
+    """Como analyze_audio, más la serie temporal `windows` (bandas y anomalía por ventana)."""
+    features, windows = stream_features(file.file, file.filename, window_s)
+    result = build_report(features, file.filename)
+    result["duration_s"] = round(features["duration_s"], 3)
+    result["window_s"] = window_s
+    result["windows"] = [{"start_s": w["start_s"], **window_report(w)} for w in windows]
+    return result
+
+
+async def analyze_audio(file):
+    y, sr = decode_audio(await file.read(), file.filename)
+    return build_report(extract_features(y, sr), file.filename)
+
+
+def is_anomaly(dominant_freq: float, flatness: float) -> bool:
+    # Regla simple de anomalía
+    return dominant_freq > 8500 or flatness > 0.3
+
+
+def band_fields(features: dict) -> dict:
+    # band_levels (rfft completa, /analyze) o band_levels_stft (análisis por bloques)
+    return {key: [float(x) for x in features[key]]
+            for key in ("band_levels", "band_levels_stft") if key in features}
+
+
+def window_report(features: dict) -> dict:
+    """Resumen compacto de una ventana (series de /analyze/stream y del monitor)."""
+    return {
+        "rms_db": round(features["rms"] * 100, 1),
+        "dominant_freq_hz": int(features["dominant_freq"]),
+        "flatness": round(features["flatness"], 3),
+        **band_fields(features),
+        "anomaly": is_anomaly(features["dominant_freq"], features["flatness"]),
+    }
+
+
+def build_report(features: dict, filename: str | None) -> dict:
+    """Métricas de features.extract_features -> respuesta JSON de /analyze."""
+    dominant_freq = features["dominant_freq"]
+    flatness = features["flatness"]
+
+    anomaly = is_anomaly(dominant_freq, flatness)
+    estado = "Anómalo" if anomaly else "Normal"
+    mensaje = "⚠️ Vibración anómala detectada" if anomaly else "✅ Sin anomalías detectadas"
+    confianza = 85.0 if anomaly else 95.0
+
+    # Devolver resultado con solo tipos nativos de Python
+    return {
+        "rms_db": round(features["rms"] * 100, 1),
+        "dominant_freq_hz": int(dominant_freq),
+        "confidence_percent": float(confianza),
+        "status": estado,
+        "mensaje": mensaje,
+        "snr_db": round(features["snr"], 2),
+        "flatness": round(flatness, 3),
+        "crest_factor": round(features["crest"], 2),
+        **band_fields(features),
+        "filename": filename,
+    }
@@ -0,0 +1,301 @@
+"""
+Análisis por lotes de AI-AudioSense: muchos archivos o un ZIP, en paralelo.
+
+La decodificación y el cálculo de métricas corren en un pool de procesos
+(BATCH_WORKERS, por defecto uno por núcleo); el event loop solo lee las
+entradas (en un hilo) y reparte el trabajo. Los resultados salen en el
+orden en que terminan, como NDJSON: una línea por archivo con el mismo
+JSON de /analyze más `index` (posición en el lote). Un archivo que falla
+produce una línea con `error` y el lote sigue.
+
+Nunca hay más de 2 × BATCH_WORKERS archivos en memoria a la vez, así que
+un ZIP con miles de grabaciones no se carga completo. Las entradas del ZIP
+que descomprimidas superan BATCH_MAX_ENTRY_BYTES (256 MB por defecto) se
+reportan con error sin leerlas.
+
+Uso como CLI (desde backend/):
+    python -m utils.batch grabaciones/*.wav planta.zip -o resultados.ndjson
+    python -m utils.batch grabaciones/ --workers 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", os.cpu_count() or 1))
+BATCH_MAX_ENTRY_BYTES = int(os.getenv("BATCH_MAX_ENTRY_BYTES", str(256 * 1024 * 1024)))
+AUDIO_EXTENSIONS = {".wav", ".flac", ".ogg", ".mp3", ".m4a", ".aif", ".aiff"}
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS)
+    return _pool
+
+
+def _reset_pool(broken: ProcessPoolExecutor) -> None:
+    # Un worker que muere (p. ej. un decodificador nativo que falla) rompe el
+    # pool entero. Solo se descarta si sigue siendo el actual: un futuro de un
+    # pool viejo que se resuelve tarde no debe tirar el que ya lo reemplazó.
+    global _pool
+    if _pool is broken:
+        _pool = None
+    broken.shutdown(wait=False)
+
+
+# ----------------------------------------------------------------------
+# 1️⃣ TRABAJO DE CADA PROCESO
+# ----------------------------------------------------------------------
+def analyze_bytes(data: bytes, filename: str) -> dict:
+    """Decodifica y analiza un archivo completo (se ejecuta en el pool)."""
+    from utils.audio_processing import build_report, decode_audio
+    from utils.features import extract_features
+
+    try:
+        y, sr = decode_audio(data, filename)
+        return build_report(extract_features(y, sr), filename)
+    except Exception as e:
+        return {"filename": filename, "error": str(e)}
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ ENTRADAS: ARCHIVOS, CARPETAS Y ZIP
+# ----------------------------------------------------------------------
+def is_audio(name: str) -> bool:
+    base = os.path.basename(name)
+    return not base.startswith(".") and os.path.splitext(base)[1].lower() in AUDIO_EXTENSIONS
+
+
+def iter_zip(fileobj, prefix: str):
+    """(nombre, bytes) de cada audio del ZIP, leídos de a uno."""
+    try:
+        zf = zipfile.ZipFile(fileobj)
+    except (zipfile.BadZipFile, OSError) as e:
+        yield prefix, e
+        return
+    with zf:
+        for info in zf.infolist():
+            if info.is_dir() or info.filename.startswith("__MACOSX/") or not is_audio(info.filename):
+                continue
+            name = f"{prefix}/{info.filename}"
+            # Tamaño declarado en el directorio central: se descarta antes de
+            # descomprimir (un ZIP pequeño puede expandirse a gigas)
+            if info.file_size > BATCH_MAX_ENTRY_BYTES:
+                yield name, ValueError(
+                    f"{info.file_size} bytes descomprimido, máximo {BATCH_MAX_ENTRY_BYTES}")
+                continue
+            try:
+                yield name, zf.read(info)
+            except (zipfile.BadZipFile, OSError, NotImplementedError, RuntimeError) as e:
+                yield name, e  # entrada corrupta, cifrada o con compresión no soportada
+
+
+def _read(path: str):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError as e:
+        return e
+
+
+def _is_seekable(fileobj) -> bool:
+    # En Python 3.10 SpooledTemporaryFile no implementa seekable()
+    try:
+        return fileobj.seekable()
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
+def _iter_upload_zip(fileobj, name: str):
+    # zipfile necesita un archivo con seekable(): si no lo es, se copia a
+    # un temporal en disco
+    if _is_seekable(fileobj):
+        yield from iter_zip(fileobj, name)
+        return
+    try:
+        tmp = tempfile.TemporaryFile()
+        shutil.copyfileobj(fileobj, tmp)
+        tmp.seek(0)
+    except (OSError, ValueError) as e:
+        yield name, e
+        return
+    with tmp:
+        yield from iter_zip(tmp, name)
+
+
+def iter_uploads(files):
+    """(nombre, bytes) de los UploadFile recibidos; los .zip se expanden."""
+    for upload in files:
+        name = upload.filename or "upload"
+        fileobj = upload.file
+        try:
+            fileobj.seek(0)
+        except (OSError, ValueError) as e:
+            yield name, e
+            continue
+        if name.lower().endswith(".zip"):
+            yield from _iter_upload_zip(fileobj, name)
+        else:
+            try:
+                yield name, fileobj.read()
+            except (OSError, ValueError) as e:
+                yield name, e
+
+
+def iter_paths(paths):
+    """(nombre, bytes) de archivos, carpetas (recursivas) y ZIP locales."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    if is_audio(name):
+                        full = os.path.join(root, name)
+                        yield full, _read(full)
+        elif path.lower().endswith(".zip"):
+            try:
+                f = open(path, "rb")
+            except OSError as e:
+                yield path, e
+                continue
+            with f:
+                yield from iter_zip(f, path)
+        else:
+            yield path, _read(path)
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ REPARTO
+# ----------------------------------------------------------------------
+def _submit(loop, data: bytes, name: str) -> tuple[asyncio.Future, ProcessPoolExecutor]:
+    pool = get_pool()
+    try:
+        return loop.run_in_executor(pool, analyze_bytes, data, name), pool
+    except (BrokenProcessPool, RuntimeError):
+        # Roto (o cerrado por otro lote) antes de que alguien lo reemplazara
+        _reset_pool(pool)
+        pool = get_pool()
+        return loop.run_in_executor(pool, analyze_bytes, data, name), pool
+
+
+async def analyze_many(items):
+    """
+    Resultados de cada (nombre, bytes) de `items`, a medida que terminan.
+
+    Si un worker muere, todos los archivos en vuelo en ese pool fallan con
+    BrokenProcessPool aunque solo uno lo haya provocado. Esos archivos se
+    reintentan una vez, de a uno, en un pool aislado de un solo proceso:
+    solo el que vuelve a tirar su worker se reporta con error.
+    """
+    loop = asyncio.get_running_loop()
+    items = iter(items)
+    limit = 2 * BATCH_WORKERS
+    pending: dict[asyncio.Future, tuple[int, str, bytes, ProcessPoolExecutor | None]] = {}
+    suspects: list[tuple[int, str, bytes]] = []
+    isolated: ProcessPoolExecutor | None = None
+    index, exhausted = 0, False
+
+    try:
+        while pending or suspects or not exhausted:
+            # La lectura (disco, ZIP) va a un hilo para no frenar el event loop
+            while not exhausted and len(pending) + len(suspects) < limit:
+                try:
+                    item = await loop.run_in_executor(None, next, items, None)
+                except Exception as e:
+                    item, exhausted = None, True
+                    yield {"index": index, "filename": None, "error": f"lectura interrumpida: {e}"}
+                if item is None:
+                    exhausted = True
+                    break
+                name, data = item
+                if isinstance(data, Exception):
+                    yield {"index": index, "filename": name, "error": f"no se pudo leer: {data}"}
+                else:
+                    future, pool = _submit(loop, data, name)
+                    pending[future] = (index, name, data, pool)
+                index += 1
+
+            # Reintentos, de a uno
+            if suspects and not any(pool is None for *_, pool in pending.values()):
+                i, name, data = suspects.pop(0)
+                if isolated is None:
+                    isolated = ProcessPoolExecutor(max_workers=1)
+                pending[loop.run_in_executor(isolated, analyze_bytes, data, name)] = (i, name, data, None)
+            if not pending:
+                continue
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                i, name, data, pool = pending.pop(future)
+                crashed = future.cancelled() or isinstance(future.exception(), BrokenProcessPool)
+                if crashed and pool is not None:
+                    _reset_pool(pool)
+                    suspects.append((i, name, data))
+                    continue
+                if crashed:
+                    isolated.shutdown(wait=False)
+                    isolated = None
+                    result = {"filename": name, "error": "el archivo hizo caer el proceso de análisis"}
+                elif future.exception() is not None:
+                    result = {"filename": name, "error": str(future.exception())}
+                else:
+                    result = future.result()
+                yield {"index": i, **result}
+    finally:
+        if isolated is not None:
+            isolated.shutdown(wait=False)
+
+
+async def ndjson(results):
+    async for result in results:
+        yield json.dumps(result, ensure_ascii=False) + "\n"
+
+
+# ----------------------------------------------------------------------
+# 4️⃣ CLI
+# ----------------------------------------------------------------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Análisis por lotes de AI-AudioSense (NDJSON)")
+    parser.add_argument("paths", nargs="+", help="archivos de audio, carpetas o .zip")
+    parser.add_argument("-o", "--output", help="archivo NDJSON de salida (por defecto stdout)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="procesos del pool")
+    return parser.parse_args(argv)
+
+
+async def _run(paths, out) -> tuple[int, int]:
+    total = failed = 0
+    async for result in analyze_many(iter_paths(paths)):
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        total += 1
+        failed += "error" in result
+    return total, failed
+
+
+def main(argv=None) -> int:
+    global BATCH_WORKERS
+    args = parse_args(argv)
+    BATCH_WORKERS = max(1, args.workers)
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        total, failed = asyncio.run(_run(args.paths, out))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if _pool is not None:
+            _pool.shutdown()
+    print(f"[batch] {total} archivos analizados, {failed} con error", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+"""
+Motor de características de AI-AudioSense.
+
+Los marcos son los de librosa por defecto (N_FFT = 2048 muestras, salto
+HOP = 512, centrados con relleno de ceros), así que de un mismo recorrido
+salen, sin volver a transformar la señal:
+
+- RMS por marco (dominio del tiempo, como librosa.feature.rms)
+- planitud espectral por marco (como librosa.feature.spectral_flatness)
+- espectro de magnitud promedio de la STFT: frecuencia dominante (pico con
+  interpolación parabólica) y `band_levels_stft` (rangos de bins
+  precalculados por sample rate)
+
+Los marcos se procesan en float32 (scipy.fft, dependencia de librosa) y en
+bloques de BLOCK_FRAMES: la memoria extra de la STFT es fija sea cual sea
+la duración del clip. `FeatureAccumulator` recibe bloques de marcos, de
+modo que el mismo cálculo sirve para una señal completa (`extract_features`)
+o para una que llega por partes (`FeatureStream`, grabaciones largas leídas
+por bloques).
+
+`dominant_freq` y `band_levels` de /analyze conservan su escala histórica:
+salen de la rfft de la señal completa (`full_spectrum`), cuyo nivel por
+banda depende de la duración del clip y de la fuga espectral, así que no
+equivale a ninguna calibración del promedio de la STFT. Esa rfft cuesta
+memoria y CPU proporcionales a la duración del clip, por lo que
+`extract_features` no es de memoria acotada; solo `FeatureStream` lo es, y
+por eso sus series, donde esa rfft no es posible, reportan
+`band_levels_stft`, un campo distinto.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import scipy.fft
+
+N_FFT = 2048
+HOP = 512
+BLOCK_FRAMES = 256
+AMIN = 1e-10  # piso de potencia de librosa.feature.spectral_flatness
+
+# Bandas reportadas en band_levels / band_levels_stft (Hz)
+BANDS = ((0, 500), (500, 1000), (1000, 4000), (4000, 8000), (8000, 12000))
+EMPTY_BAND_DB = -120.0
+
+# Hann periódica (scipy.signal.get_window("hann", N_FFT, fftbins=True))
+WINDOW = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(N_FFT) / N_FFT)).astype(np.float32)
+
+
+@lru_cache(maxsize=32)
+def band_slices(sr: int) -> tuple[slice | None, ...]:
+    """Rango de bins de la STFT de cada banda (None si la banda queda sobre Nyquist)."""
+    freqs = np.fft.rfftfreq(N_FFT, 1 / sr)
+    slices = []
+    for lo, hi in BANDS:
+        idx = np.flatnonzero((freqs >= lo) & (freqs < hi))
+        slices.append(slice(int(idx[0]), int(idx[-1]) + 1) if len(idx) else None)
+    return tuple(slices)
+
+
+def band_db(energy: list[float | None], scale: float = 1.0) -> list[float]:
+    """Nivel en dB de cada banda a partir de su magnitud media."""
+    return [EMPTY_BAND_DB if e is None else round(20 * np.log10(e * scale + 1e-6), 1) for e in energy]
+
+
+def frame_blocks(y: np.ndarray, block: int = BLOCK_FRAMES):
+    """Bloques (marcos × N_FFT) de la señal centrada; vistas sin copiar."""
+    padded = np.pad(y, N_FFT // 2)
+    frames = np.lib.stride_tricks.sliding_window_view(padded, N_FFT)[::HOP]
+    for start in range(0, len(frames), block):
+        yield frames[start:start + block]
+
+
+class FeatureAccumulator:
+    """Sumas por marco de una STFT; `result()` da las métricas agregadas."""
+
+    def __init__(self, sr: int):
+        self.sr = sr
+        self.frames = 0
+        self.rms_sum = 0.0
+        self.flatness_sum = 0.0
+        self.magnitude_sum = np.zeros(N_FFT // 2 + 1)
+
+    def add_frames(self, frames: np.ndarray) -> None:
+        if not len(frames):
+            return
+        self.frames += len(frames)
+        self.rms_sum += float(np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1)).sum())
+
+        magnitude = np.abs(scipy.fft.rfft(frames * WINDOW, axis=1))
+        self.magnitude_sum += magnitude.sum(axis=0, dtype=np.float64)
+        power = np.maximum(np.float32(AMIN), magnitude * magnitude)
+        gmean = np.exp(np.mean(np.log(power), axis=1, dtype=np.float64))
+        self.flatness_sum += float((gmean / np.mean(power, axis=1, dtype=np.float64)).sum())
+
+    def merge(self, other: "FeatureAccumulator") -> None:
+        self.frames += other.frames
+        self.rms_sum += other.rms_sum
+        self.flatness_sum += other.flatness_sum
+        self.magnitude_sum += other.magnitude_sum
+
+    def dominant_freq(self, magnitude: np.ndarray) -> float:
+        k = int(np.argmax(magnitude))
+        if 0 < k < len(magnitude) - 1:
+            # Vértice de la parábola por el pico y sus vecinos (log-magnitud)
+            a, b, c = np.log(magnitude[k - 1:k + 2] + 1e-12)
+            denom = a - 2 * b + c
+            if denom < 0:
+                k += 0.5 * (a - c) / denom
+        return float(k * self.sr / N_FFT)
+
+    def band_energy(self) -> list[float | None]:
+        """Magnitud media de cada banda (None si la banda queda sobre Nyquist)."""
+        magnitude = self.magnitude_sum / max(self.frames, 1)
+        return [None if band is None else float(np.mean(magnitude[band])) for band in band_slices(self.sr)]
+
+    def result(self, scale: float = 1.0) -> dict:
+        """Métricas agregadas; `scale` normaliza a posteriori las que dependen de la amplitud."""
+        n = max(self.frames, 1)
+        return {
+            "dominant_freq": self.dominant_freq(self.magnitude_sum / n),
+            "rms": self.rms_sum / n * scale,
+            "flatness": self.flatness_sum / n,
+            "band_levels_stft": band_db(self.band_energy(), scale),
+        }
+
+
+def _rfft_freq(k: int, n: int, sr: int) -> float:
+    # Misma aritmética que np.fft.rfftfreq(n, 1 / sr)[k]
+    return k * (1.0 / (n * (1 / sr)))
+
+
+@lru_cache(maxsize=256)
+def full_band_slices(n: int, sr: int) -> tuple[slice | None, ...]:
+    """Rango de bins de la rfft de n muestras de cada banda (None si queda vacía)."""
+    last = n // 2
+    slices = []
+    for lo, hi in BANDS:
+        # Estimación por división y ajuste con la misma comparación que la máscara freqs >= lo / < hi
+        start = min(max(0, int(lo * n / sr)), last + 1)
+        while start > 0 and _rfft_freq(start - 1, n, sr) >= lo:
+            start -= 1
+        while start <= last and _rfft_freq(start, n, sr) < lo:
+            start += 1
+        stop = min(max(start, int(hi * n / sr)), last + 1)
+        while stop > start and _rfft_freq(stop - 1, n, sr) >= hi:
+            stop -= 1
+        while stop <= last and _rfft_freq(stop, n, sr) < hi:
+            stop += 1
+        slices.append(slice(start, stop) if stop > start else None)
+    return tuple(slices)
+
+
+def full_spectrum(y: np.ndarray, sr: int) -> tuple[float, list[float]]:
+    """
+    Frecuencia dominante y band_levels de /analyze: rfft de toda la señal.
+    Memoria y CPU proporcionales a la duración del clip (una rfft); las
+    bandas son rangos de bins precalculados por (n, sr), sin máscaras.
+    """
+    if not len(y):
+        return 0.0, [EMPTY_BAND_DB] * len(BANDS)
+    spectrum = np.abs(np.fft.rfft(y))
+    band_levels = [EMPTY_BAND_DB if band is None else round(20 * np.log10(float(np.mean(spectrum[band])) + 1e-6), 1)
+                   for band in full_band_slices(len(y), sr)]
+    return float(_rfft_freq(int(np.argmax(spectrum)), len(y), sr)), band_levels
+
+
+def extract_features(y: np.ndarray, sr: int) -> dict:
+    """Métricas de una señal completa, normalizada a pico 1 (como librosa.util.normalize)."""
+    y = np.asarray(y, dtype=np.float32)
+    peak = float(np.max(np.abs(y))) if len(y) else 0.0
+    if peak >= np.finfo(np.float32).tiny:
+        y = y / np.float32(peak)
+
+    acc = FeatureAccumulator(sr)
+    for block in frame_blocks(y):
+        acc.add_frames(block)
+    features = acc.result()
+    del features["band_levels_stft"]
+    features["dominant_freq"], features["band_levels"] = full_spectrum(y, sr)
+
+    energy = float(np.mean(np.square(y, dtype=np.float64))) if len(y) else 0.0
+    mean = float(np.mean(y, dtype=np.float64)) if len(y) else 0.0
+    features["crest"] = float(np.max(np.abs(y)) / np.sqrt(energy)) if energy else 0.0
+    features["snr"] = float(10 * np.log10(energy / (energy - mean ** 2 + 1e-10))) if energy else 0.0
+    return features
+
+
+class FeatureStream:
+    """
+    Métricas de una señal que llega por bloques de cualquier tamaño
+    (p. ej. soundfile.blocks), con los mismos marcos que `extract_features`.
+
+    Entre bloques solo se guarda el resto de < N_FFT muestras que aún no
+    completa un marco. La normalización a pico 1 se aplica al final: RMS y
+    bandas son lineales en la amplitud, y planitud, frecuencia dominante y
+    cresta no dependen de ella. Además de las métricas globales se cierra un
+    resumen cada `window_s` segundos (la serie temporal).
+    """
+
+    def __init__(self, sr: int, window_s: float = 1.0):
+        self.sr = sr
+        self.window_frames = max(1, round(window_s * sr / HOP))
+        self.total = FeatureAccumulator(sr)
+        self.window = FeatureAccumulator(sr)
+        self.windows: list[dict] = []  # sin normalizar hasta finish()
+        self.pending = np.zeros(N_FFT // 2, dtype=np.float32)  # relleno inicial de center=True
+        self.samples = 0
+        self.peak = 0.0
+        self.sum = 0.0
+        self.sum_sq = 0.0
+
+    def feed(self, chunk: np.ndarray) -> None:
+        chunk = np.asarray(chunk, dtype=np.float32)
+        if not len(chunk):
+            return
+        self.samples += len(chunk)
+        self.peak = max(self.peak, float(np.max(np.abs(chunk))))
+        self.sum += float(np.sum(chunk, dtype=np.float64))
+        self.sum_sq += float(np.sum(np.square(chunk, dtype=np.float64)))
+        self._frame(chunk)
+
+    def _frame(self, chunk: np.ndarray) -> None:
+        buf = np.concatenate((self.pending, chunk))
+        n = (len(buf) - N_FFT) // HOP + 1 if len(buf) >= N_FFT else 0
+        frames = np.lib.stride_tricks.sliding_window_view(buf, N_FFT)[::HOP][:n] if n else buf[:0]
+        for start in range(0, n, BLOCK_FRAMES):
+            self._add(frames[start:start + BLOCK_FRAMES])
+        self.pending = buf[n * HOP:].copy()
+
+    def _add(self, frames: np.ndarray) -> None:
+        # Un bloque de marcos puede cruzar el límite de una ventana
+        while len(frames):
+            take = self.window_frames - self.window.frames
+            self.window.add_frames(frames[:take])
+            frames = frames[take:]
+            if self.window.frames == self.window_frames:
+                self._close_window()
+
+    def _close_window(self) -> None:
+        w = self.window
+        self.windows.append({
+            "start_s": round(len(self.windows) * self.window_frames * HOP / self.sr, 3),
+            "dominant_freq": w.dominant_freq(w.magnitude_sum / w.frames),
+            "rms": w.rms_sum / w.frames,
+            "flatness": w.flatness_sum / w.frames,
+            "band_energy": w.band_energy(),
+        })
+        self.total.merge(w)
+        self.window = FeatureAccumulator(self.sr)
+
+    def finish(self) -> tuple[dict, list[dict]]:
+        """(métricas globales como extract_features, una fila por ventana)."""
+        self._frame(np.zeros(N_FFT // 2, dtype=np.float32))  # relleno final de center=True
+        self.pending = self.pending[:0]
+        if self.window.frames:
+            self._close_window()
+
+        scale = 1 / self.peak if self.peak >= np.finfo(np.float32).tiny else 1.0
+        features = self.total.result(scale)
+        energy = self.sum_sq / self.samples * scale ** 2 if self.samples else 0.0
+        mean = self.sum / self.samples * scale if self.samples else 0.0
+        features["crest"] = float(self.peak * scale / np.sqrt(energy)) if energy else 0.0
+        features["snr"] = float(10 * np.log10(energy / (energy - mean ** 2 + 1e-10))) if energy else 0.0
+        features["duration_s"] = self.samples / self.sr
+
+        windows = [{
+            "start_s": w["start_s"],
+            "dominant_freq": w["dominant_freq"],
+            "rms": w["rms"] * scale,
+            "flatness": w["flatness"],
+            "band_levels_stft": band_db(w["band_energy"], scale),
+        } for w in self.windows]
+        return features, windows
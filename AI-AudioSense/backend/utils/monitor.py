@@ -0,0 +1,110 @@
+"""
+Monitoreo continuo de AI-AudioSense: PCM en vivo por WebSocket.
+
+Cada conexión (un sensor / una máquina) tiene su `MonitorSession`:
+
+- decodifica los mensajes binarios PCM mono little-endian (s16 o f32) y
+  guarda los bytes sueltos de una muestra partida entre mensajes
+- mantiene un buffer circular de `window` segundos (memoria fija)
+- cada `hop` segundos de audio nuevo analiza la ventana completa con el
+  mismo motor y la misma regla de anomalía que /analyze
+
+Latencia acotada: si llegan varios hops de golpe (sensor con atraso, red
+con ráfagas) solo se analiza la ventana más reciente y el resultado indica
+cuántas se omitieron, así el trabajo por mensaje nunca supera un análisis.
+El análisis corre fuera del event loop (ver /ws/monitor en main.py) y la
+ventana está limitada a MONITOR_MAX_WINDOW_SAMPLES muestras (por defecto
+10 s a 48 kHz, ~2 MB por conexión).
+"""
+
+import os
+import time
+
+import numpy as np
+
+from utils.audio_processing import window_report
+from utils.features import extract_features
+
+SAMPLE_FORMATS = {"s16": ("<i2", 1 / 32768.0), "f32": ("<f4", 1.0)}
+MAX_WINDOW_SAMPLES = int(os.getenv("MONITOR_MAX_WINDOW_SAMPLES", "480000"))
+
+
+class RingBuffer:
+    """Últimas `size` muestras de la señal."""
+
+    def __init__(self, size: int):
+        self.data = np.zeros(size, dtype=np.float32)
+        self.pos = 0
+        self.filled = 0
+
+    @property
+    def full(self) -> bool:
+        return self.filled == len(self.data)
+
+    def write(self, samples: np.ndarray) -> None:
+        size = len(self.data)
+        if len(samples) >= size:
+            self.data[:] = samples[-size:]
+            self.pos, self.filled = 0, size
+            return
+        head = min(len(samples), size - self.pos)
+        self.data[self.pos:self.pos + head] = samples[:head]
+        self.data[:len(samples) - head] = samples[head:]
+        self.pos = (self.pos + len(samples)) % size
+        self.filled = min(size, self.filled + len(samples))
+
+    def view(self) -> np.ndarray:
+        """Contenido en orden cronológico (copia)."""
+        if not self.full:
+            return self.data[:self.filled].copy()
+        return np.concatenate((self.data[self.pos:], self.data[:self.pos]))
+
+
+class MonitorSession:
+    def __init__(self, sr: int, window_s: float = 1.0, hop_s: float = 0.5, sample_format: str = "s16"):
+        if sample_format not in SAMPLE_FORMATS:
+            raise ValueError(f"Formato no soportado: {sample_format} (usar {', '.join(SAMPLE_FORMATS)})")
+        if sr <= 0 or window_s <= 0 or hop_s <= 0:
+            raise ValueError("sr, window y hop deben ser positivos")
+        if window_s * sr > MAX_WINDOW_SAMPLES:
+            raise ValueError(f"window × sr supera {MAX_WINDOW_SAMPLES} muestras; usar una ventana más corta")
+        self.sr = sr
+        self.dtype, self.gain = SAMPLE_FORMATS[sample_format]
+        self.width = np.dtype(self.dtype).itemsize
+        self.ring = RingBuffer(max(1, round(window_s * sr)))
+        self.hop = max(1, round(hop_s * sr))
+        self.remainder = b""
+        self.samples = 0
+        self.since_hop = 0
+
+    def decode(self, payload: bytes) -> np.ndarray:
+        data = self.remainder + payload if self.remainder else payload
+        usable = len(data) - len(data) % self.width
+        self.remainder = bytes(data[usable:])
+        return np.frombuffer(data, self.dtype, count=usable // self.width).astype(np.float32) * self.gain
+
+    def push(self, payload: bytes) -> dict | None:
+        """Agrega audio; devuelve el análisis si ya corresponde un nuevo hop."""
+        samples = self.decode(payload)
+        was_full = self.ring.full
+        self.ring.write(samples)
+        self.samples += len(samples)
+        if not self.ring.full:
+            return None
+        if was_full:
+            self.since_hop += len(samples)
+        else:
+            # Primera ventana completa: se analiza ya; solo cuenta lo que sobra
+            self.since_hop = self.hop + self.samples - len(self.ring.data)
+        if self.since_hop < self.hop:
+            return None
+
+        skipped = self.since_hop // self.hop - 1
+        self.since_hop %= self.hop
+        start = time.perf_counter()
+        result = window_report(extract_features(self.ring.view(), self.sr))
+        result["t_s"] = round(self.samples / self.sr, 3)
+        result["status"] = "Anómalo" if result["anomaly"] else "Normal"
+        result["skipped"] = skipped
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return result
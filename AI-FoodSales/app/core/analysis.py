@@ -0,0 +1,118 @@
+"""
+Análisis compartido de un mensaje AI-FoodSales.
+
+Cada mensaje se normaliza una sola vez y los detectores (catálogo,
+extractor multiproducto, escalamiento, intenciones, logística) reutilizan
+esas formas. Los resultados se calculan de forma perezosa, quedan
+memorizados en el objeto y se comparten entre chat.py y responses.py
+durante la misma petición. Cada etapa registra su duración en `timings`.
+"""
+
+import copy, time
+from contextlib import contextmanager
+from functools import cached_property, wraps
+
+from app.core import escalation
+from app.core.catalog import find_product_from_message, get_product_row, normalize_text
+from app.core.intent_rules import RULES, RuleMatch
+from app.core.nlp_rules import detect_cart_update, extract_products_and_quantities, strip_accents
+from app.utils import tracing
+from app.utils.metrics import STAGE_LATENCY
+
+
+def _stage(name: str):
+    """cached_property que además mide el tiempo de la primera evaluación."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(self):
+            with self.stage(name):
+                return fn(self)
+        return cached_property(wrapper)
+    return decorator
+
+
+class MessageAnalysis:
+    """Formas normalizadas y resultados de detectores para un mensaje."""
+
+    def __init__(self, message: str):
+        self.message = message
+        self.text = (message or "").lower().strip()
+        self.timings: dict[str, float] = {}
+
+    # --- Instrumentación ---
+    @contextmanager
+    def stage(self, name: str):
+        """Acumula en `timings[name]` los segundos que tarda el bloque."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            secs = time.perf_counter() - start
+            self.timings[name] = self.timings.get(name, 0.0) + secs
+            STAGE_LATENCY.observe(secs, name)
+            if tracing.enabled():
+                tracing.event("chat.stage", stage=name, dur_ms=round(secs * 1000, 3))
+
+    def server_timing(self) -> str:
+        """Cabecera HTTP Server-Timing con la duración de cada etapa (ms)."""
+        return ", ".join(f"{name};dur={secs * 1000:.3f}" for name, secs in self.timings.items())
+
+    # --- Formas normalizadas ---
+    @cached_property
+    def catalog_text(self) -> str:
+        """Forma usada por el catálogo (sin tildes, sin plurales simples)."""
+        return normalize_text(self.text)
+
+    @cached_property
+    def plain_text(self) -> str:
+        """Minúsculas y sin tildes, para el extractor multiproducto."""
+        return strip_accents(self.text)
+
+    @cached_property
+    def escalation_text(self) -> str:
+        """Forma usada por el motor de escalamiento (glosario + correcciones)."""
+        return escalation.normalize(self.text)
+
+    # --- Detectores ---
+    @_stage("product")
+    def product(self) -> str | None:
+        return find_product_from_message(self.text, normalized=self.catalog_text)
+
+    @cached_property
+    def product_row(self) -> dict | None:
+        return get_product_row(self.product) if self.product else None
+
+    @_stage("items")
+    def items(self) -> list[dict]:
+        return extract_products_and_quantities(self.text, normalized=self.plain_text)
+
+    @cached_property
+    def cart_update(self) -> tuple[str, int] | None:
+        """("add" | "remove", cantidad) para ajustes relativos del carrito."""
+        return detect_cart_update(self.text)
+
+    @_stage("escalation")
+    def _escalation(self) -> dict:
+        return escalation.should_escalate(self.text, normalized=self.escalation_text)
+
+    def escalation(self) -> dict:
+        """Resultado de should_escalate; copia propia porque el flujo lo modifica."""
+        return copy.deepcopy(self._escalation)
+
+    @_stage("rules")
+    def rules(self) -> RuleMatch:
+        """Intenciones, subtipo logístico y ciudad en una sola pasada de la tabla de reglas."""
+        return RULES.scan(self.text)
+
+    @property
+    def intents(self) -> dict:
+        """FAQ / descuento / escalamiento por palabras clave (solo lectura)."""
+        return self.rules.additional
+
+    @property
+    def logistics(self) -> tuple[bool, dict]:
+        return self.rules.logistics
+
+    @property
+    def purchase_intent(self) -> str:
+        return self.rules.purchase_intent
@@ -1,28 +1,22 @@
-import csv, difflib, json, os, re, unicodedata
+import difflib, heapq, os, re, unicodedata
+from collections import Counter
+from functools import lru_cache
 
-CATALOG_FILE = os.path.join(os.path.dirname(__file__), "../data/Catalog.csv")
-SYNONYMS_FILE = os.path.join(os.path.dirname(__file__), "../data/synonyms.json")
+from app.core.catalog_store import CATALOG_FILE, SYNONYMS_FILE, STORE, load_catalog
+from app.utils import tracing
+
+# Etapa difusa: "difflib" (SequenceMatcher) o "tfidf" (trigramas con numpy)
+CATALOG_MATCHER = os.getenv("CATALOG_MATCHER", "difflib").lower()
+# Tope de nombres que cada búsqueda difusa evalúa con SequenceMatcher
+CATALOG_FUZZY_CANDIDATES = int(os.getenv("CATALOG_FUZZY_CANDIDATES", "16"))
 
 # ----------------------------------------------------------------------
 # 1️⃣ CARGA DEL CATÁLOGO Y SINÓNIMOS
 # ----------------------------------------------------------------------
-def load_catalog():
-    """Carga el CSV del catálogo detectando codificación automáticamente."""
-    for enc in ("utf-8-sig", "latin-1"):
-        try:
-            with open(CATALOG_FILE, encoding=enc) as f:
-                return list(csv.DictReader(f))
-        except UnicodeDecodeError:
-            continue
-    raise RuntimeError("No se pudo leer el catálogo con las codificaciones conocidas.")
-
-CATALOG = load_catalog()
-
-if os.path.exists(SYNONYMS_FILE):
-    with open(SYNONYMS_FILE, encoding="utf-8-sig") as f:
-        SYNONYMS = json.load(f)
-else:
-    SYNONYMS = {}
+# El snapshot vigente vive en catalog_store.STORE; estos nombres se
+# mantienen como atajo y se actualizan en cada recarga en caliente.
+CATALOG = STORE.current().catalog
+SYNONYMS = STORE.current().synonyms
 
 # ----------------------------------------------------------------------
 # 2️⃣ NORMALIZACIÓN DE TEXTO
@@ -41,64 +35,292 @@ def normalize_text(text: str) -> str:
 def similarity(a, b):
     return difflib.SequenceMatcher(None, a, b).ratio()
 
-def find_product_from_message(message: str) -> str | None:
+def _quick_bound(a_len: int, a_chars: Counter, b_len: int, b_chars: Counter) -> float:
+    """Cota superior de SequenceMatcher.ratio() (equivale a quick_ratio)."""
+    total = a_len + b_len
+    if not total:
+        return 1.0
+    if len(a_chars) > len(b_chars):
+        a_chars, b_chars = b_chars, a_chars
+    # Igual que sum((a_chars & b_chars).values()) sin armar el Counter intermedio
+    matches = sum(min(n, b_chars[c]) for c, n in a_chars.items() if c in b_chars)
+    return 2.0 * matches / total
+
+
+class CatalogIndex:
+    """
+    Índice de búsqueda del catálogo, construido una sola vez al cargar.
+
+    Precalcula nombres normalizados, postings token → sinónimo y n-gramas de
+    caracteres → nombre, de modo que cada consulta solo evalúa con
+    SequenceMatcher los candidatos plausibles. Los resultados son idénticos a
+    los del recorrido lineal original (mismo orden de prioridad y desempates)
+    mientras una búsqueda no supere CATALOG_FUZZY_CANDIDATES candidatos; por
+    encima se evalúan solo los más prometedores (ver best_partial y
+    close_match), para que el costo por consulta no crezca con el catálogo.
+    """
+
+    NGRAM = 3
+    PARTIAL_SCAN = 256  # ids que best_partial recorre para armar el ranking
+
+    def __init__(self, catalog: list[dict], synonyms: dict):
+        self.catalog = catalog
+        self.synonyms = synonyms
+
+        # Nombres normalizados únicos → primera fila del catálogo que los usa
+        self.names: list[str] = []
+        self.first_row: list[int] = []
+        self.name_ids: dict[str, int] = {}
+        for pos, row in enumerate(catalog):
+            name = normalize_text(row["nombre"])
+            if name not in self.name_ids:
+                self.name_ids[name] = len(self.names)
+                self.names.append(name)
+                self.first_row.append(pos)
+        self.name_chars = [Counter(n) for n in self.names]
+
+        # n-gramas de caracteres (1..NGRAM) → ids de nombre que los contienen
+        self.ngrams: dict[str, set[int]] = {}
+        for nid, name in enumerate(self.names):
+            for size in range(1, self.NGRAM + 1):
+                for i in range(len(name) - size + 1):
+                    self.ngrams.setdefault(name[i:i + size], set()).add(nid)
+
+        # Nombres agrupados por longitud (filtro previo de la búsqueda difusa)
+        self.by_length: dict[int, list[int]] = {}
+        for nid, name in enumerate(self.names):
+            self.by_length.setdefault(len(name), []).append(nid)
+
+        # Sinónimos: patrón precompilado y posting por primer token
+        self.synonym_keys = list(synonyms)
+        self.synonym_postings: dict[str, list[tuple[int, re.Pattern]]] = {}
+        self.synonym_always: list[tuple[int, re.Pattern]] = []
+        for order, key in enumerate(self.synonym_keys):
+            for variant in synonyms[key]:
+                norm_variant = normalize_text(variant)
+                # Ignorar palabras demasiado cortas para evitar falsos positivos
+                if len(norm_variant) <= 2:
+                    continue
+                entry = (order, re.compile(rf"\b{re.escape(norm_variant)}\b"))
+                head = norm_variant.split()
+                if head and norm_variant[0].isalnum():
+                    self.synonym_postings.setdefault(head[0], []).append(entry)
+                else:
+                    self.synonym_always.append(entry)
+
+        self.close_match = lru_cache(maxsize=4096)(self._close_match)
+        self.substring_candidates = lru_cache(maxsize=4096)(self._substring_candidates)
+        self.leading_candidates = lru_cache(maxsize=256)(self._leading_candidates)
+
+    # ------------------------------------------------------------------
+    def match_synonym(self, msg: str, words: list[str]) -> str | None:
+        """Primer sinónimo (en orden de synonyms.json) presente como palabra completa."""
+        candidates = list(self.synonym_always)
+        for w in set(words):
+            candidates.extend(self.synonym_postings.get(w, ()))
+        for order, pattern in sorted(candidates, key=lambda c: c[0]):
+            if pattern.search(msg):
+                return self.synonym_keys[order]
+        return None
+
+    def _substring_candidates(self, word: str) -> frozenset[int]:
+        """Ids de nombres que contienen `word` o están contenidos en él."""
+        contained = set()
+        for i in range(len(word)):
+            for j in range(i + 1, len(word) + 1):
+                nid = self.name_ids.get(word[i:j])
+                if nid is not None:
+                    contained.add(nid)
+        if len(word) <= self.NGRAM:
+            # Una sola copia del posting: con catálogos grandes tiene miles de ids
+            return frozenset(self.ngrams.get(word, ())).union(contained)
+        grams = [word[i:i + self.NGRAM] for i in range(len(word) - self.NGRAM + 1)]
+        postings = sorted((self.ngrams.get(g, set()) for g in grams), key=len)
+        found = {nid for nid in set.intersection(*postings) if word in self.names[nid]}
+        return frozenset(found | contained)
+
+    def _close_match(self, word: str, cutoff: float) -> int | None:
+        """
+        Equivalente a difflib.get_close_matches(word, nombres, n=1, cutoff).
+        Si más de CATALOG_FUZZY_CANDIDATES nombres pasan el filtro de longitud,
+        solo se evalúan los que comparten más trigramas con `word`.
+        """
+        lw = len(word)
+        lengths = [ln for ln in self.by_length if not (ln + lw and 2.0 * min(ln, lw) / (ln + lw) < cutoff)]
+        if sum(len(self.by_length[ln]) for ln in lengths) > CATALOG_FUZZY_CANDIDATES:
+            ids = self.shared_ngram_candidates(word, set(lengths))
+        else:
+            ids = [nid for ln in lengths for nid in self.by_length[ln]]
+        word_chars = Counter(word)
+        best: tuple[float, str] | None = None
+        best_id = None
+        for nid in ids:
+            name = self.names[nid]
+            if _quick_bound(len(name), self.name_chars[nid], lw, word_chars) < cutoff:
+                continue
+            score = difflib.SequenceMatcher(None, name, word).ratio()
+            if score >= cutoff and (best is None or (score, name) > best):
+                best, best_id = (score, name), nid
+        return best_id
+
+    def shared_ngram_candidates(self, word: str, lengths: set[int]) -> list[int]:
+        """
+        Los CATALOG_FUZZY_CANDIDATES nombres (con longitud en `lengths`) que
+        comparten más trigramas con `word`; desempate: longitud más parecida.
+        """
+        grams = {word[i:i + self.NGRAM] for i in range(max(1, len(word) - self.NGRAM + 1))}
+        shared = Counter()
+        for g in grams:
+            shared.update(self.ngrams.get(g, ()))
+        lw = len(word)
+        names = self.names
+        return [nid for *_, nid in heapq.nsmallest(
+            CATALOG_FUZZY_CANDIDATES,
+            ((-n, abs(len(names[nid]) - lw), nid) for nid, n in shared.items() if len(names[nid]) in lengths))]
+
+    # ------------------------------------------------------------------
+    def best_partial(self, msg: str, words: list[str], floor: float) -> tuple[int | None, float]:
+        """
+        Prioridad 2: nombres que contienen una palabra del mensaje (o viceversa).
+
+        En catálogos grandes una palabra corta ("el", "de") aparece en miles
+        de nombres, así que solo se evalúan los CATALOG_FUZZY_CANDIDATES que
+        más caracteres del mensaje cubren (desempate: orden del catálogo). Las
+        palabras más selectivas arman el ranking; las que superan PARTIAL_SCAN
+        ids solo suman a los candidatos ya vistos. Los evaluados van de mayor
+        a menor cota superior y se corta en cuanto la cota no alcanza al mejor.
+        """
+        postings = sorted({w: self.substring_candidates(w) for w in words}.items(), key=lambda p: len(p[1]))
+        coverage: dict[int, int] = {}
+        scanned = 0
+        for w, ids in postings:
+            if not ids:
+                continue
+            lw = len(w)
+            if coverage and scanned + len(ids) > self.PARTIAL_SCAN:
+                for nid in ids.intersection(coverage):
+                    coverage[nid] += lw
+                continue
+            if len(ids) > self.PARTIAL_SCAN:
+                ids = self.leading_candidates(w)
+            scanned += len(ids)
+            for nid in ids:
+                coverage[nid] = coverage.get(nid, 0) + lw
+
+        # Los ids siguen el orden del catálogo: desempatar por id es por fila
+        candidates = coverage
+        if len(coverage) > CATALOG_FUZZY_CANDIDATES:
+            candidates = [nid for _, nid in heapq.nsmallest(
+                CATALOG_FUZZY_CANDIDATES, ((-cov, nid) for nid, cov in coverage.items()))]
+        lm = len(msg)
+        msg_chars = Counter(msg)
+        ranked = []
+        for nid in candidates:
+            bound = _quick_bound(lm, msg_chars, len(self.names[nid]), self.name_chars[nid])
+            if bound >= floor:
+                ranked.append((-bound, self.first_row[nid], nid))
+        ranked.sort()
+
+        # Mismo resultado que recorrer en orden del catálogo: mayor puntaje,
+        # y ante empate la primera fila
+        best_id, best_score, best_row = None, 0.0, 0
+        for neg_bound, row, nid in ranked:
+            if -neg_bound < best_score:
+                break
+            score = similarity(msg, self.names[nid])
+            if score > best_score or (score == best_score and best_id is not None and row < best_row):
+                best_id, best_score, best_row = nid, score, row
+        return best_id, best_score
+
+    def _leading_candidates(self, word: str) -> tuple[int, ...]:
+        """Los primeros PARTIAL_SCAN (orden del catálogo) de substring_candidates(word)."""
+        ids = self.substring_candidates(word)
+        return tuple(heapq.nsmallest(self.PARTIAL_SCAN, ids))
+
+    def row_for(self, nid: int) -> dict:
+        return self.catalog[self.first_row[nid]]
+
+    def get_row(self, product_name: str) -> dict | None:
+        normalized = normalize_text(product_name)
+        nid = self.name_ids.get(normalized)
+        if nid is None:
+            # Buscar coincidencia cercana si no hay exacta
+            nid = self.close_match(normalized, 0.4)
+        return self.row_for(nid) if nid is not None else None
+
+
+def _build_index(snap) -> CatalogIndex:
+    return CatalogIndex(snap.catalog, snap.synonyms)
+
+
+def current_index() -> CatalogIndex:
+    """Índice del snapshot vigente (se construye una vez por versión)."""
+    return STORE.current().artifact("catalog_index", _build_index)
+
+
+def _on_snapshot(snap) -> None:
+    global CATALOG, SYNONYMS
+    CATALOG, SYNONYMS = snap.catalog, snap.synonyms
+    # Tras una recarga el índice se compila aquí (hilo vigilante), no en la petición
+    snap.artifact("catalog_index", _build_index)
+
+
+# Al importar no se construye nada: current_index() lo hace en el primer uso
+# o en el calentamiento de arranque (app.main.warmup)
+STORE.subscribe(_on_snapshot)
+
+if CATALOG_MATCHER == "tfidf":
+    from app.core.ngram_matcher import current_matcher  # requiere numpy
+elif CATALOG_MATCHER != "difflib":
+    raise ValueError(f"CATALOG_MATCHER desconocido: {CATALOG_MATCHER}")
+
+
+def find_product_from_message(message: str, normalized: str | None = None) -> str | None:
     """
     Busca el producto más probable en el catálogo.
     Incluye coincidencia difusa, sinónimos y control de umbral.
+    `normalized` permite reutilizar normalize_text(message) ya calculado.
     """
-    print("✅ EJECUTANDO VERSION CORRECTA DE catalog.py")
-
-    msg = normalize_text(message)
+    index = current_index()
+    msg = normalized if normalized is not None else normalize_text(message)
     words = msg.split()
-    best_match = None
-    best_score = 0.0
 
     # 🔹 Prioridad 1: sinónimos (si existe synonyms.json)
-    for key, variants in SYNONYMS.items():
-        for variant in variants:
-            norm_variant = normalize_text(variant)
-            # Ignorar palabras demasiado cortas para evitar falsos positivos
-            if len(norm_variant) <= 2:
-                continue
-            if re.search(rf"\b{re.escape(norm_variant)}\b", msg):
-                print(f"[DEBUG] Coincidencia exacta por sinónimo: {key}")
-                return key
+    key = index.match_synonym(msg, words)
+    if key:
+        tracing.event("catalog.match", rule="synonym", product=key)
+        return key
 
+    if CATALOG_MATCHER == "tfidf":
+        # 🔹 Prioridades 2 y 3 en un solo paso: mensaje contra todo el catálogo
+        best_id, best_score = current_matcher().best(msg)
+    else:
+        # 🔹 Prioridad 2: coincidencia directa o parcial
+        best_id, best_score = index.best_partial(msg, words, floor=0.65)
 
-    # 🔹 Prioridad 2: coincidencia directa o parcial
-    for row in CATALOG:
-        name = normalize_text(row["nombre"])
+        # 🔹 Prioridad 3: coincidencia difusa más general
         for w in words:
-            if w in name or name in w:
-                score = similarity(msg, name)
+            nid = index.close_match(w, 0.65)
+            if nid is not None:
+                score = similarity(msg, index.names[nid])
                 if score > best_score:
-                    best_match, best_score = row["nombre"], score
-
-    # 🔹 Prioridad 3: coincidencia difusa más general
-    all_names = [normalize_text(r["nombre"]) for r in CATALOG]
-    for w in words:
-        matches = difflib.get_close_matches(w, all_names, n=1, cutoff=0.65)
-        if matches:
-            for r in CATALOG:
-                if normalize_text(r["nombre"]) == matches[0]:
-                    score = similarity(msg, matches[0])
-                    if score > best_score:
-                        best_match, best_score = r["nombre"], score
-
-  # 🔹 Filtro final para evitar falsos positivos (como 'detergente' → 'té verde')
+                    best_id, best_score = nid, score
+
     # ------------------------------------------------------------------
     # 🔹 Filtro final y retorno controlado
     # ------------------------------------------------------------------
-    if not best_match:
-        print(f"[DEBUG] Ninguna coincidencia fuerte (max score={best_score:.2f})")
+    if best_id is None:
+        tracing.event("catalog.no_match", max_score=round(best_score, 2))
         return None
 
+    best_match = index.row_for(best_id)["nombre"]
+
     # 🔹 Evita falsos positivos (ej. 'detergente' → 'té verde')
     if best_score < 0.65:
-        print(f"[DEBUG] Coincidencia débil descartada (score={best_score:.2f})")
+        tracing.event("catalog.weak_match", product=best_match, score=round(best_score, 2))
         return None
 
-    print(f"[DEBUG] Mejor coincidencia aceptada: {best_match} (score={best_score:.2f})")
+    tracing.event("catalog.match", rule="fuzzy", product=best_match, score=round(best_score, 2))
     return best_match
 
 
@@ -110,19 +332,16 @@ def get_product_row(product_name: str) -> dict | None:
     """Devuelve la fila completa del producto por nombre o coincidencia aproximada."""
     if not product_name:
         return None
-    normalized = normalize_text(product_name)
-    for row in CATALOG:
-        if normalize_text(row["nombre"]) == normalized:
-            return row
-
-    # Buscar coincidencia cercana si no hay exacta
-    names = [normalize_text(row["nombre"]) for row in CATALOG]
-    match = difflib.get_close_matches(normalized, names, n=1, cutoff=0.4)
-    if match:
-        for row in CATALOG:
-            if normalize_text(row["nombre"]) == match[0]:
-                return row
-    return None
+    if CATALOG_MATCHER == "tfidf":
+        index = current_index()
+        normalized = normalize_text(product_name)
+        nid = index.name_ids.get(normalized)
+        if nid is None:
+            nid, score = current_matcher().best(normalized)
+            if score < 0.4:
+                return None
+        return index.row_for(nid)
+    return current_index().get_row(product_name)
 
 # ----------------------------------------------------------------------
 # 5️⃣ PRUEBA LOCAL
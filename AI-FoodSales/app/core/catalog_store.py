@@ -0,0 +1,238 @@
+"""
+Almacén del catálogo y sinónimos AI-FoodSales.
+
+Carga `Catalog.csv` y `synonyms.json` una sola vez, los compila en un
+snapshot binario (marshal) y vigila los archivos fuente para reemplazar el
+snapshot en caliente, sin reiniciar el servicio.
+
+El snapshot evita repetir el parseo CSV/JSON: cada worker (o cada arranque)
+que encuentra el archivo de la misma versión solo lo deserializa. Se lee
+con mmap para no copiar el archivo a un buffer intermedio, pero
+marshal.loads construye los objetos en la memoria privada de cada proceso:
+el mmap no comparte el catálogo entre workers. Para compartirlo está el
+lanzador con precarga (app.serve), que carga todo antes del fork.
+
+Uso:
+    snap = STORE.current()          # snapshot inmutable y consistente
+    snap.catalog / snap.synonyms    # filas del CSV / dict de sinónimos
+    snap.artifact("nombre", build)  # derivados compilados por snapshot
+"""
+
+import csv, hashlib, json, marshal, mmap, os, threading, time
+from dataclasses import dataclass, field
+from typing import Callable
+
+from app.utils import tracing
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "../data")
+CATALOG_FILE = os.path.join(DATA_DIR, "Catalog.csv")
+SYNONYMS_FILE = os.path.join(DATA_DIR, "synonyms.json")
+SNAPSHOT_DIR = os.getenv("CATALOG_SNAPSHOT_DIR", os.path.join(DATA_DIR, ".cache"))
+WATCH_INTERVAL = float(os.getenv("CATALOG_WATCH_INTERVAL", "2.0"))
+
+SNAPSHOT_MAGIC = b"FSNP0001"
+
+
+# ----------------------------------------------------------------------
+# 1️⃣ LECTURA DE FUENTES
+# ----------------------------------------------------------------------
+def load_catalog(path: str = CATALOG_FILE) -> list[dict]:
+    """Carga el CSV del catálogo detectando codificación automáticamente."""
+    for enc in ("utf-8-sig", "latin-1"):
+        try:
+            with open(path, encoding=enc) as f:
+                return list(csv.DictReader(f))
+        except UnicodeDecodeError:
+            continue
+    raise RuntimeError("No se pudo leer el catálogo con las codificaciones conocidas.")
+
+
+def load_synonyms(path: str = SYNONYMS_FILE) -> dict:
+    """Carga synonyms.json; si no existe devuelve un dict vacío."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8-sig") as f:
+        return json.load(f)
+
+
+def _fingerprint(*paths: str) -> tuple:
+    """(mtime, tamaño) de cada fuente; barato de consultar en cada sondeo."""
+    stamp = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def _content_version(*paths: str) -> str:
+    """Versión del snapshot: hash del contenido de las fuentes."""
+    digest = hashlib.sha1()
+    for p in paths:
+        try:
+            with open(p, "rb") as f:
+                digest.update(f.read())
+        except FileNotFoundError:
+            digest.update(b"\0missing\0")
+    return digest.hexdigest()[:16]
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ SNAPSHOT
+# ----------------------------------------------------------------------
+@dataclass
+class CatalogSnapshot:
+    """Estado inmutable del catálogo; se reemplaza completo en cada recarga."""
+    version: str
+    catalog: list[dict]
+    synonyms: dict
+    loaded_at: float = field(default_factory=time.time)
+    _artifacts: dict = field(default_factory=dict, repr=False)
+
+    def artifact(self, name: str, build: Callable[["CatalogSnapshot"], object]):
+        """Devuelve (y memoriza) un derivado compilado de este snapshot."""
+        try:
+            return self._artifacts[name]
+        except KeyError:
+            return self._artifacts.setdefault(name, build(self))
+
+
+def _snapshot_path(version: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"catalog-{version}.snap")
+
+
+def write_snapshot(snap: CatalogSnapshot) -> str:
+    """Serializa el snapshot de forma atómica (tmp + rename)."""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = _snapshot_path(snap.version)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(marshal.dumps((snap.version, snap.catalog, snap.synonyms)))
+    os.replace(tmp, path)
+    return path
+
+
+def read_snapshot(path: str) -> CatalogSnapshot | None:
+    """Deserializa un snapshot (leído vía mmap); devuelve None si no existe o es inválido."""
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                return None
+            with memoryview(mm) as view:
+                version, catalog, synonyms = marshal.loads(view[len(SNAPSHOT_MAGIC):])
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+    return CatalogSnapshot(version=version, catalog=catalog, synonyms=synonyms)
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ ALMACÉN CON RECARGA EN CALIENTE
+# ----------------------------------------------------------------------
+class CatalogStore:
+    """
+    Mantiene el snapshot vigente y lo reemplaza atómicamente cuando cambian
+    las fuentes. Los lectores toman `current()` una vez por operación y
+    trabajan sobre esa referencia aunque ocurra una recarga en paralelo.
+    """
+
+    def __init__(self, catalog_file: str = CATALOG_FILE, synonyms_file: str = SYNONYMS_FILE):
+        self.catalog_file = catalog_file
+        self.synonyms_file = synonyms_file
+        self.reloads = 0
+        self._listeners: list[Callable[[CatalogSnapshot], None]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: threading.Thread | None = None
+        self._stamp = None
+        self._snapshot: CatalogSnapshot | None = None
+        self.reload(force=True)
+
+    def current(self) -> CatalogSnapshot:
+        return self._snapshot
+
+    @property
+    def version(self) -> str:
+        return self._snapshot.version
+
+    def subscribe(self, listener: Callable[[CatalogSnapshot], None]) -> None:
+        """Registra una función que se invoca tras cada cambio de snapshot."""
+        self._listeners.append(listener)
+
+    def _build(self) -> CatalogSnapshot:
+        version = _content_version(self.catalog_file, self.synonyms_file)
+        path = _snapshot_path(version)
+        snap = read_snapshot(path)
+        if snap is not None and snap.version == version:
+            return snap
+
+        snap = CatalogSnapshot(
+            version=version,
+            catalog=load_catalog(self.catalog_file),
+            synonyms=load_synonyms(self.synonyms_file),
+        )
+        try:
+            write_snapshot(snap)
+        except OSError as e:
+            tracing.event("catalog.snapshot_write_failed", level=tracing.WARNING, path=path, error=str(e))
+        return snap
+
+    def reload(self, force: bool = False) -> bool:
+        """Recompila si las fuentes cambiaron. Devuelve True si hubo reemplazo."""
+        with self._lock:
+            stamp = _fingerprint(self.catalog_file, self.synonyms_file)
+            if not force and stamp == self._stamp:
+                return False
+            try:
+                snap = self._build()
+            except (OSError, ValueError, RuntimeError) as e:
+                # Archivo a medio escribir o inválido: se conserva el snapshot vigente
+                if self._snapshot is None:
+                    raise
+                self._stamp = stamp
+                tracing.event("catalog.reload_rejected", level=tracing.WARNING, kept=self.version, error=str(e))
+                return False
+            self._stamp = stamp
+            if self._snapshot is not None and snap.version == self._snapshot.version:
+                return False
+            first_load = self._snapshot is None
+            self._snapshot = snap
+            if not first_load:
+                self.reloads += 1
+                tracing.event("catalog.reloaded", level=tracing.INFO, version=snap.version, products=len(snap.catalog))
+
+        # Un listener que falla no frena a los demás ni al hilo vigilante:
+        # el snapshot nuevo ya quedó publicado
+        for listener in self._listeners:
+            try:
+                listener(snap)
+            except Exception as e:
+                tracing.event("catalog.listener_failed", level=tracing.WARNING,
+                              listener=getattr(listener, "__qualname__", repr(listener)),
+                              version=snap.version, error=repr(e))
+        return True
+
+    def start_watching(self, interval: float = WATCH_INTERVAL) -> None:
+        """Sondea las fuentes en un hilo de fondo (interval <= 0 lo desactiva)."""
+        if interval <= 0 or (self._watcher and self._watcher.is_alive()):
+            return
+        self._stop.clear()
+
+        def _loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.reload()
+                except Exception as e:
+                    # El hilo sigue vivo: el próximo sondeo vuelve a intentarlo
+                    tracing.event("catalog.watch_failed", level=tracing.WARNING, kept=self.version, error=repr(e))
+
+        self._watcher = threading.Thread(target=_loop, name="catalog-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        self._stop.set()
+
+
+STORE = CatalogStore()
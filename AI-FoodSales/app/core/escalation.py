@@ -1,5 +1,3 @@
-print("🔥 escalation.py CARGADO desde:", __file__)
-
 # -*- coding: utf-8 -*-
 """
 AI-FoodSales • Escalamiento v1.4.1
@@ -16,8 +14,12 @@ Descripción:
 """
 
 import re, difflib
+from collections import Counter
 from dataclasses import dataclass
-from typing import Dict, List
+from functools import lru_cache
+from typing import Dict, FrozenSet, List
+
+from app.utils import tracing
 
 
 # ---------------------------
@@ -187,16 +189,55 @@ COMMON_FIXES = {
 }
 
 
+# ---------------------------
+# Léxicos compilados
+# ---------------------------
+# Todo lo que no depende del mensaje se prepara una sola vez al importar.
+# Los órdenes de iteración de los sets se congelan en tuplas para que los
+# `cues` salgan en el mismo orden que el recorrido original.
+
+FUZZY_THRESHOLD = 0.82
+
+_GLOSSARY_ITEMS = tuple(EN_TO_ES_GLOSSARY.items())
+_FIX_ITEMS = tuple(COMMON_FIXES.items())
+_CLEAN_RE = re.compile(r"[^a-z0-9\sñ😒😑🙃😠🤦🤷]")
+_SPACES_RE = re.compile(r"\s+")
+_TOKEN_RE = re.compile(r"[\w¿?¡!']+")
+
+_POLITENESS_ORDER = tuple(POLITENESS)
+_COMPLAINT_ORDER = tuple(COMPLAINT_ROOTS)
+_NEGATION_RULES = tuple((n, re.compile(rf"\b{n}\b")) for n in NEGATIONS)
+_REPLACEMENT_RE = re.compile(r"(inaceptable|esperando|demasiado|tardo|demorado|pedido)")
+
+
+def _alternation(terms) -> re.Pattern:
+    """Un solo patrón que equivale a `any(t in text for t in terms)`."""
+    return re.compile("|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)))
+
+
+_EMOJI_ANY_RE = _alternation(FRUSTRATION_MARKS)
+_POS_MARKER_ANY_RE = _alternation(SARCASM_POS_MARKERS)
+_NEGATION_ANY_RE = _alternation(NEGATIONS)
+_COMPLAINT_ANY_RE = _alternation(COMPLAINT_ROOTS)
+
+# Raíces agrupadas por longitud con su multiconjunto de caracteres, para
+# descartar por cota superior antes de invocar SequenceMatcher.
+_ROOTS_BY_LENGTH: Dict[int, List[tuple]] = {}
+for _root in _COMPLAINT_ORDER:
+    _ROOTS_BY_LENGTH.setdefault(len(_root), []).append((_root, Counter(_root)))
+
+
 # ---------------------------
 # Utilidades
 # ---------------------------
 
+@lru_cache(maxsize=4096)
 def normalize(text: str) -> str:
     # Paso 1: todo a minúsculas
     t = text.lower()
 
     # Paso 2: traducción ligera inglés→español
-    for k, v in EN_TO_ES_GLOSSARY.items():
+    for k, v in _GLOSSARY_ITEMS:
         if k in t:
             t = t.replace(k, v)
 
@@ -205,36 +246,54 @@ def normalize(text: str) -> str:
            .replace("ó","o").replace("ú","u"))
 
     # Paso 4: correcciones ortográficas comunes
-    for w, r in COMMON_FIXES.items():
-        t = t.replace(w, r)
+    for w, r in _FIX_ITEMS:
+        if w in t:
+            t = t.replace(w, r)
 
     # 🟢 Paso 5: conservar emojis y signos de frustración
-    t = re.sub(r"[^a-z0-9\sñ😒😑🙃😠🤦🤷]", " ", t)
+    t = _CLEAN_RE.sub(" ", t)
 
     # Paso 6: limpiar espacios duplicados
-    return re.sub(r"\s+"," ",t).strip()
+    return _SPACES_RE.sub(" ", t).strip()
 
 def tokens(text: str) -> List[str]:
-    return re.findall(r"[\w¿?¡!']+", text.lower())
+    return _TOKEN_RE.findall(text.lower())
 
 def ratio(a:str,b:str)->float:
     return difflib.SequenceMatcher(None,a,b).ratio()
 
-def fuzzy_contains(text:str, root:str, threshold:float=0.82)->bool:
-    for tok in tokens(text):
-        if ratio(tok,root)>=threshold or root in tok:
-            return True
-    return False
+@lru_cache(maxsize=8192)
+def fuzzy_roots(tok: str) -> FrozenSet[str]:
+    """
+    Raíces de reclamo que `tok` satisface en modo difuso
+    (ratio >= FUZZY_THRESHOLD o raíz contenida en el token).
+    Solo se compara contra raíces cuya longitud y caracteres lo permiten.
+    """
+    lt = len(tok)
+    tok_chars = Counter(tok)
+    hits = set()
+    for lr, roots in _ROOTS_BY_LENGTH.items():
+        total = lt + lr
+        length_ok = total and 2.0 * min(lt, lr) / total >= FUZZY_THRESHOLD
+        for root, root_chars in roots:
+            if lr <= lt and root in tok:
+                hits.add(root)
+            elif length_ok and 2.0 * sum((tok_chars & root_chars).values()) / total >= FUZZY_THRESHOLD:
+                if ratio(tok, root) >= FUZZY_THRESHOLD:
+                    hits.add(root)
+    return frozenset(hits)
+
+def fuzzy_contains(text:str, root:str, threshold:float=FUZZY_THRESHOLD)->bool:
+    if threshold != FUZZY_THRESHOLD:
+        return any(ratio(tok, root) >= threshold or root in tok for tok in tokens(text))
+    return any(root in fuzzy_roots(tok) for tok in tokens(text))
 
 def any_emoji(text:str)->bool:
-    return any(e in text for e in FRUSTRATION_MARKS)
+    return _EMOJI_ANY_RE.search(text) is not None
 
 def map_english_to_spanish_roots(text:str)->List[str]:
-    hits=[]
-    for en,es in EN_TO_ES_GLOSSARY.items():
-        if en in text.lower():
-            hits.append(es)
-    return hits
+    lowered = text.lower()
+    return [es for en, es in _GLOSSARY_ITEMS if en in lowered]
 
 
 # ---------------------------
@@ -255,127 +314,136 @@ class Scores:
 THRESHOLDS={"complaint":1.3,"soft":1.0,"sarcasm":0.4}
 WEIGHTS={"exact":1.0,"fuzzy":0.8,"neg":0.5,"emoji":1.0,"eng":0.9,"sarc":1.4,"contrast":1.0}
 
+_FRUSTRATION_EMOJI_RE = re.compile(r"(😒|😑|🙃|😠|🤦|🤷)")
+_POS_WAIT_RE = re.compile(r"(pedido|esperando|lleg|comida|tarde|nada|fr[ií]a|frio|demora|aun|todav[ií]a)")
+_EMOJI_WAIT_RE = re.compile(r"(esperando|nada|tarde|pedido|lleg)")
+_FAILSAFE_WAIT_RE = re.compile(r"(esperando|hora|horas|nada|tarde|demora|todavia|aun)")
+
+# Tabla de reglas de sarcasmo: (cue, patrón, +sarcasmo, +reclamo).
+# Se evalúan en orden; entre ambos bloques van los ajustes que dependen
+# del puntaje acumulado (ver score_sarcasm).
+SARCASM_RULES_PRE = (
+    # sarcasmo contrastivo: "si es que", "claro que", "pero", "aunque"
+    ("contrastive",
+     re.compile(r"(si es que|claro que|pero|aunque).{0,20}(llega|llego|funciona|resuelv|arregl)"),
+     WEIGHTS["contrast"], 0.0),
+    # ✅ sarcasmo tipo elogio + reclamo (ajustado con impacto en complaint)
+    ("sarcasmo_contraste",
+     re.compile(r"(incre[ií]ble|fant[aá]stico|perfecto|excelente|genial).{0,80}(esperando|pedido|lleg|nada|fr[ií]a|frio|tarde|demora|a[úu]n|todav[ií]a)"),
+     1.5, 0.5),
+    # ironías de cortesía
+    ("sarcasmo_ironia_cortesia",
+     re.compile(r"(ah|muy|tan)\s?(buen[ií]simo|excelente|amable|eficiente|r[aá]pido).{0,40}(nada|demora|problema|error|fall[oó])"),
+     1.0, 0.0),
+    # sarcasmo cortés + frustración (ejemplo: "Perfecto, dos horas esperando y nada 😑")
+    ("sarcasmo_cortesia_frustrada",
+     re.compile(r"(perfecto|excelente|genial|wow|incre[ií]ble|fant[aá]stico)[^\\n]{0,150}(hora|horas|esperando|todav[ií]a|nada|tarde|demora)", flags=re.IGNORECASE|re.UNICODE),
+     2.0, 1.0),
+    # emojis de frustración tras elogio
+    ("emoji_frustracion", _FRUSTRATION_EMOJI_RE, 0.8, 0.0),
+)
+
+SARCASM_RULES_POST = (
+    # sarcasmo indirecto o irónico sin emoji
+    ("sarcasmo_indirecto",
+     re.compile(r"(aunque|pero|otra vez|por lo visto|sigan así|no es su fuerte).{0,40}"),
+     1.0, 0.0),
+    ("sarcasmo_cortesia_falsa",
+     re.compile(r"(gracias|perfecto|excelente).{0,30}(pero|aunque|nada|sin)"),
+     1.2, 0.8),
+    # sarcasmo resignado o ironía pasiva (dinámico con duración variable)
+    ("sarcasmo_resignado",
+     re.compile(r"(alg[úu]n d[ií]a|paciencia|ya llegar[aá]|sigue igual|todo igual|sin resultado|ya van\s*[0-9]+\s*horas|[0-9]+\s*horas\s*(y\s*contando)?|hora[s]?\s*y\s*contando)"),
+     1.0, 0.5),
+    # sarcasmo de falsa satisfacción o ironía positiva ("me encanta esperar tanto")
+    ("sarcasmo_falsa_satisfaccion",
+     re.compile(r"(me\s+(encanta|fascina|gusta|alegra|maravilla).{0,40}(esperar|nada|demora|tarde|no\s+llega|sin|eficiencia|puntualidad|velocidad|lento))"),
+     1.5, 0.7),
+    # sarcasmo implícito con tono positivo + negación ("Qué gusto da no recibir nada")
+    ("sarcasmo_implicito_positivo",
+     re.compile(r"(qu[eé]\s+(gusto|placer|alegr[ií]a|maravilla).{0,30}(no|sin)\s+[a-záéíóúñ]+)"),
+     1.3, 0.6),
+    # sarcasmo con elogio y negación o contraste implícito ("qué gusto da ver tanta eficiencia inexistente")
+    ("sarcasmo_elogio_negado",
+     re.compile(r"(qu[eé]\s+(gusto|placer|maravilla|alegr[ií]a|honor|satisfacci[oó]n).{0,40}(inexistente|lento|sin|nada|ausente))"),
+     1.4, 0.6),
+    # sarcasmo seco o ironía implícita sin elogio directo
+    ("sarcasmo_seco_implícito",
+     re.compile(r"(qué\s+(sorpresa|raro|eficiente|tranquilo|emocionante|normal)|nada\s+(nuevo|mejor|diferente)|todo\s+(igual|normal)|sin\s+(novedad|cambio))"),
+     1.0, 0.5),
+    # sarcasmo hiperbólico o humor negro (esperas imposibles o exageradas)
+    ("sarcasmo_hiperbolico_tiempo",
+     re.compile(r"(a este paso|antes de navidad|voy a envejecer|para el próximo año|en otra vida)"),
+     1.3, 0.6),
+)
+
+
+def _apply_rules(text: str, s: Scores, rules) -> None:
+    for cue, pattern, sarcasm, complaint in rules:
+        if pattern.search(text):
+            s.sarcasm += sarcasm
+            if complaint:
+                s.complaint += complaint
+            s.cues["sarcasm"].append(cue)
+
+
 def score_politeness(text:str, s:Scores):
-    for p in POLITENESS:
+    for p in _POLITENESS_ORDER:
         if p in text:
             s.politeness+=0.25; s.cues["politeness"].append(p)
 
 def score_complaint(text:str, s:Scores):
-    for r in COMPLAINT_ROOTS:
+    fuzzy_hits = set()
+    for tok in tokens(text):
+        fuzzy_hits |= fuzzy_roots(tok)
+    for r in _COMPLAINT_ORDER:
         if r in text:
             s.complaint+=WEIGHTS["exact"]; s.cues["complaint"].append(r)
-        elif fuzzy_contains(text,r):
+        elif r in fuzzy_hits:
             s.complaint+=WEIGHTS["fuzzy"]; s.cues["complaint"].append("~"+r)
-    for n in NEGATIONS:
-        if re.search(rf"\b{n}\b",text):
+    for n, pattern in _NEGATION_RULES:
+        if pattern.search(text):
             s.complaint+=WEIGHTS["neg"]; s.cues["complaint"].append("neg:"+n)
     if any_emoji(text):
         s.complaint+=WEIGHTS["emoji"]; s.cues["complaint"].append("emoji")
     for r in map_english_to_spanish_roots(text):
         s.complaint+=WEIGHTS["eng"]; s.cues["complaint"].append("en→"+r)
         # 🔹 Extensión ligera para reclamos comunes no cubiertos por raíces
-    if re.search(r"(inaceptable|esperando|demasiado|tardo|demorado|pedido)", text):
+    if _REPLACEMENT_RE.search(text):
         s.complaint += 1.0
         s.cues["complaint"].append("reclamo_extra")
     
 
 def score_sarcasm(text: str, s: Scores):
     # sarcasmo positivo + negativo (base original)
-    pos = any(p in text for p in SARCASM_POS_MARKERS)
-    neg = any(n in text for n in NEGATIONS) or any(r in text for r in COMPLAINT_ROOTS)
+    pos = _POS_MARKER_ANY_RE.search(text) is not None
+    neg = _NEGATION_ANY_RE.search(text) is not None or _COMPLAINT_ANY_RE.search(text) is not None
     if pos and neg:
         s.sarcasm += WEIGHTS["sarc"]
         s.cues["sarcasm"].append("pos+neg")
 
     # sarcasmo con elogio + espera o frustración
-    elif pos and re.search(r"(pedido|esperando|lleg|comida|tarde|nada|fr[ií]a|frio|demora|aun|todav[ií]a)", text):
+    elif pos and _POS_WAIT_RE.search(text):
         s.sarcasm += WEIGHTS["sarc"] * 0.9
         s.cues["sarcasm"].append("pos+espera")
 
-    # sarcasmo contrastivo: "si es que", "claro que", "pero", "aunque"
-    if re.search(r"(si es que|claro que|pero|aunque).{0,20}(llega|llego|funciona|resuelv|arregl)", text):
-        s.sarcasm += WEIGHTS["contrast"]
-        s.cues["sarcasm"].append("contrastive")
-
-    # ✅ sarcasmo tipo elogio + reclamo (ajustado con impacto en complaint)
-    if re.search(r"(incre[ií]ble|fant[aá]stico|perfecto|excelente|genial).{0,80}(esperando|pedido|lleg|nada|fr[ií]a|frio|tarde|demora|a[úu]n|todav[ií]a)", text):
-        s.sarcasm += 1.5
-        s.complaint += 0.5
-        s.cues["sarcasm"].append("sarcasmo_contraste")
-
-    # ironías de cortesía
-    if re.search(r"(ah|muy|tan)\s?(buen[ií]simo|excelente|amable|eficiente|r[aá]pido).{0,40}(nada|demora|problema|error|fall[oó])", text):
-        s.sarcasm += 1.0
-        s.cues["sarcasm"].append("sarcasmo_ironia_cortesia")
-    
-    # sarcasmo cortés + frustración (ejemplo: "Perfecto, dos horas esperando y nada 😑")
-    if re.search(r"(perfecto|excelente|genial|wow|incre[ií]ble|fant[aá]stico)[^\\n]{0,150}(hora|horas|esperando|todav[ií]a|nada|tarde|demora)", text, flags=re.IGNORECASE|re.UNICODE):
-        s.sarcasm += 2.0
-        s.complaint += 1.0
-        s.cues["sarcasm"].append("sarcasmo_cortesia_frustrada")
+    _apply_rules(text, s, SARCASM_RULES_PRE)
 
-    # emojis de frustración tras elogio
-    if re.search(r"(😒|😑|🙃|😠|🤦|🤷)", text):
-        s.sarcasm += 0.8
-        s.cues["sarcasm"].append("emoji_frustracion")
+    frustrated = _FRUSTRATION_EMOJI_RE.search(text) is not None
 
     # fuerza un mínimo de sarcasmo si hay emoji + palabra de espera
-    if re.search(r"(😒|😑|🙃|😠|🤦|🤷)", text) and re.search(r"(esperando|nada|tarde|pedido|lleg)", text):
+    if frustrated and _EMOJI_WAIT_RE.search(text):
         s.sarcasm = max(s.sarcasm, 1.0)
     
     # Corrige interferencia con cortesía: si hay sarcasmo y emoji frustración, reduce cortesía
-    if s.sarcasm >= 0.8 and re.search(r"(😒|😑|🙃|😠|🤦|🤷)", text):
+    if s.sarcasm >= 0.8 and frustrated:
         s.politeness = max(0.0, s.politeness - 1.0)
 
     # failsafe: si hay sarcasmo leve + palabras de espera, forzar reclamo implícito
-    if s.sarcasm >= 1.0 and re.search(r"(esperando|hora|horas|nada|tarde|demora|todavia|aun)", text):
+    if s.sarcasm >= 1.0 and _FAILSAFE_WAIT_RE.search(text):
         s.complaint += 1.0
 
-    # sarcasmo indirecto o irónico sin emoji
-    if re.search(r"(aunque|pero|otra vez|por lo visto|sigan así|no es su fuerte).{0,40}", text):
-        s.sarcasm += 1.0
-        s.cues["sarcasm"].append("sarcasmo_indirecto")
-
-    if re.search(r"(gracias|perfecto|excelente).{0,30}(pero|aunque|nada|sin)", text):
-        s.sarcasm += 1.2
-        s.complaint += 0.8
-        s.cues["sarcasm"].append("sarcasmo_cortesia_falsa")
-
-    # sarcasmo resignado o ironía pasiva (dinámico con duración variable)
-    if re.search(r"(alg[úu]n d[ií]a|paciencia|ya llegar[aá]|sigue igual|todo igual|sin resultado|ya van\s*[0-9]+\s*horas|[0-9]+\s*horas\s*(y\s*contando)?|hora[s]?\s*y\s*contando)", text):
-        s.sarcasm += 1.0
-        s.complaint += 0.5
-        s.cues["sarcasm"].append("sarcasmo_resignado")
-
-    # sarcasmo de falsa satisfacción o ironía positiva ("me encanta esperar tanto")
-    if re.search(r"(me\s+(encanta|fascina|gusta|alegra|maravilla).{0,40}(esperar|nada|demora|tarde|no\s+llega|sin|eficiencia|puntualidad|velocidad|lento))", text):
-        s.sarcasm += 1.5
-        s.complaint += 0.7
-        s.cues["sarcasm"].append("sarcasmo_falsa_satisfaccion")
-
-    # sarcasmo implícito con tono positivo + negación ("Qué gusto da no recibir nada")
-    if re.search(r"(qu[eé]\s+(gusto|placer|alegr[ií]a|maravilla).{0,30}(no|sin)\s+[a-záéíóúñ]+)", text):
-        s.sarcasm += 1.3
-        s.complaint += 0.6
-        s.cues["sarcasm"].append("sarcasmo_implicito_positivo")
-
-    # sarcasmo con elogio y negación o contraste implícito ("qué gusto da ver tanta eficiencia inexistente")
-    if re.search(r"(qu[eé]\s+(gusto|placer|maravilla|alegr[ií]a|honor|satisfacci[oó]n).{0,40}(inexistente|lento|sin|nada|ausente))", text):
-        s.sarcasm += 1.4
-        s.complaint += 0.6
-        s.cues["sarcasm"].append("sarcasmo_elogio_negado")
-
-    # sarcasmo seco o ironía implícita sin elogio directo
-    if re.search(r"(qué\s+(sorpresa|raro|eficiente|tranquilo|emocionante|normal)|nada\s+(nuevo|mejor|diferente)|todo\s+(igual|normal)|sin\s+(novedad|cambio))", text):
-        s.sarcasm += 1.0
-        s.complaint += 0.5
-        s.cues["sarcasm"].append("sarcasmo_seco_implícito")
-
-        # sarcasmo hiperbólico o humor negro (esperas imposibles o exageradas)
-    if re.search(r"(a este paso|antes de navidad|voy a envejecer|para el próximo año|en otra vida)", text):
-        s.sarcasm += 1.3
-        s.complaint += 0.6
-        s.cues["sarcasm"].append("sarcasmo_hiperbolico_tiempo")
+    _apply_rules(text, s, SARCASM_RULES_POST)
 
     return s
 
@@ -383,23 +451,19 @@ def score_sarcasm(text: str, s: Scores):
 # Decisión principal
 # ---------------------------
 
-def should_escalate(message:str)->Dict:
+def should_escalate(message:str, normalized:str=None)->Dict:
     if not message:
         return {"agent_response":"","should_escalate":False,"summary":{}}
 
-    t = normalize(message)
+    # `normalized` permite reutilizar normalize(message) ya calculado
+    t = normalized if normalized is not None else normalize(message)
     s = Scores()
     score_politeness(t, s)
     score_complaint(t, s)
     score_sarcasm(t, s)
 
-    # --- DEBUG TEMPORAL (eliminar luego) ---
-    print(">>> SHOULD_ESCALATE CALLED with raw message:", repr(message))
-    print(">>> normalized text:", repr(t))
-    print(">>> SCORES BEFORE DECISION -> sarcasm:", s.sarcasm, "complaint:", s.complaint, "politeness:", s.politeness)
-    print(">>> CUES:", s.cues)
-    # --- END DEBUG ---
-
+    tracing.event("escalation.scores", message=message, normalized=t, sarcasm=s.sarcasm,
+                  complaint=s.complaint, politeness=s.politeness, cues=s.cues)
 
     # 👉 NUEVO BLOQUE: sarcasmo fuerte cuenta como reclamo implícito
     if s.sarcasm >= THRESHOLDS["sarcasm"]:
@@ -436,7 +500,8 @@ def should_escalate(message:str)->Dict:
             "(cobro erróneo, producto faltante, demora, calidad)?"
         )
     
-    print(">>> DEBUG SCORES:", s.sarcasm, s.complaint, s.politeness, s.cues)
+    tracing.event("escalation.decision", escalate=escalate, threshold=thr, sarcasm=s.sarcasm,
+                  complaint=s.complaint, politeness=s.politeness)
 
     # 🧩 Failsafe: asegurar estructura de retorno completa
     if not isinstance(s.cues, dict):
@@ -0,0 +1,201 @@
+"""
+Índice invertido BM25 de preguntas frecuentes y políticas AI-FoodSales.
+
+Fuentes (se indexan al arrancar, una sola vez):
+    app/data/faq.json          respuestas cortas (clave -> respuesta)     source="faq"
+    Docs/FAQ_FoodSales.txt     una entrada por pregunta "### N. ..."     source="doc"
+    Docs/Agent-policies.txt    una entrada por sección "## N. ..."       source="policy"
+
+Cada entrada se tokeniza (minúsculas, sin tildes, sin palabras vacías,
+plural simplificado) y se guarda en listas de ocurrencias por término.
+Una consulta solo recorre las listas de sus propios términos, así que el
+costo depende del largo del mensaje y no de cuántas entradas haya.
+
+Uso:
+    hits = faq_index().search("¿aceptan pago con tarjeta?", k=3)
+    hits[0].answer, hits[0].score
+"""
+
+import heapq, json, math, os, re, threading, unicodedata
+from dataclasses import dataclass
+
+from app.core.catalog_store import DATA_DIR
+from app.utils import tracing
+
+DOCS_DIR = os.path.join(os.path.dirname(__file__), "../../Docs")
+FAQ_FILE = os.path.join(DATA_DIR, "faq.json")
+FAQ_DOC_FILE = os.path.join(DOCS_DIR, "FAQ_FoodSales.txt")
+POLICIES_FILE = os.path.join(DOCS_DIR, "Agent-policies.txt")
+
+# Parámetros BM25 estándar
+K1 = 1.2
+B = 0.75
+# Puntaje mínimo para responder con una entrada concreta del índice
+FAQ_MIN_SCORE = float(os.getenv("FAQ_MIN_SCORE", "3.0"))
+
+STOPWORDS = frozenset("""
+a al algo algun alguna ante antes aqui asi cada como con cual cuales cuando de del desde donde
+e el ella en entre era es esa ese eso esta este esto estos estas ha hay la las le les lo los
+mas me mi mis muy no nos o os para pero por que quien se ser si sin sobre son su sus tambien
+te tiene tienen tu tus un una unas uno unos y ya yo usted ustedes puedo pueden puede
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_HEADING_RE = {
+    "doc": re.compile(r"^###\s+(?:\d+\.\s*)?(.+?)\s*$", re.MULTILINE),
+    "policy": re.compile(r"^##\s+(?:\d+\.\s*)?(.+?)\s*$", re.MULTILINE),
+}
+
+
+# ----------------------------------------------------------------------
+# 1️⃣ TOKENIZACIÓN
+# ----------------------------------------------------------------------
+def _stem(token: str) -> str:
+    # Plural simplificado: "pagos" -> "pago", "devoluciones" -> "devolucion"
+    if len(token) > 5 and token.endswith("es"):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    """Términos normalizados de un texto (minúsculas, sin tildes ni palabras vacías)."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [_stem(t) for t in _TOKEN_RE.findall(text) if t not in STOPWORDS and len(t) > 1]
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ ÍNDICE
+# ----------------------------------------------------------------------
+@dataclass(frozen=True)
+class FaqEntry:
+    title: str
+    answer: str
+    source: str
+
+
+@dataclass(frozen=True)
+class FaqHit:
+    entry: FaqEntry
+    score: float
+
+    @property
+    def answer(self) -> str:
+        return self.entry.answer
+
+
+class FaqIndex:
+    """Índice BM25 inmutable una vez construido."""
+
+    def __init__(self, entries: list[FaqEntry]):
+        self.entries = entries
+        postings: dict[str, list[tuple[int, int]]] = {}
+        lengths = []
+        for doc_id, entry in enumerate(entries):
+            # El título pesa doble: resume la pregunta que responde la entrada
+            terms = tokenize(entry.title) * 2 + tokenize(entry.answer)
+            lengths.append(len(terms))
+            counts: dict[str, int] = {}
+            for t in terms:
+                counts[t] = counts.get(t, 0) + 1
+            for t, tf in counts.items():
+                postings.setdefault(t, []).append((doc_id, tf))
+
+        n = len(entries)
+        avgdl = (sum(lengths) / n) if n else 0.0
+        # Normalización por longitud precalculada: en la consulta solo quedan sumas
+        norms = [K1 * (1 - B + B * dl / avgdl) if avgdl else K1 for dl in lengths]
+        # Por término: ids de las entradas y su peso BM25 completo (idf incluido)
+        self._postings: dict[str, tuple[tuple[int, ...], tuple[float, ...]]] = {}
+        for t, plist in postings.items():
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            self._postings[t] = (
+                tuple(doc_id for doc_id, _ in plist),
+                tuple(idf * tf * (K1 + 1) / (tf + norms[doc_id]) for doc_id, tf in plist),
+            )
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def search(self, query: str, k: int = 3, sources: tuple[str, ...] | None = None) -> list[FaqHit]:
+        """Las `k` entradas con mayor puntaje BM25 (opcionalmente de ciertas fuentes)."""
+        scores: dict[int, float] = {}
+        get = scores.get
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            for doc_id, weight in zip(*posting):
+                scores[doc_id] = get(doc_id, 0.0) + weight
+
+        if sources is not None:
+            scores = {d: s for d, s in scores.items() if self.entries[d].source in sources}
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [FaqHit(self.entries[doc_id], round(score, 4)) for doc_id, score in best]
+
+    def best_answer(self, query: str, sources: tuple[str, ...] = ("faq", "doc"),
+                    min_score: float = FAQ_MIN_SCORE) -> FaqHit | None:
+        """Mejor entrada si supera `min_score`; None si ninguna es concluyente."""
+        hits = self.search(query, k=1, sources=sources)
+        return hits[0] if hits and hits[0].score >= min_score else None
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ CARGA DE FUENTES
+# ----------------------------------------------------------------------
+def _clean(text: str) -> str:
+    """Quita marcas Markdown (negritas, separadores) y espacios sobrantes."""
+    lines = [ln.strip().replace("**", "") for ln in text.splitlines()]
+    return "\n".join(ln for ln in lines if ln and set(ln) != {"-"})
+
+
+def _read_sections(path: str, source: str) -> list[FaqEntry]:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8-sig") as f:
+        text = f.read()
+    matches = list(_HEADING_RE[source].finditer(text))
+    entries = []
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        body = _clean(text[m.end():end])
+        if body:
+            entries.append(FaqEntry(_clean(m.group(1)), body, source))
+    return entries
+
+
+def load_entries(faq_file: str = FAQ_FILE, faq_doc: str = FAQ_DOC_FILE,
+                 policies: str = POLICIES_FILE) -> list[FaqEntry]:
+    entries = []
+    if os.path.exists(faq_file):
+        with open(faq_file, encoding="utf-8-sig") as f:
+            entries += [FaqEntry(title, answer, "faq") for title, answer in json.load(f).items()]
+    entries += _read_sections(faq_doc, "doc")
+    entries += _read_sections(policies, "policy")
+    return entries
+
+
+_INDEX: FaqIndex | None = None
+_LOCK = threading.Lock()
+
+
+def faq_index() -> FaqIndex:
+    """Índice compartido; se construye en el primer uso (o en el arranque)."""
+    global _INDEX
+    if _INDEX is None:
+        with _LOCK:
+            if _INDEX is None:
+                _INDEX = FaqIndex(load_entries())
+                tracing.event("faq.index_built", level=tracing.INFO, entries=len(_INDEX),
+                              terms=len(_INDEX._postings))
+    return _INDEX
+
+
+def reload() -> FaqIndex:
+    """Reconstruye el índice tras editar faq.json o los documentos."""
+    global _INDEX
+    with _LOCK:
+        _INDEX = FaqIndex(load_entries())
+    return _INDEX
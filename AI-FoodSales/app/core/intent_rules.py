@@ -0,0 +1,249 @@
+"""
+Tabla declarativa de reglas de intención AI-FoodSales.
+
+Las palabras clave y patrones de intención general, intención de compra,
+intenciones adicionales (FAQ / descuento / escalamiento) y logística viven
+en `app/data/intent_rules.json`. En el primer uso (o en el calentamiento
+de arranque) se compilan, por cada forma de texto, en una sola regex
+combinada:
+
+    (?=guardia)(?:(?=(?P<sub>trie)))?(?:(?=\\b(?P<word>trie)\\b))?(?:(?=(?P<r0>regex)))?...
+
+La guardia descarta rápido las posiciones donde ninguna regla puede
+coincidir; en las demás, los lookahead opcionales registran todo lo que
+coincide ahí sin consumir texto. Así un solo recorrido reporta todas las
+etiquetas (intenciones, subtipo logístico y ciudad) sin que una regla
+tape a otra que empiece en la misma posición.
+
+Formas de texto:
+    lower   minúsculas (búsqueda por subcadena, como las listas originales)
+    folded  minúsculas sin tildes ni signos ¿?¡! (reglas logísticas)
+
+Uso:
+    match = RULES.scan("¿hacen entregas el sábado en Cali?")
+    match.logistics        # (True, {"type": "weekend", "city": "Cali"})
+"""
+
+import json, os, re, unicodedata
+from dataclasses import dataclass
+from functools import cached_property
+
+from app.core.catalog_store import DATA_DIR
+
+RULES_FILE = os.getenv("INTENT_RULES_FILE", os.path.join(DATA_DIR, "intent_rules.json"))
+
+
+def fold_text(text: str) -> str:
+    """Forma "folded": minúsculas, sin tildes y sin signos de interrogación/exclamación."""
+    text = text.lower().strip()
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return text.replace("¿", "").replace("?", "").replace("¡", "").replace("!", "")
+
+
+# ----------------------------------------------------------------------
+# 1️⃣ COMPILACIÓN
+# ----------------------------------------------------------------------
+def _trie(words) -> str:
+    """Alternativa de literales factorizada por prefijos comunes (menos ramas por posición)."""
+    root: dict = {}
+    for w in words:
+        node = root
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        alternatives = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alternatives:
+            return ""
+        body = alternatives[0] if len(alternatives) == 1 else f"(?:{'|'.join(alternatives)})"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(root)
+
+
+def _alternatives(substrings=(), words=(), regexes=()) -> str:
+    """Subcadenas literales, palabras completas (\\b...\\b) y regex en una sola alternativa."""
+    parts = []
+    if substrings:
+        parts.append(_trie(set(substrings)))
+    if words:
+        parts.append(rf"\b{_trie(set(words))}\b")
+    parts += [f"(?:{r})" for r in regexes]
+    return "|".join(parts)
+
+
+class _Scanner:
+    """
+    Regex combinada de todas las etiquetas de una forma de texto.
+
+    Subcadenas y palabras se resuelven con un trie cada una: en cada
+    posición el trie coincide con el literal más largo, y un diccionario
+    precalculado da las etiquetas de ese literal y de todos sus prefijos
+    (que también coinciden ahí). Las reglas regex llevan su propio grupo.
+    """
+
+    def __init__(self, rules: dict[tuple[str, str], dict]):
+        self.by_substring: dict[str, set] = {}
+        self.by_word: dict[str, set] = {}
+        regex_labels: list[tuple[tuple[str, str], str]] = []
+        for label, rule in rules.items():
+            for sub in rule.get("substring", ()):
+                self.by_substring.setdefault(sub, set()).add(label)
+            for word in rule.get("words", ()):
+                self.by_word.setdefault(word, set()).add(label)
+            if rule.get("regex"):
+                regex_labels.append((label, _alternatives(regexes=rule["regex"])))
+        # Cierre por prefijos: "cuánto me sale" también cuenta como "cuánto"
+        self.by_substring = {
+            sub: frozenset().union(*(labels for other, labels in self.by_substring.items() if sub.startswith(other)))
+            for sub in self.by_substring
+        }
+
+        guard = _alternatives(list(self.by_substring), list(self.by_word),
+                              dict.fromkeys(pattern for _, pattern in regex_labels))
+        parts = []
+        if self.by_substring:
+            parts.append(f"(?:(?=(?P<sub>{_trie(self.by_substring)})))?")
+        if self.by_word:
+            parts.append(rf"(?:(?=\b(?P<word>{_trie(self.by_word)})\b))?")
+        self.regex_labels = []
+        for i, (label, pattern) in enumerate(regex_labels):
+            parts.append(f"(?:(?=(?P<r{i}>{pattern})))?")
+            self.regex_labels.append((f"r{i}", label))
+        # Se consume un carácter por coincidencia: cada posición se visita una vez
+        self.regex = re.compile(f"(?=(?:{guard})){''.join(parts)}(?s:.)") if guard else None
+
+    def scan(self, text: str) -> dict[tuple[str, str], str]:
+        """(sección, etiqueta) -> texto de su primera coincidencia (la más a la izquierda)."""
+        hits: dict[tuple[str, str], str] = {}
+        if self.regex is None:
+            return hits
+        for m in self.regex.finditer(text):
+            found = m.groupdict()
+            sub, word = found.get("sub"), found.get("word")
+            if sub is not None:
+                for label in self.by_substring[sub]:
+                    hits.setdefault(label, sub)
+            if word is not None:
+                for label in self.by_word[word]:
+                    hits.setdefault(label, word)
+            for group, label in self.regex_labels:
+                value = found[group]
+                if value is not None:
+                    hits.setdefault(label, value)
+        return hits
+
+
+@dataclass(frozen=True)
+class RuleMatch:
+    intent: str                       # quote | faq | other
+    purchase_intent: str              # high | medium | low
+    additional: dict                  # {"faq", "discount_info", "should_escalate"}
+    logistics: tuple[bool, dict]      # (detectado, {"type", "city"})
+
+
+class RuleTable:
+    def __init__(self, spec: dict):
+        self.spec = spec
+
+    @cached_property
+    def _scanners(self) -> dict[str, _Scanner]:
+        by_form: dict[str, dict] = {"lower": {}, "folded": {}}
+        for section, body in self.spec.items():
+            for label, rule in body.get("rules", {}).items():
+                by_form[body["text"]][(section, label)] = rule
+        return {form: _Scanner(rules) for form, rules in by_form.items()}
+
+    @cached_property
+    def _city_patterns(self) -> tuple[list[re.Pattern], re.Pattern]:
+        city = self.spec.get("delivery_city", {})
+        patterns = [re.compile(p, re.UNICODE | re.IGNORECASE) for p in city.get("patterns", ())]
+        return patterns, re.compile(city.get("reject", r"(?!)"), re.IGNORECASE)
+
+    def compile(self) -> "RuleTable":
+        """Compila todas las regex ya (arranque) en lugar de en el primer mensaje."""
+        self._scanners, self._city_patterns
+        return self
+
+    @classmethod
+    def from_file(cls, path: str = RULES_FILE) -> "RuleTable":
+        with open(path, encoding="utf-8-sig") as f:
+            return cls(json.load(f))
+
+    # ------------------------------------------------------------------
+    def _decide(self, section: str, hits: dict) -> str:
+        body = self.spec[section]
+        for label, result in body.get("decide", ()):
+            if (section, label) in hits:
+                return result
+        return body["default"]
+
+    def lower_hits(self, text: str) -> dict:
+        return self._scanners["lower"].scan((text or "").lower())
+
+    def folded_hits(self, text: str) -> dict:
+        return self._scanners["folded"].scan(fold_text(text or ""))
+
+    def intent(self, text: str, hits: dict | None = None) -> str:
+        return self._decide("intent", self.lower_hits(text) if hits is None else hits)
+
+    def purchase_intent(self, text: str, hits: dict | None = None) -> str:
+        return self._decide("purchase_intent", self.lower_hits(text) if hits is None else hits)
+
+    def additional_intents(self, text: str, hits: dict | None = None) -> dict:
+        """FAQ / descuento / escalamiento con las reglas de prioridad originales."""
+        hits = self.lower_hits(text) if hits is None else hits
+        intents = {
+            "faq": ("additional", "faq") in hits,
+            "discount_info": ("additional", "discount_info") in hits,
+            "should_escalate": ("additional", "should_escalate") in hits,
+        }
+        if intents["should_escalate"]:
+            intents["faq"] = False
+            intents["discount_info"] = False
+        # Frases informativas que nunca deben escalar
+        if ("additional", "safe") in hits:
+            intents["should_escalate"] = False
+            intents["faq"] = True
+        return intents
+
+    def logistics(self, text: str, hits: dict | None = None) -> tuple[bool, dict]:
+        if not text:
+            return False, {}
+        hits = self.folded_hits(text) if hits is None else hits
+        if ("logistics", "trigger") not in hits:
+            return False, {}
+        subtype = self._decide("logistics", hits)
+        city = hits.get(("logistics", "city"))
+        city = city.split()[-1].title() if city else None
+        if city and subtype == "generic":
+            subtype = "city_delivery"
+        return True, {"type": subtype, "city": city}
+
+    def scan(self, text: str) -> RuleMatch:
+        """Todas las intenciones de un mensaje: una pasada por forma de texto."""
+        lower = self.lower_hits(text)
+        return RuleMatch(
+            intent=self.intent(text, lower),
+            purchase_intent=self.purchase_intent(text, lower),
+            additional=self.additional_intents(text, lower),
+            logistics=self.logistics(text, self.folded_hits(text) if text else None),
+        )
+
+    # ------------------------------------------------------------------
+    def delivery_city(self, message: str) -> str:
+        """Ciudad libre tras "en/a/para" en consultas de entrega ("" si no hay)."""
+        patterns, reject = self._city_patterns
+        for pattern in patterns:
+            match = pattern.search(message)
+            if match:
+                posible = match.group(1).strip()
+                # Evita falsos positivos como "entrega", "pedido", etc.
+                if not reject.search(posible):
+                    return " ".join(p.capitalize() for p in posible.split())
+        return ""
+
+
+RULES = RuleTable.from_file()
@@ -0,0 +1,139 @@
+"""
+Búsqueda vectorizada de productos por n-gramas de caracteres (requiere numpy).
+
+Alternativa a la etapa difusa de catalog.py (SequenceMatcher par a par),
+seleccionable con CATALOG_MATCHER=tfidf:
+
+- Cada nombre del catálogo y cada variante de synonyms.json se representa
+  como el conjunto de sus trigramas de caracteres ("papa" -> " pa", "pap",
+  "apa", "pa "), ponderados por idf.
+- La matriz trigrama × documento se guarda dispersa por columnas (CSC:
+  punteros + ids de documento); puntuar un mensaje contra todo el catálogo
+  es un solo producto matriz–vector (`np.bincount` sobre las columnas de
+  los trigramas del mensaje).
+- El puntaje es un Dice ponderado, 2·común / (masa_mensaje + masa_nombre),
+  análogo a SequenceMatcher.ratio(): los umbrales de catalog.py (0.65 y
+  0.4) conservan su sentido.
+
+Uso:
+    matcher = current_matcher()
+    matcher.top_k("precio del detergente en polvo", k=3)   # [(nid, score)]
+"""
+
+import math
+
+import numpy as np
+
+from app.core.catalog_store import STORE
+
+NGRAM = 3
+
+
+def char_ngrams(text: str, n: int = NGRAM) -> set[str]:
+    """Trigramas del texto normalizado, con bordes de palabra marcados por espacios."""
+    padded = f" {' '.join(text.split())} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class NgramMatcher:
+    """
+    Índice de trigramas de un CatalogIndex. Los ids devueltos son los mismos
+    `nid` de CatalogIndex (nombres normalizados únicos, en orden de catálogo).
+    """
+
+    def __init__(self, index):
+        from app.core.catalog import normalize_text
+
+        # Documentos: cada nombre y cada variante de sus sinónimos
+        docs: list[set[str]] = []
+        doc_name: list[int] = []
+        for nid, name in enumerate(index.names):
+            docs.append(char_ngrams(name))
+            doc_name.append(nid)
+        for key, variants in index.synonyms.items():
+            nid = index.name_ids.get(normalize_text(key))
+            if nid is None:
+                continue
+            for variant in variants:
+                norm_variant = normalize_text(variant)
+                if len(norm_variant) > 2:
+                    docs.append(char_ngrams(norm_variant))
+                    doc_name.append(nid)
+
+        postings: dict[str, list[int]] = {}
+        for doc_id, grams in enumerate(docs):
+            for g in grams:
+                postings.setdefault(g, []).append(doc_id)
+
+        n_docs = len(docs)
+        self.n_names = len(index.names)
+        self.columns = {g: col for col, g in enumerate(postings)}
+        self.idf = np.array([math.log(1 + n_docs / len(ids)) for ids in postings.values()])
+        # Trigramas ausentes del catálogo (errores de escritura, palabras
+        # ajenas al menú) pesan el idf medio, como un trigrama típico: con el
+        # máximo cada error contaría como la evidencia más rara y los mensajes
+        # largos quedarían por debajo de los umbrales, calibrados con la media
+        self.unknown_idf = float(np.mean(self.idf)) if len(self.idf) else 1.0
+
+        # CSC: la columna `c` ocupa rows[indptr[c]:indptr[c + 1]]
+        lengths = np.fromiter((len(ids) for ids in postings.values()), dtype=np.int64, count=len(postings))
+        self.indptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.indptr[1:])
+        self.rows = np.fromiter((d for ids in postings.values() for d in ids), dtype=np.int32,
+                                count=int(self.indptr[-1]))
+        self.weights = np.repeat(self.idf, lengths)
+
+        # Masa (suma de idf) de cada documento, denominador del Dice
+        self.doc_mass = np.bincount(self.rows, weights=self.weights, minlength=n_docs)
+        self.doc_name = np.array(doc_name, dtype=np.int32)
+
+    def scores(self, text: str) -> np.ndarray:
+        """Puntaje de cada nombre del catálogo frente a `text` (ya normalizado)."""
+        grams = char_ngrams(text)
+        cols = [self.columns[g] for g in grams if g in self.columns]
+        query_mass = sum(self.idf[c] for c in cols) + self.unknown_idf * (len(grams) - len(cols))
+        if not cols:
+            return np.zeros(self.n_names)
+
+        # Producto matriz–vector: solo se recorren las columnas del mensaje
+        slices = [slice(self.indptr[c], self.indptr[c + 1]) for c in cols]
+        rows = np.concatenate([self.rows[s] for s in slices])
+        common = np.bincount(rows, weights=np.concatenate([self.weights[s] for s in slices]),
+                             minlength=len(self.doc_mass))
+
+        doc_scores = 2.0 * common / (query_mass + self.doc_mass)
+        # Los primeros documentos son los nombres (doc == nid); cada nombre
+        # vale lo que su mejor documento, nombre o sinónimo
+        best = doc_scores[:self.n_names]
+        synonyms = doc_scores[self.n_names:]
+        hit = np.flatnonzero(synonyms)
+        np.maximum.at(best, self.doc_name[self.n_names + hit], synonyms[hit])
+        return best
+
+    def top_k(self, text: str, k: int = 5) -> list[tuple[int, float]]:
+        """Los `k` nombres con mayor puntaje; empates a favor del primero del catálogo."""
+        scores = self.scores(text)
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((top, -scores[top]))]
+        return [(int(nid), float(scores[nid])) for nid in top if scores[nid] > 0]
+
+    def best(self, text: str) -> tuple[int | None, float]:
+        """Mejor nombre y su puntaje; (None, 0.0) si no comparte ningún trigrama."""
+        scores = self.scores(text)
+        if not len(scores):
+            return None, 0.0
+        nid = int(np.argmax(scores))  # en empate, el primero del catálogo
+        return (nid, float(scores[nid])) if scores[nid] > 0 else (None, 0.0)
+
+
+def _build_matcher(snap) -> NgramMatcher:
+    from app.core.catalog import _build_index
+    return NgramMatcher(snap.artifact("catalog_index", _build_index))
+
+
+def current_matcher() -> NgramMatcher:
+    """Matcher del snapshot vigente (se construye una vez por versión)."""
+    return STORE.current().artifact("ngram_matcher", _build_matcher)
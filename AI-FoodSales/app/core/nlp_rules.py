@@ -1,107 +1,62 @@
 # app/core/nlp_rules.py
-from pydoc import text
-import json, os, re
+import re, unicodedata
 from difflib import SequenceMatcher
 
-DATA_DIR = os.path.join('app', 'data')
-SYNONYMS_FILE = os.path.join(DATA_DIR, 'synonyms.json')
+from app.core.catalog_store import STORE
+from app.core.intent_rules import RULES
 
 
 # -------------------------------------------------------------
-# INTENCIÓN GENERAL
+# INTENCIÓN GENERAL, DE COMPRA Y LOGÍSTICA
 # -------------------------------------------------------------
+# Las palabras clave viven en app/data/intent_rules.json (ver intent_rules.py);
+# MessageAnalysis usa RULES.scan para obtenerlas todas de una vez.
 def detect_intent(text: str) -> str:
-    text = text.lower()
-    if any(k in text for k in ['precio', 'cuánto', 'cotiza', 'total', 'cuenta']):
-        return 'quote'
-    if any(k in text for k in ['tiempo', 'entrega', 'mínimo', 'pago', 'invima', 'certificado']):
-        return 'faq'
-    return 'other'
+    return RULES.intent(text)
 
 
-# -------------------------------------------------------------
-# INTENCIÓN DE COMPRA
-# -------------------------------------------------------------
 def detect_purchase_intent(text: str) -> str:
-    text = text.lower()
-
-    high_intent = [
-        "envíame", "hazme la cuenta", "quiero pedir", "cotízame",
-        "necesito para", "urgente", "mándame la cotización",
-        "cómo te pago", "cuánto me sale", "ya tengo pedido"
-    ]
-
-    medium_intent = [
-        "me interesa", "cuánto vale", "qué precio tiene",
-        "pueden enviar", "cuánto demora", "quiero saber si tienen",
-        "podrían cotizarme", "estoy mirando precios"
-    ]
-
-    if any(p in text for p in high_intent):
-        return "high"
-    elif any(p in text for p in medium_intent):
-        intent = "medium"
-    else:
-        intent = "low"
-
-    # Detección de pedidos grandes
-    if re.search(r'(\b\d+\s*(unidades?|cajas?|bultos?|litros?|kilos?|sacos?)\b|\bpedido grande\b|\ben cantidad\b)', text):
-        return "high"
+    return RULES.purchase_intent(text)
 
-    return intent
 
-
-# -------------------------------------------------------------
-# INTENCIÓN LOGÍSTICA
-# -------------------------------------------------------------
 def detect_logistics_intent(text: str) -> tuple[bool, dict]:
     """
     Detecta si el mensaje se refiere a temas logísticos (entrega, cobertura, etc.).
     Retorna (True/False, {"type": str, "city": Optional[str]}).
     """
-    if not text:
-        return False, {}
-
-    import unicodedata
-
-    text = text.lower().strip()
-    text = unicodedata.normalize("NFKD", text)
-    text = "".join(c for c in text if not unicodedata.combining(c))
-    text = text.replace("¿", "").replace("?", "").replace("¡", "").replace("!", "")
-
-    logistics_keywords = [
-        r"\b(entrega|entregan|entregar|entregado|entregas)\b",
-        r"\b(envio|envian|enviar|enviarlo|envios)\b",
-        r"\b(despacho|despachos|despachan|despachar)\b",
-        r"\b(reparto|repartos|domicilio|domicilios|mensajeria|repartidor)\b",
-        r"\b(cobertura|cubren|alcance)\b",
-        r"\b(horario|hora|horas|mañana|tarde|noche|noches|fines?\s+de\s+semana|sabados?|domingos?)\b"
-    ]
-
-    if not any(re.search(pat, text) for pat in logistics_keywords):
-        return False, {}
-
-    # Tipificación logística
-    if re.search(r"\b(fines?\s+de\s+semana|sabados?|domingos?)\b", text):
-        subtype = "weekend"
-    elif re.search(r"\b(horario|hora|horas|mañana|tarde|noche|noches)\b", text):
-        subtype = "time_window"
-    elif re.search(r"\b(cobertura|cubren|alcance|otras?\s+ciudades|fuera|nacional|envian\s+a)\b", text):
-        subtype = "coverage"
-    elif re.search(r"\b(cuanto\s+tardan?|tiempos?\s+de\s+entrega|plazo)\b", text):
-        subtype = "delivery_time"
-    else:
-        subtype = "generic"
+    return RULES.logistics(text)
 
-    city_match = re.search(
-        r"\b(en|a)\s+(bogota|medellin|cali|barranquilla|cartagena|bucaramanga|pereira|manizales|cucuta)\b",
-        text,
-    )
-    city = city_match.group(2).title() if city_match else None
-    if city and subtype == "generic":
-        subtype = "city_delivery"
 
-    return True, {"type": subtype, "city": city}
+# -------------------------------------------------------------
+# AJUSTES AL CARRITO (conversaciones con sesión)
+# -------------------------------------------------------------
+_CART_ADD_RE = re.compile(
+    r"\b(?:agrega|agregale|agregame|agregar|agregue|anade|anadele|suma|sumale|sumar|"
+    r"adiciona|pon|ponle|ponme|mete|metele)\s+(?:otr[oa]s\s+)?(\d+)\b"
+    r"|\botr[oa]s\s+(\d+)\b"
+    r"|\b(\d+)\s+(?:\w+\s+){0,3}?mas\b"
+)
+_CART_REMOVE_RE = re.compile(
+    r"\b(?:quita|quitale|quitame|quitar|resta|restale|saca|sacale|elimina|elimine|descuenta)\s+(\d+)\b"
+    r"|\b(\d+)\s+(?:\w+\s+){0,3}?menos\b"
+)
+
+
+def detect_cart_update(text: str) -> tuple[str, int] | None:
+    """
+    Detecta ajustes relativos al pedido en curso: "agrega 10 más",
+    "otras 5", "quita 3". Retorna ("add" | "remove", cantidad) o None.
+    """
+    if not text:
+        return None
+    plain = strip_accents(text.lower())
+    for action, pattern in (("remove", _CART_REMOVE_RE), ("add", _CART_ADD_RE)):
+        m = pattern.search(plain)
+        if m:
+            qty = int(next(g for g in m.groups() if g))
+            if qty > 0:
+                return action, qty
+    return None
 
 
 # -------------------------------------------------------------
@@ -113,15 +68,8 @@ def normalize_input(text: str) -> list[str]:
     Devuelve lista con nombres canónicos encontrados.
     Soporta plurales, errores menores y coincidencias parciales.
     """
-    import unicodedata
-    from difflib import SequenceMatcher
-
-    # Cargar sinónimos
-    try:
-        with open(SYNONYMS_FILE, encoding='utf-8') as f:
-            synonyms = json.load(f)
-    except Exception:
-        synonyms = {}
+    # Sinónimos del snapshot vigente (sin I/O por mensaje)
+    synonyms = STORE.current().synonyms
 
     # Normalizar texto (acentos y espacios)
     msg = text.lower().strip()
@@ -162,119 +110,124 @@ def detect_additional_intents(text: str) -> dict:
     Detecta intenciones adicionales: FAQ, discount_info, should_escalate.
     Prioridad: should_escalate > logistics > faq > discount.
     """
-    text = text.lower()
-    intents = {"faq": False, "discount_info": False, "should_escalate": False}
-
-    # --- FAQ detection ---
-    faq_keywords = [
-        "mínimo", "minimos", "compra mínima", "pedido mínimo",
-        "forma de pago", "formas de pago", "pago", "pagos",
-        "contraentrega", "efectivo", "tarjeta", "crédito", "débito",
-        "devolución", "devoluciones", "cambio", "cambios",
-        "reembolso", "reembolsos", "tiempo de entrega", "entregan",
-        "cuánto se demora la entrega", "disponibilidad", "stock", "existencias",
-        "dañado", "mal olor", "defectuoso", "combinar", "mezclar", "mismo pedido",
-        "certificado", "invima", "iva"
-    ]
-    if any(k in text for k in faq_keywords):
-        intents["faq"] = True
-
-    # --- Discounts detection ---
-    discount_keywords = [
-        "promocion", "promoción", "oferta", "descuento", "descuentos",
-        "rebaja", "promo", "en oferta"
-    ]
-    if any(k in text for k in discount_keywords):
-        intents["discount_info"] = True
-
-    # --- Escalation detection ---
-    escalate_keywords = [
-        "reclamo", "problema", "queja", "error", "equivocado",
-        "confusión", "pedido incorrecto", "producto equivocado",
-        "pedido incompleto", "demora", "retraso", "no ha llegado", "todavía no llega",
-        "repartidor", "cobrado", "cobro incorrecto", "precio distinto",
-        "olvidó", "olvido", "esperando", "falta", "dañado", "cambio", "incompleto otra vez"
-    ]
+    return RULES.additional_intents(text)
 
-    if any(k in text for k in escalate_keywords):
-        intents["should_escalate"] = True
 
-    # --- Priority rules ---
-    if intents["should_escalate"]:
-        intents["faq"] = False
-        intents["discount_info"] = False
-
-    # --- Safe overrides ---
-    # Frases informativas que nunca deben escalar
-    safe_keywords = ["invima", "certificado invima", "iva", "descuento", "promoción", "oferta", "certificado"]
-    if any(sk in text for sk in safe_keywords):
-        intents["should_escalate"] = False
-        intents["faq"] = True
+# ---Extraer múltiples productos y cantidades ---
+def strip_accents(s: str) -> str:
+    """Minúsculas y sin tildes (NFKD), la forma que usa el extractor."""
+    s = s.lower().strip()
+    s = unicodedata.normalize("NFKD", s)
+    return "".join(c for c in s if not unicodedata.combining(c))
 
-    return intents
 
+class QuantityExtractor:
+    """
+    Extractor multiproducto compilado una vez por versión de synonyms.json.
+
+    Cada producto canónico conserva su patrón original (variantes con
+    plurales s/es y cantidad antes o después). Un índice de trigramas sobre
+    el primer token de cada variante permite recorrer el mensaje una sola
+    vez y evaluar solo los productos que pueden aparecer. Los patrones se
+    compilan la primera vez que su producto es candidato (o todos juntos
+    con `compile_all`, en el calentamiento de arranque).
+    """
 
-# ---Extraer múltiples productos y cantidades ---
-def extract_products_and_quantities(message: str) -> list[dict]:
+    NGRAM = 3
+
+    def __init__(self, synonyms: dict):
+        self.products = []      # (canonical, grupo de variantes)
+        self._compiled: dict[int, tuple[re.Pattern, re.Pattern]] = {}
+        self.postings: dict[str, list[tuple[str, int]]] = {}
+        self.always: set[int] = set()
+
+        for pid, (canonical, variants) in enumerate(synonyms.items()):
+            patterns = []
+            for v in variants + [canonical]:
+                v_norm = strip_accents(v)
+                tokens = re.escape(v_norm).split("\\ ")
+                patterns.append(r"\s+".join([rf"{t}(?:s|es)?" for t in tokens]))
+
+                # Literal que toda coincidencia de esta variante contiene
+                head = v_norm.split(" ")[0]
+                if len(head) < self.NGRAM or "\\" in v_norm:
+                    self.always.add(pid)
+                else:
+                    self.postings.setdefault(head[:self.NGRAM], []).append((head, pid))
+
+            self.products.append((canonical, "(?:" + "|".join(patterns) + ")"))
+
+    def patterns(self, pid: int) -> tuple[re.Pattern, re.Pattern]:
+        """(patrón con cantidad, patrón sin cantidad) del producto, compilados una vez."""
+        compiled = self._compiled.get(pid)
+        if compiled is None:
+            variant_group = self.products[pid][1]
+            # detectar cantidades antes o después del producto
+            with_qty = re.compile(
+                rf"(?:\b(\d+)\s*(?:unidades?|paquetes?|cajas?|bolsas?|litros?|kilos?|x)?\s*(?:de\s+)?{variant_group}(?:\s+\w+){{0,2}}"
+                rf"|\b{variant_group}(?:\s+\w+){{0,2}}\s*(?:de\s+)?(\d+)\b)"
+            )
+            bare = re.compile(rf"\b{variant_group}\b")
+            compiled = self._compiled.setdefault(pid, (with_qty, bare))
+        return compiled
+
+    def compile_all(self) -> "QuantityExtractor":
+        for pid in range(len(self.products)):
+            self.patterns(pid)
+        return self
+
+    def candidates(self, txt: str) -> list[int]:
+        found = set(self.always)
+        for i in range(len(txt) - self.NGRAM + 1):
+            for head, pid in self.postings.get(txt[i:i + self.NGRAM], ()):
+                if pid not in found and head in txt:
+                    found.add(pid)
+        return sorted(found)
+
+    def scan(self, message: str, normalized: str | None = None) -> list[tuple[str, int, tuple[int, int]]]:
+        """
+        Devuelve (canónico, cantidad, span) por producto, en el orden de
+        synonyms.json. El span es el de la primera coincidencia sobre el
+        texto normalizado (minúsculas y sin tildes).
+        """
+        txt = normalized if normalized is not None else strip_accents(message or "")
+        found = []
+        for pid in self.candidates(txt):
+            canonical = self.products[pid][0]
+            with_qty, bare = self.patterns(pid)
+            qty, span = 0, None
+            for m in with_qty.finditer(txt):
+                num = m.group(1) or m.group(2)
+                if num:
+                    qty += int(num)
+                    span = span or m.span()
+
+            # si aparece sin número, contar 1
+            if qty == 0:
+                m = bare.search(txt)
+                if m:
+                    qty, span = 1, m.span()
+
+            if qty > 0:
+                found.append((canonical, qty, span))
+        return found
+
+
+def _build_extractor(snap) -> QuantityExtractor:
+    return QuantityExtractor(snap.synonyms)
+
+
+def current_extractor() -> QuantityExtractor:
+    """Extractor del snapshot vigente; se recompila solo al cambiar la versión."""
+    return STORE.current().artifact("quantity_extractor", _build_extractor)
+
+
+def extract_products_and_quantities(message: str, normalized: str | None = None) -> list[dict]:
     """
     Extrae múltiples pares (producto, cantidad) usando SOLO synonyms.json.
     Tolera plurales ('papas', 'yogures', 'jugos', etc.) sin cambiar el JSON.
     """
-    import json, os, re, unicodedata
-
-    DATA_DIR = os.path.join("app", "data")
-    SYNONYMS_FILE = os.path.join(DATA_DIR, "synonyms.json")
-
-    def norm(s: str) -> str:
-        s = s.lower().strip()
-        s = unicodedata.normalize("NFKD", s)
-        return "".join(c for c in s if not unicodedata.combining(c))
-
-    txt = norm(message or "")
-
-    try:
-        with open(SYNONYMS_FILE, encoding="utf-8") as f:
-            synonyms = json.load(f)
-    except Exception:
-        return []
-
-    found_items = []
-
-    for canonical, variants in synonyms.items():
-        qty = 0
-        # construir patrón que acepte plurales (s/es)
-        patterns = []
-        for v in variants + [canonical]:
-            v_norm = norm(v)
-            tokens = re.escape(v_norm).split("\\ ")
-            v_regex = r"\s+".join([rf"{t}(?:s|es)?" for t in tokens])
-            patterns.append(v_regex)
-
-        variant_group = "(?:" + "|".join(patterns) + ")"
-
-        # detectar cantidades antes o después del producto
-        #pattern = rf"(?:\b(\d+)\s+(?:de\s+)?{variant_group}(?:\s+\w+){{0,2}}|\b{variant_group}(?:\s+\w+){{0,2}}\s*(?:de\s+)?(\d+)\b)"
-        pattern = rf"(?:\b(\d+)\s*(?:unidades?|paquetes?|cajas?|bolsas?|litros?|kilos?|x)?\s*(?:de\s+)?{variant_group}(?:\s+\w+){{0,2}}|\b{variant_group}(?:\s+\w+){{0,2}}\s*(?:de\s+)?(\d+)\b)"
-        matches = re.finditer(pattern, txt)
-
-        for m in matches:
-            num = m.group(1) or m.group(2)
-            if num:
-                qty += int(num)
-
-        # si aparece sin número, contar 1
-        if qty == 0 and re.search(rf"\b{variant_group}\b", txt):
-            qty = 1
-
-        if qty > 0:
-            found_items.append({"nombre": canonical, "cantidad": qty})
-
-    # eliminar duplicados
-    unique, seen = [], set()
-    for item in found_items:
-        if item["nombre"] not in seen:
-            unique.append(item)
-            seen.add(item["nombre"])
-
-    return unique
-
+    return [
+        {"nombre": canonical, "cantidad": qty}
+        for canonical, qty, _span in current_extractor().scan(message, normalized)
+    ]
@@ -1,45 +1,146 @@
 import re
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
 
-def calculate_total(product, cantidad):
-    clean_product = {k.strip().lower(): v for k, v in product.items()}
-    nombre  = clean_product.get("nombre", "Producto sin nombre")
-    formato = clean_product.get("formato", "")
-    info_descuento = str(clean_product.get("descuento_mayorista_volumen", "")).strip()
-    print(f"[TRACE] info_descuento -> '{info_descuento}'", flush=True)
+from app.core.catalog_store import STORE
 
-    try:
-        precio = float(str(clean_product.get("precio_lista", 0)).replace(",", "."))
-    except ValueError:
-        precio = 0.0
-
-    # --------------------- DESCUENTO POR VOLUMEN ---------------------
-    # Extrae el número justo antes del símbolo %, ignorando todo lo anterior
-    porcentaje = 0.0
-    umbral = 0
-
-    # Busca el número que precede directamente al '%'
-    m_desc = re.search(r"(\d+(?:[.,]\d+)?)\s*%\s*a partir de\s+(\d+)\s+unidades", info_descuento)
-    if m_desc:
-        porcentaje_txt = m_desc.group(1).replace(",", ".")
-        try:
-            porcentaje = float(porcentaje_txt)
-        except ValueError:
-            porcentaje = 0.0
-        umbral = int(m_desc.group(2))
-
-    # --------------------- CÁLCULO ---------------------
-    subtotal = precio * cantidad
-
-    if porcentaje > 0 and umbral > 0 and cantidad >= umbral:
-        descuento_valor = subtotal * (porcentaje / 100.0)
-        total = subtotal - descuento_valor
-        return (
-            f"{cantidad} × {nombre} ({formato}) = ${subtotal:,.0f} COP\n"
-            f"Descuento aplicado: {porcentaje:.1f}% (-${descuento_valor:,.0f})\n"
-            f"Total: ${total:,.0f} COP"
-        )
-    else:
+# "10% a partir de 45 unidades"; puede haber varios tramos en el mismo texto
+DISCOUNT_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*%\s*a partir de\s+(\d+)\s+unidades")
+ZERO = Decimal(0)
+PESO = Decimal(1)
+
+
+@dataclass(frozen=True)
+class DiscountTier:
+    percent: Decimal
+    min_units: int
+
+
+@dataclass(frozen=True)
+class PricedSku:
+    """Fila del catálogo ya interpretada: precio y tramos de descuento."""
+    nombre: str
+    formato: str
+    precio: Decimal
+    tiers: tuple[DiscountTier, ...] = ()
+
+    def tier_for(self, cantidad: int) -> DiscountTier | None:
+        """Tramo de mayor umbral alcanzado por la cantidad (tiers ordenados)."""
+        best = None
+        for tier in self.tiers:
+            if cantidad >= tier.min_units:
+                best = tier
+        return best
+
+
+@dataclass(frozen=True)
+class QuoteLine:
+    nombre: str
+    formato: str
+    cantidad: int
+    subtotal: Decimal
+    discount_percent: Decimal
+    discount: Decimal
+    total: Decimal
+
+    @property
+    def rounded_total(self) -> Decimal:
+        """Total de la línea en pesos enteros, tal como se muestra."""
+        return self.total.quantize(PESO, rounding=ROUND_HALF_EVEN)
+
+    def format(self) -> str:
+        if self.discount:
+            return (
+                f"{self.cantidad} × {self.nombre} ({self.formato}) = ${self.subtotal:,.0f} COP\n"
+                f"Descuento aplicado: {self.discount_percent:.1f}% (-${self.discount:,.0f})\n"
+                f"Total: ${self.total:,.0f} COP"
+            )
         return (
-            f"{cantidad} × {nombre} ({formato}) = ${subtotal:,.0f} COP\n"
-            f"Total: ${subtotal:,.0f} COP"
+            f"{self.cantidad} × {self.nombre} ({self.formato}) = ${self.subtotal:,.0f} COP\n"
+            f"Total: ${self.subtotal:,.0f} COP"
         )
+
+
+@dataclass(frozen=True)
+class Quote:
+    lines: tuple[QuoteLine, ...]
+
+    @property
+    def total(self) -> Decimal:
+        """Suma de los totales de línea mostrados (sin reparsear texto)."""
+        return sum((line.rounded_total for line in self.lines), ZERO)
+
+
+def _to_decimal(value) -> Decimal:
+    try:
+        amount = Decimal(str(value).replace(",", "."))
+    except InvalidOperation:
+        return ZERO
+    return amount if amount.is_finite() else ZERO
+
+
+def parse_product(product: dict) -> PricedSku:
+    """Interpreta una fila del catálogo (claves tolerantes a espacios/mayúsculas)."""
+    clean_product = {k.strip().lower(): v for k, v in product.items() if isinstance(k, str)}
+    info_descuento = str(clean_product.get("descuento_mayorista_volumen", "")).strip()
+
+    tiers = []
+    for m in DISCOUNT_RE.finditer(info_descuento):
+        percent = _to_decimal(m.group(1))
+        min_units = int(m.group(2))
+        if percent > 0 and min_units > 0:
+            tiers.append(DiscountTier(percent, min_units))
+    tiers.sort(key=lambda t: t.min_units)
+
+    return PricedSku(
+        nombre=clean_product.get("nombre", "Producto sin nombre"),
+        formato=clean_product.get("formato", ""),
+        precio=_to_decimal(clean_product.get("precio_lista", 0)),
+        tiers=tuple(tiers),
+    )
+
+
+class PricingEngine:
+    """
+    Cotizador construido una vez por snapshot del catálogo: cada fila se
+    interpreta al cargar y las cotizaciones se calculan con Decimal; el
+    texto solo se genera al final (QuoteLine.format).
+    """
+
+    def __init__(self, catalog: list[dict]):
+        self._parsed = {id(row): (row, parse_product(row)) for row in catalog}
+
+    def sku_for(self, product: dict) -> PricedSku:
+        entry = self._parsed.get(id(product))
+        if entry is not None and entry[0] is product:
+            return entry[1]
+        # Fila fuera del catálogo (p. ej. dict armado a mano)
+        return parse_product(product)
+
+    def quote(self, product: dict, cantidad: int) -> QuoteLine:
+        sku = self.sku_for(product)
+        subtotal = sku.precio * cantidad
+        tier = sku.tier_for(cantidad)
+        if tier is None:
+            return QuoteLine(sku.nombre, sku.formato, cantidad, subtotal, ZERO, ZERO, subtotal)
+        discount = subtotal * tier.percent / 100
+        return QuoteLine(sku.nombre, sku.formato, cantidad, subtotal, tier.percent, discount, subtotal - discount)
+
+    def quote_many(self, items) -> Quote:
+        """Cotiza un carrito completo: iterable de (fila, cantidad)."""
+        quote = self.quote
+        return Quote(tuple(quote(product, cantidad) for product, cantidad in items))
+
+
+def _build_engine(snap) -> PricingEngine:
+    return PricingEngine(snap.catalog)
+
+
+def current_pricing() -> PricingEngine:
+    """Cotizador del snapshot vigente."""
+    return STORE.current().artifact("pricing_engine", _build_engine)
+
+
+def calculate_total(product, cantidad):
+    """Compatibilidad: cotiza una línea y la devuelve ya formateada."""
+    return current_pricing().quote(product, cantidad).format()
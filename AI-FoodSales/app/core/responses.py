@@ -9,9 +9,16 @@ Descripción:
   - 100 % compatible con formato JSON y manejo de multiproducto
 """
 
-from unittest import result
+import re
+
+from app.core.analysis import MessageAnalysis
+from app.core.faq_index import faq_index
+from app.core.intent_rules import RULES
+from app.core.pricing import current_pricing
+from app.utils import tracing
 from app.core.summary import build_summary
-from app.core.escalation import should_escalate
+
+_IVA_RE = re.compile(r"\biva\b")
 
 
 # --- BLOQUE NUEVO: Cortesía Contextual ---
@@ -48,9 +55,10 @@ def generate_courtesy_response(message: str) -> dict:
 # --- FIN BLOQUE NUEVO ---
 
 
-def generate_response(product_data: dict, message: str):
+def generate_response(product_data: dict, message: str, analysis: MessageAnalysis | None = None):
     """
     Genera la respuesta del agente de ventas.
+    `analysis` reutiliza el análisis del mensaje ya calculado en la petición.
     """
 
     if not message or not isinstance(message, str):
@@ -61,12 +69,12 @@ def generate_response(product_data: dict, message: str):
         }
 
     msg = message.lower().strip()
+    analysis = analysis or MessageAnalysis(message)
     should_escalate_flag = False
     response_text = ""
 
     # --- EXCEPCIÓN: consultas sobre IVA ---
-    import re
-    if re.search(r"\biva\b", msg) or "incluye iva" in msg or "precio con iva" in msg:
+    if _IVA_RE.search(msg) or "incluye iva" in msg or "precio con iva" in msg:
         response_text = (
             "Todos nuestros precios incluyen IVA, salvo que se indique lo contrario en la descripción del producto."
         )
@@ -90,33 +98,7 @@ def generate_response(product_data: dict, message: str):
     
     # --- EXCEPCIÓN: tiempos de entrega por ciudad o región ---
     if "entrega" in msg or "llegada" in msg:
-        import re
-
-        # Detecta ciudad tras "en", "a" o "para", incluso con frases intermedias
-        match = re.search(
-            r"(?:en|a|para)\s+(?:la\s+entrega\s+a\s+)?([A-ZÁÉÍÓÚÑa-záéíóúñ]{3,}(?:\s+[A-ZÁÉÍÓÚÑa-záéíóúñ]+)*)",
-            message,
-            re.UNICODE | re.IGNORECASE
-        )
-
-        ciudad = ""
-        if match:
-            posible = match.group(1).strip()
-            # Evita falsos positivos como "entrega", "pedido", etc.
-            if not re.search(r"\b(entrega|pedido|compra|envío|orden|la|el|los|las|para|en|a)\b", posible, re.IGNORECASE):
-                ciudad = " ".join([p.capitalize() for p in posible.split()])
-
-        # Si no detectó ciudad pero la frase tiene 'para' seguido de un nombre, capturarlo igualmente
-        if not ciudad:
-            match_alt = re.search(
-                r"para\s+([A-ZÁÉÍÓÚÑa-záéíóúñ]{3,}(?:\s+[A-ZÁÉÍÓÚÑa-záéíóúñ]+)*)",
-                message,
-                re.UNICODE | re.IGNORECASE
-            )
-            if match_alt:
-                posible = match_alt.group(1).strip()
-                if not re.search(r"\b(entrega|pedido|compra|envío|orden|la|el|los|las|para|en|a)\b", posible, re.IGNORECASE):
-                    ciudad = " ".join([p.capitalize() for p in posible.split()])
+        ciudad = RULES.delivery_city(message)
 
         if ciudad:
             response_text = f"El tiempo estimado de entrega en {ciudad} es de 2 a 5 días hábiles, según disponibilidad logística."
@@ -132,7 +114,7 @@ def generate_response(product_data: dict, message: str):
 
 
 
-    result = should_escalate(msg)
+    result = analysis.escalation()
 
 
     # 💬 1️⃣ PRIORIDAD: sarcasmo o reclamo ANTES de cortesía
@@ -141,7 +123,7 @@ def generate_response(product_data: dict, message: str):
         complaint_score = result["summary"]["scores"]["complaint"]
         if sarcasm_score >= 0.8 or complaint_score >= 1.2:
             result["should_escalate"] = True
-            print(">>> RESPUESTA ESCALADA (sarcasmo/reclamo detectado)")
+            tracing.event("responses.escalated", sarcasm=sarcasm_score, complaint=complaint_score)
             return result
 
     # 💬 2️⃣ Cortesía natural (saludos, agradecimientos, cierres)
@@ -162,8 +144,7 @@ def generate_response(product_data: dict, message: str):
         }
 
     # 🧠 4️⃣ Intenciones adicionales (descuentos, FAQ, etc.)
-    from app.core.nlp_rules import detect_additional_intents
-    intents = detect_additional_intents(message)
+    intents = analysis.intents
     if intents["should_escalate"]:
         should_escalate_flag = True
 
@@ -176,22 +157,29 @@ def generate_response(product_data: dict, message: str):
         }
 
     if intents["faq"]:
-        response_text = (
-            "Pedidos mínimos: 4 unidades (Congelados), 5 (Lácteos), 12 (Bebidas) o $200.000 COP mixto.\n"
-            "Tiempos de entrega: 2–3 días hábiles principales / 4–6 regionales.\n"
-            "Formas de pago: transferencia, tarjeta o contraentrega (zonas urbanas).\n"
-            "Devoluciones: máximo 24h con evidencia.\n"
-            "¿Quieres que te gestione una cotización o más información?"
-        )
+        # Respuesta puntual si el índice encuentra una entrada concluyente
+        hit = faq_index().best_answer(message)
+        if hit is not None:
+            tracing.event("responses.faq", title=hit.entry.title, score=hit.score)
+            response_text = f"{hit.answer}\n¿Quieres que te gestione una cotización o más información?"
+        else:
+            response_text = (
+                "Pedidos mínimos: 4 unidades (Congelados), 5 (Lácteos), 12 (Bebidas) o $200.000 COP mixto.\n"
+                "Tiempos de entrega: 2–3 días hábiles principales / 4–6 regionales.\n"
+                "Formas de pago: transferencia, tarjeta o contraentrega (zonas urbanas).\n"
+                "Devoluciones: máximo 24h con evidencia.\n"
+                "¿Quieres que te gestione una cotización o más información?"
+            )
+        summary = build_summary(message, response_text)
+        summary["faq"] = hit.entry.title if hit is not None else None
         return {
             "agent_response": response_text,
             "should_escalate": should_escalate_flag,
-            "summary": build_summary(message, response_text),
+            "summary": summary,
         }
 
     # 🚚 5️⃣ Logística
-    from app.core.nlp_rules import detect_logistics_intent
-    logistic_detected, logistic_data = detect_logistics_intent(message)
+    logistic_detected, logistic_data = analysis.logistics
     if logistic_detected:
         subtype = logistic_data.get("type")
         city = logistic_data.get("city")
@@ -202,43 +190,22 @@ def generate_response(product_data: dict, message: str):
             "summary": build_summary(message, response_text),
         }
     # 📦 6️⃣ Productos (soporte multiproducto con cálculo de precios)
-    print(f"[DEBUG] product_data recibido en responses: {product_data}", flush=True)
+    tracing.event("responses.product", product_data=product_data)
 
     # 📦 Productos (soporte multiproducto con cálculo de precios)
     if product_data:
-        from app.core.pricing import calculate_total
-        response_lines = []
-        total_general = 0
+        pricing = current_pricing()
 
         # Soporte multiproducto
         if isinstance(product_data, list):
-            for p in product_data:
-                cantidad = int(p.get("cantidad", 1))
-                print(f"[RESPONSES] Invocando calculate_total() para {p.get('nombre')}", flush=True)
-                print(f"[TRACE] p keys: {list(p.keys())}", flush=True)
-
-                # calculate_total retorna string, pero podemos extraer valor numérico
-                line_text = calculate_total(p, cantidad)
-                response_lines.append(line_text)
-
-                # Captura numérica del total por producto (solo números)
-                import re
-                m = re.search(r"Total: \$([\d,.]+)", line_text)
-                if m:
-                    total_general += float(m.group(1).replace(",", ""))
-
+            quote = pricing.quote_many((p, int(p.get("cantidad", 1))) for p in product_data)
         else:
-            cantidad = int(product_data.get("cantidad", 1))
-            print(f"[RESPONSES] Invocando calculate_total() para {product_data.get('nombre')}", flush=True)
-            line_text = calculate_total(product_data, cantidad)
-            response_lines.append(line_text)
-            import re
-            m = re.search(r"Total: \$([\d,.]+)", line_text)
-            if m:
-                total_general += float(m.group(1).replace(",", ""))
-
-        if total_general > 0:
-            response_lines.append(f"Total general: ${total_general:,.0f} COP")
+            quote = pricing.quote_many([(product_data, int(product_data.get("cantidad", 1)))])
+        tracing.event("pricing.quote", lines=len(quote.lines), total=quote.total)
+
+        response_lines = [line.format() for line in quote.lines]
+        if quote.total > 0:
+            response_lines.append(f"Total general: ${quote.total:,.0f} COP")
 
         response_text = "\n".join(response_lines)
     else:
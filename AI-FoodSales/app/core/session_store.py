@@ -0,0 +1,148 @@
+"""
+Estado de conversación por sesión AI-FoodSales.
+
+Cada `session_id` guarda el carrito en curso, la última ciudad y el último
+producto mencionados y un historial corto de escalamientos, de modo que
+los mensajes siguientes ("agrega 10 más", "¿y a Cali?") se resuelven
+sobre ese contexto en lugar de volver a analizar toda la conversación.
+
+El estado se guarda compacto (tuplas serializadas con marshal) en un
+backend con la interfaz mínima de un cliente Redis: get / set(ex=) /
+delete. Por defecto es `MemoryBackend` (en proceso, TTL + LRU); con
+SESSION_BACKEND=redis://... se usa un servidor Redis real (requiere el
+paquete `redis`).
+
+Configuración:
+    SESSION_BACKEND      memory | redis://host:puerto/db   (memory)
+    SESSION_TTL          segundos de inactividad antes de expirar (1800)
+    SESSION_MAX_ENTRIES  sesiones máximas en memoria (100000)
+"""
+
+import marshal, os, threading, time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_TTL = int(os.getenv("SESSION_TTL", "1800"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "100000"))
+MAX_ESCALATIONS = 10
+KEY_PREFIX = "foodsales:session:"
+
+
+@dataclass
+class SessionState:
+    cart: dict[str, int] = field(default_factory=dict)     # producto canónico -> cantidad
+    city: str | None = None
+    last_product: str | None = None
+    escalations: list[tuple[int, str]] = field(default_factory=list)   # (epoch, motivo)
+
+    def add(self, product: str, qty: int) -> None:
+        """Suma (o resta, si qty < 0) unidades; elimina la línea si queda en cero."""
+        total = self.cart.get(product, 0) + qty
+        if total > 0:
+            self.cart[product] = total
+        else:
+            self.cart.pop(product, None)
+        self.last_product = product
+
+    def record_escalation(self, reason: str) -> None:
+        self.escalations.append((int(time.time()), reason))
+        del self.escalations[:-MAX_ESCALATIONS]
+
+    # Forma compacta: solo tuplas/str/int, serializable con marshal
+    def encode(self) -> bytes:
+        return marshal.dumps((tuple(self.cart.items()), self.city, self.last_product, tuple(self.escalations)))
+
+    @classmethod
+    def decode(cls, raw: bytes) -> "SessionState":
+        cart, city, last_product, escalations = marshal.loads(raw)
+        return cls(cart=dict(cart), city=city, last_product=last_product, escalations=list(escalations))
+
+
+class MemoryBackend:
+    """
+    Sustituto local de Redis (subconjunto get/set/delete). Todas las claves
+    comparten TTL, así que las más antiguas están siempre al inicio.
+    """
+
+    def __init__(self, max_entries: int = SESSION_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> bytes | None:
+        with self._lock:
+            entry = self._data.get(name)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._data[name]
+                return None
+            return entry[1]
+
+    def set(self, name: str, value: bytes, ex: int | None = None) -> bool:
+        expires = time.monotonic() + ex if ex else float("inf")
+        with self._lock:
+            self._data.pop(name, None)
+            self._data[name] = (expires, value)
+            self._evict()
+        return True
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            return sum(self._data.pop(n, None) is not None for n in names)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._data:
+            name, (expires, _) = next(iter(self._data.items()))
+            if expires >= now and len(self._data) <= self.max_entries:
+                break
+            del self._data[name]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def _make_backend(spec: str):
+    if spec == "memory":
+        return MemoryBackend()
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        import redis  # dependencia opcional
+        return redis.Redis.from_url(spec)
+    raise ValueError(f"SESSION_BACKEND desconocido: {spec}")
+
+
+class SessionStore:
+    def __init__(self, backend=None, ttl: int = SESSION_TTL):
+        self.backend = backend if backend is not None else _make_backend(SESSION_BACKEND)
+        self.ttl = ttl
+
+    def load(self, session_id: str) -> SessionState:
+        raw = self.backend.get(KEY_PREFIX + session_id)
+        if raw is None:
+            return SessionState()
+        try:
+            return SessionState.decode(raw)
+        except (ValueError, EOFError, TypeError):
+            return SessionState()
+
+    def save(self, session_id: str, state: SessionState) -> None:
+        """Guarda y renueva el TTL (expira tras SESSION_TTL de inactividad)."""
+        self.backend.set(KEY_PREFIX + session_id, state.encode(), ex=self.ttl)
+
+    def clear(self, session_id: str) -> None:
+        self.backend.delete(KEY_PREFIX + session_id)
+
+    def count(self) -> int | None:
+        """
+        Sesiones vigentes. En Redis es DBSIZE: cuenta todas las claves de la
+        base (usar una base dedicada a sesiones). None si el backend no lo sabe.
+        """
+        if hasattr(self.backend, "__len__"):
+            return len(self.backend)
+        dbsize = getattr(self.backend, "dbsize", None)
+        return int(dbsize()) if dbsize is not None else None
+
+
+SESSIONS = SessionStore()
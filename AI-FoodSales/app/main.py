@@ -1,9 +1,58 @@
+import os, time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from app.routers import chat, health
+from app.core.catalog import CATALOG_MATCHER, current_index
+from app.core.catalog_store import STORE
+from app.core.faq_index import faq_index
+from app.core.intent_rules import RULES
+from app.core.nlp_rules import current_extractor
+from app.core.pricing import current_pricing
+from app.routers import chat, health, metrics
+from app.utils.metrics import MetricsMiddleware
+
+# Importar la app no compila índices ni regex; se hace aquí, antes de aceptar
+# peticiones. STARTUP_WARMUP=0 (arranque rápido) lo difiere al primer mensaje.
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") != "0"
+
+WARMUP_STEPS = [
+    ("catalog_index", current_index),
+    ("quantity_extractor", lambda: current_extractor().compile_all()),
+    ("pricing_engine", current_pricing),
+    ("intent_rules", RULES.compile),
+    ("faq_index", faq_index),
+]
+if CATALOG_MATCHER == "tfidf":
+    from app.core.ngram_matcher import current_matcher
+    WARMUP_STEPS.append(("ngram_matcher", current_matcher))
+
+
+def warmup() -> dict[str, float]:
+    """Construye el estado compilado de la app; ms por etapa."""
+    timings = {}
+    for name, build in WARMUP_STEPS:
+        start = time.perf_counter()
+        build()
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+    return timings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Recarga en caliente de Catalog.csv / synonyms.json
+    STORE.start_watching()
+    if STARTUP_WARMUP:
+        warmup()  # índices listos antes de la primera petición
+    yield
+    STORE.stop_watching()
+    chat.CHAT_EXECUTOR.shutdown()
+
 
-app = FastAPI(title="Food Sales Agent API", version="1.0.0")
+app = FastAPI(title="Food Sales Agent API", version="1.0.0", lifespan=lifespan)
 app.include_router(chat.router)
 app.include_router(health.router)
+app.include_router(metrics.router)
+app.add_middleware(MetricsMiddleware)
 
 
 @app.get("/")
@@ -1,10 +1,19 @@
-import os
-from fastapi import APIRouter
+import asyncio, copy, os, traceback
+from contextlib import contextmanager
+from fastapi import APIRouter, HTTPException, Response
 from pydantic import BaseModel
-from app.core.catalog import find_product_from_message, get_product_row
+from app.core.analysis import MessageAnalysis
+from app.core.catalog import get_product_row
+from app.core.catalog_store import STORE
+from app.core.pricing import Quote, current_pricing
+from app.core.session_store import SESSIONS, SessionState
 from app.core.responses import generate_response, build_logistics_response
 from app.core.summary import build_summary
-from app.core.nlp_rules import detect_purchase_intent, detect_logistics_intent
+from app.utils.cache import RESPONSE_CACHE
+from app.utils import tracing
+from app.utils.metrics import CHAT_MESSAGES, CHAT_REJECTED
+from app.utils.offload import Overloaded, from_env
+from app.utils.logger import log_interaction
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
@@ -15,6 +24,23 @@ class ChatMessage(BaseModel):
     channel: str | None = None
 
 
+class ChatBatch(BaseModel):
+    messages: list[ChatMessage]
+
+
+# Lotes: por debajo de este tamaño no compensa repartir en varias tareas;
+# cada tarea del lote tiene su propio plazo (más largo que el de un mensaje)
+BATCH_MIN_PARALLEL = int(os.getenv("CHAT_BATCH_MIN_PARALLEL", "32"))
+BATCH_TIMEOUT = float(os.getenv("CHAT_BATCH_TIMEOUT", "120"))
+
+# Pipeline de /chat/ fuera del event loop (CHAT_EXECUTOR, CHAT_WORKERS,
+# CHAT_MAX_PENDING, CHAT_TIMEOUT); ver app/utils/offload.py
+CHAT_EXECUTOR = from_env("CHAT")
+
+# Las respuestas cacheadas dependen del catálogo: se descartan al recargarlo
+STORE.subscribe(lambda snap: RESPONSE_CACHE.clear())
+
+
 # --- BLOQUE NUEVO: detección de cortesía ---
 courtesy_keywords = [
     "hola", "buenos días", "buenas tardes", "buenas noches",
@@ -40,14 +66,125 @@ def generate_courtesy_response(message: str) -> str:
 
 
 @router.post("/")
-async def chat_endpoint(data: ChatMessage):
+async def chat_endpoint(data: ChatMessage, response: Response = None):
+    with tracing.trace("chat.request", channel=data.channel, session_id=data.session_id) as span:
+        analysis = MessageAnalysis(data.message)
+
+        # Caché de respuestas: solo mensajes sin sesión; clave = texto + versión del catálogo
+        cache_key = None if data.session_id else f"{STORE.version}:{analysis.text}"
+        result = RESPONSE_CACHE.get(cache_key) if cache_key else None
+        if result is not None:
+            span["cache"] = "hit"
+            if response is not None:
+                response.headers["Server-Timing"] = "cache;desc=hit"
+        else:
+            result = await _run_offloaded(data, analysis)
+            if cache_key and not result.get("should_escalate"):
+                RESPONSE_CACHE.put(cache_key, result)
+            if response is not None:
+                # Duración por etapa visible en las herramientas del navegador / proxies
+                response.headers["Server-Timing"] = analysis.server_timing()
+        span["should_escalate"] = result.get("should_escalate")
+        CHAT_MESSAGES.inc("true" if result.get("should_escalate") else "false")
+
+    log_interaction(data.session_id, data.message, result.get("agent_response"), data.channel or "unknown")
+    return result
+
+
+async def _run_offloaded(data: ChatMessage, analysis: MessageAnalysis) -> dict:
+    """
+    Ejecuta el pipeline en CHAT_EXECUTOR; 503 si está saturado, 504 si vence el plazo.
+
+    La sesión (carrito, ciudad) se lee y se guarda dentro de la tarea: con
+    SESSION_BACKEND=redis:// cada acceso es un viaje de red que no debe
+    ocurrir en el event loop. En modo proceso el pool no comparte el
+    almacén en memoria, así que la lectura/escritura la hace este proceso,
+    en un hilo.
+    """
+    in_process = CHAT_EXECUTOR.kind != "process"
+    session = None
+    if data.session_id and not in_process:
+        session = await asyncio.to_thread(SESSIONS.load, data.session_id)
+    # En modo proceso el análisis se rehace allá; vuelven resultado, tiempos y sesión
+    args = (data, analysis, None, True) if in_process else (data, None, session, False)
+    with _executor_errors():
+        result, timings, session = await CHAT_EXECUTOR.run(_offloaded_pipeline, *args)
+    if session is not None:
+        await asyncio.to_thread(SESSIONS.save, data.session_id, session)
+    analysis.timings.update(timings)
+    return result
+
+
+@contextmanager
+def _executor_errors():
+    """Saturación del ejecutor -> 503; plazo vencido -> 504."""
+    try:
+        yield
+    except Overloaded as e:
+        CHAT_REJECTED.inc("overloaded")
+        tracing.event("chat.overloaded", level=tracing.WARNING, detail=str(e))
+        raise HTTPException(status_code=503, detail="Servicio saturado, intenta de nuevo en unos segundos.",
+                            headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        CHAT_REJECTED.inc("timeout")
+        tracing.event("chat.timeout", level=tracing.WARNING, timeout=CHAT_EXECUTOR.timeout)
+        raise HTTPException(status_code=504, detail="La solicitud tardó demasiado en procesarse.")
+
+
+def _offloaded_pipeline(data: ChatMessage, analysis: MessageAnalysis | None = None,
+                        session: SessionState | None = None,
+                        own_session: bool = False) -> tuple[dict, dict, SessionState | None]:
+    """
+    Tarea del ejecutor: (resultado, tiempos por etapa, sesión a guardar).
+    Con `own_session` la tarea lee y guarda la sesión de `data.session_id`
+    ella misma y no devuelve nada que guardar.
+    """
+    if analysis is None:
+        STORE.reload()  # proceso del pool: no tiene hilo vigilante propio
+        analysis = MessageAnalysis(data.message)
+    if own_session and data.session_id:
+        session = SESSIONS.load(data.session_id)
+    result = process_message(data, analysis, session)
+    if session is not None:
+        _remember(session, analysis, result)
+        if own_session:
+            SESSIONS.save(data.session_id, session)
+            session = None
+    return result, analysis.timings, session
+
+
+@router.post("/batch")
+async def chat_batch_endpoint(batch: ChatBatch):
+    with tracing.trace("chat.batch", size=len(batch.messages)), _executor_errors():
+        results = await process_messages(batch.messages)
+    for data, result in zip(batch.messages, results):
+        CHAT_MESSAGES.inc("true" if result.get("should_escalate") else "false")
+        log_interaction(data.session_id, data.message, result.get("agent_response"), data.channel or "unknown")
+    return {"results": results}
+
+
+def process_message(data: ChatMessage, analysis: MessageAnalysis | None = None,
+                    session: SessionState | None = None) -> dict:
+    """
+    Procesa un mensaje completo; `analysis` permite reutilizar uno ya creado.
+    Con `session` el carrito y la ciudad de turnos anteriores se usan y se
+    actualizan en sitio.
+    """
     try:
-        user_input = data.message.lower().strip()
+        analysis = analysis or MessageAnalysis(data.message)
+        user_input = analysis.text
+
+        # 🛒 Ajuste relativo al pedido en curso ("agrega 10 más", "quita 3")
+        if session is not None and session.cart and analysis.cart_update:
+            updated = _apply_cart_update(session, analysis)
+            if updated is not None:
+                return updated
 
         # 💬 Detección de cortesía (solo si no hay frustración ni sarcasmo)
-        if detect_courtesy_intent(user_input):
-            from app.core.escalation import should_escalate
-            result = should_escalate(user_input)
+        with analysis.stage("courtesy"):
+            courtesy = detect_courtesy_intent(user_input)
+        if courtesy:
+            result = analysis.escalation()
             if result.get("summary", {}).get("scores", {}).get("sarcasm", 0) < 0.8:
                 return {
                     "agent_response": generate_courtesy_response(user_input),
@@ -59,47 +196,25 @@ async def chat_endpoint(data: ChatMessage):
                 pass
 
         # 🔍 Detección de producto
-        canonical_name = find_product_from_message(user_input)
-        product_row = get_product_row(canonical_name) if canonical_name else None
+        product_row = analysis.product_row
 
         # 🧮 Detección de múltiples productos y cantidades
-        from app.core import nlp_rules, pricing
-
-        items = nlp_rules.extract_products_and_quantities(user_input)
+        items = analysis.items
 
         if items:
-            response_lines = []
-            total_general = 0
+            with analysis.stage("pricing"):
+                response_lines, found = _quote_lines((item["nombre"], item["cantidad"]) for item in items)
 
-            for item in items:
-                prod_name = item["nombre"]
-                qty = item["cantidad"]
-
-                prod_row = get_product_row(prod_name)
-                if not prod_row:
-                    response_lines.append(f"No encontré '{prod_name}' en el catálogo.")
-                    continue
-
-                from app.core.pricing import calculate_total
-                resultado = calculate_total(prod_row, qty)
-                response_lines.append(resultado)
-
-                import re
-                match = re.search(r"Total: \$([\d,]+)", resultado)
-                if match:
-                    monto = int(match.group(1).replace(",", ""))
-                    total_general += monto
-
-            # ✅ total general (solo si hay productos válidos)
-            if total_general > 0:
-                response_lines.append(f"🟩 Total general: ${total_general:,.0f} COP")
+            if session is not None:
+                for prod_name, qty in found:
+                    session.cart[prod_name] = qty
+                    session.last_product = prod_name
 
             # 🧠 Detección de reclamos o sarcasmo antes de responder
-            from app.core.escalation import should_escalate
-            escalation_result = should_escalate(user_input) or {}
+            escalation_result = analysis.escalation() or {}
             
             if escalation_result.get("should_escalate"):
-                print(">>> ESCALAMIENTO PRESERVADO DESDE CHAT")
+                tracing.event("chat.escalated", path="multiproducto")
                 return escalation_result
 
             # 🔸 Respuesta final consolidada (solo si no hay reclamo)
@@ -115,10 +230,11 @@ async def chat_endpoint(data: ChatMessage):
         # 👇 Si no hay productos, continúa flujo general (sarcasmo, reclamos, logística, etc.)
 
         # 🧠 Detección de intención de compra
-        intent_level = detect_purchase_intent(user_input)
+        intent_level = analysis.purchase_intent
 
         # 🤖 Generar respuesta principal
-        response = generate_response(product_row, user_input)
+        with analysis.stage("response"):
+            response = generate_response(product_row, user_input, analysis)
 
         # --- Prioridad de respuestas informativas directas (INVIMA, IVA, etc.) ---
         if "invima" in user_input or "certificado invima" in user_input:
@@ -128,15 +244,13 @@ async def chat_endpoint(data: ChatMessage):
             return response
 
         # ✅ Preservar resultado de escalamiento si el mensaje es reclamo o sarcasmo
-        from app.core.escalation import should_escalate
-        escalation_result = should_escalate(user_input)
+        escalation_result = analysis.escalation()
         if escalation_result.get("should_escalate"):
-            print(">>> ESCALAMIENTO PRESERVADO DESDE CHAT")
+            tracing.event("chat.escalated", path="general")
             return escalation_result
 
         # 🧠 Asegurar que detect_additional_intents se evalúe antes de logística
-        from app.core.nlp_rules import detect_additional_intents
-        intents = detect_additional_intents(user_input)
+        intents = analysis.intents
 
         # Priorizar reclamos o certificados sobre logística
         if intents.get("should_escalate"):
@@ -145,11 +259,18 @@ async def chat_endpoint(data: ChatMessage):
         # 🚚 Detección de intención logística (solo si no hay reclamo ni descuento)
         logistic_detected, logistic_info = (False, {})
         if not intents.get("should_escalate") and not intents.get("discount_info"):
-            logistic_detected, logistic_info = detect_logistics_intent(user_input)
+            logistic_detected, logistic_info = analysis.logistics
 
-        if logistic_detected and "entrega" not in response["agent_response"]:
+        # Una respuesta de FAQ ya atiende la consulta; no se reemplaza por la logística
+        answered_faq = bool(response and (response.get("summary") or {}).get("faq"))
+        if logistic_detected and not answered_faq and "entrega" not in response["agent_response"]:
             subtype = logistic_info.get("type")
             city = logistic_info.get("city")
+            if city is None and session is not None and session.city:
+                # Ciudad mencionada en un turno anterior
+                city = session.city
+                if subtype == "generic":
+                    subtype = "city_delivery"
             logistics_text = build_logistics_response(subtype, city)
 
             if product_row:
@@ -201,11 +322,190 @@ async def chat_endpoint(data: ChatMessage):
         }
 
     except Exception as e:
-        import traceback
-        print("[ERROR] chat_endpoint:", e)
-        traceback.print_exc()
+        tracing.event("chat.error", level=tracing.ERROR, error=repr(e), traceback=traceback.format_exc())
         return {
             "agent_response": "Ocurrió un error interno en el servidor.",
             "should_escalate": True,
             "summary": {"error": str(e)},
         }
+
+
+def _quote_lines(items) -> tuple[list[str], list[tuple[str, int]]]:
+    """
+    Cotiza pares (producto, cantidad): líneas de texto con el total general
+    y los pares que sí existen en el catálogo.
+    """
+    response_lines, quoted, found = [], [], []
+    pricing = current_pricing()
+    for prod_name, qty in items:
+        prod_row = get_product_row(prod_name)
+        if not prod_row:
+            response_lines.append(f"No encontré '{prod_name}' en el catálogo.")
+            continue
+
+        line = pricing.quote(prod_row, qty)
+        quoted.append(line)
+        found.append((prod_name, qty))
+        response_lines.append(line.format())
+
+    # ✅ total general (solo si hay productos válidos)
+    total_general = Quote(tuple(quoted)).total
+    if total_general > 0:
+        response_lines.append(f"🟩 Total general: ${total_general:,.0f} COP")
+    return response_lines, found
+
+
+# ----------------------------------------------------------------------
+# Sesiones
+# ----------------------------------------------------------------------
+def _apply_cart_update(session: SessionState, analysis: MessageAnalysis) -> dict | None:
+    """
+    Aplica "agrega N más" / "quita N" sobre el carrito y devuelve la
+    cotización completa actualizada. None si no hay a qué producto aplicarlo.
+    """
+    action, qty = analysis.cart_update
+    # Producto: el que se nombre en el mensaje o, si no, el último del pedido
+    targets = [item["nombre"] for item in analysis.items] or [session.last_product]
+    targets = [t for t in targets if t]
+    if not targets:
+        return None
+
+    escalation_result = analysis.escalation()
+    if escalation_result.get("should_escalate"):
+        tracing.event("chat.escalated", path="carrito")
+        return escalation_result
+
+    delta = qty if action == "add" else -qty
+    for name in targets:
+        session.add(name, delta)
+
+    sign = "+" if delta > 0 else "-"
+    header = f"🛒 Pedido actualizado ({sign}{qty} {', '.join(targets)}):"
+    if session.cart:
+        with analysis.stage("pricing"):
+            lines, _ = _quote_lines(session.cart.items())
+        agent_response = "\n".join([header] + lines)
+    else:
+        agent_response = "Tu pedido quedó vacío. ¿Quieres agregar algún producto?"
+
+    return {
+        "agent_response": agent_response,
+        "should_escalate": False,
+        "summary": {
+            "pedido_o_consulta": analysis.text,
+            "accion_del_agente": f"Carrito actualizado: {len(session.cart)} productos",
+            "carrito": dict(session.cart),
+        },
+    }
+
+
+def _remember(session: SessionState, analysis: MessageAnalysis, result: dict) -> None:
+    """Actualiza ciudad, último producto e historial de escalamientos."""
+    _, logistic_info = analysis.logistics
+    if logistic_info.get("city"):
+        session.city = logistic_info["city"]
+    if analysis.product and not session.cart:
+        session.last_product = analysis.product
+    if result.get("should_escalate"):
+        cues = (result.get("summary") or {}).get("cues") or {}
+        reasons = cues.get("complaint") or cues.get("sarcasm") or ["escalado"]
+        session.record_escalation(str(reasons[0]))
+
+
+# ----------------------------------------------------------------------
+# Procesamiento por lotes
+# ----------------------------------------------------------------------
+def _process_chunk(messages: list[ChatMessage],
+                   sessions: dict[str, SessionState] | None = None) -> tuple[list[dict], dict | None]:
+    """
+    Tarea del ejecutor para un trozo del lote; los mensajes de una misma
+    sesión llegan juntos y en orden. Sin `sessions` (hilos) la tarea lee y
+    guarda las sesiones; en modo proceso recibe las sesiones ya leídas y
+    devuelve las actualizadas para que las guarde el proceso principal.
+    """
+    own_sessions = sessions is None
+    if own_sessions:
+        sessions = {}
+    else:
+        STORE.reload()  # proceso del pool: no tiene hilo vigilante propio
+    results = []
+    for data in messages:
+        session = None
+        if data.session_id:
+            session = sessions.get(data.session_id)
+            if session is None:
+                session = sessions[data.session_id] = SESSIONS.load(data.session_id)
+        analysis = MessageAnalysis(data.message)
+        result = process_message(data, analysis, session)
+        if session is not None:
+            _remember(session, analysis, result)
+        results.append(result)
+    if own_sessions:
+        for session_id, session in sessions.items():
+            SESSIONS.save(session_id, session)
+        return results, None
+    return results, sessions
+
+
+def _batch_key(data: ChatMessage, position: int) -> tuple[str, object]:
+    # Sin sesión la respuesta depende solo del texto: los repetidos se
+    # procesan una vez. Con sesión cada turno cuenta ("agrega 10 más" dos
+    # veces suma 20) y depende de los anteriores: nunca se deduplica
+    if data.session_id:
+        return "turn", position
+    return "text", (data.message or "").lower().strip()
+
+
+def _split_batch(messages: list[ChatMessage], parts: int) -> list[list[ChatMessage]]:
+    """Reparte en `parts` trozos sin separar los mensajes de una sesión."""
+    groups: dict[str | None, list[ChatMessage]] = {}
+    for data in messages:
+        groups.setdefault(data.session_id or None, []).append(data)
+    units = [[m] for m in groups.pop(None, [])] + list(groups.values())
+    chunks: list[list[ChatMessage]] = [[] for _ in range(max(1, parts))]
+    # Los grupos más grandes primero, cada uno al trozo más liviano
+    for unit in sorted(units, key=len, reverse=True):
+        min(chunks, key=len).extend(unit)
+    return [chunk for chunk in chunks if chunk]
+
+
+async def process_messages(messages: list[ChatMessage]) -> list[dict]:
+    """
+    Procesa un lote de mensajes (p. ej. reenvío de backlog tras una caída)
+    en CHAT_EXECUTOR, con la misma contrapresión que /chat/. Conserva
+    session_id y channel: carrito y ciudad de cada sesión se usan y se
+    actualizan en orden. Los mensajes sin sesión repetidos (mismo texto)
+    se analizan una sola vez; lotes grandes se reparten en varias tareas.
+    """
+    unique: dict[tuple, ChatMessage] = {}
+    keys = []
+    for position, m in enumerate(messages):
+        key = _batch_key(m, position)
+        unique.setdefault(key, m)
+        keys.append(key)
+    key_of = {id(m): key for key, m in unique.items()}
+
+    # No más tareas que las que caben en el ejecutor; sin cupo, run() da Overloaded (503)
+    free = CHAT_EXECUTOR.capacity - CHAT_EXECUTOR.inflight
+    parts = 1 if len(unique) < BATCH_MIN_PARALLEL else max(1, min(CHAT_EXECUTOR.workers, free))
+    chunks = _split_batch(list(unique.values()), parts)
+    in_process = CHAT_EXECUTOR.kind != "process"
+
+    async def run(chunk: list[ChatMessage]) -> list[dict]:
+        sessions = None
+        if not in_process:
+            ids = list(dict.fromkeys(m.session_id for m in chunk if m.session_id))
+            sessions = await asyncio.to_thread(lambda: {sid: SESSIONS.load(sid) for sid in ids})
+        results, sessions = await CHAT_EXECUTOR.run(_process_chunk, chunk, sessions, timeout=BATCH_TIMEOUT)
+        if sessions:
+            await asyncio.to_thread(lambda: [SESSIONS.save(sid, st) for sid, st in sessions.items()])
+        return results
+
+    parts_results = await asyncio.gather(*(run(chunk) for chunk in chunks))
+    by_key = {key_of[id(m)]: r for chunk, part in zip(chunks, parts_results) for m, r in zip(chunk, part)}
+    out, seen = [], set()
+    for key in keys:
+        # Copias independientes para mensajes repetidos dentro del lote
+        out.append(copy.deepcopy(by_key[key]) if key in seen else by_key[key])
+        seen.add(key)
+    return out
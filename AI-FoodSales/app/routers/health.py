@@ -1,6 +1,7 @@
 from fastapi import APIRouter
+from app.utils.cache import RESPONSE_CACHE
 router = APIRouter(prefix="/health", tags=["Health"])
 
 @router.get("/")
 async def health_check():
-    return {"status": "ok"}
+    return {"status": "ok", "chat_cache": RESPONSE_CACHE.stats()}
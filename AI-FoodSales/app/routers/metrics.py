@@ -0,0 +1,37 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core.catalog_store import STORE
+from app.core.session_store import SESSIONS
+from app.routers.chat import CHAT_EXECUTOR
+from app.utils import metrics, tracing
+from app.utils.cache import RESPONSE_CACHE
+from app.utils.logger import dropped_interactions
+
+router = APIRouter(tags=["Metrics"])
+
+# Valores que ya llevan sus propios contadores: se leen al momento del scrape
+metrics.Callback("foodsales_chat_cache_hits_total", "Aciertos de la caché de respuestas", "counter",
+                 lambda: [((), RESPONSE_CACHE.hits)])
+metrics.Callback("foodsales_chat_cache_misses_total", "Fallos de la caché de respuestas", "counter",
+                 lambda: [((), RESPONSE_CACHE.misses)])
+metrics.Callback("foodsales_chat_cache_evictions_total", "Entradas desalojadas de la caché", "counter",
+                 lambda: [((), RESPONSE_CACHE.evictions)])
+metrics.Callback("foodsales_chat_cache_entries", "Entradas vigentes en la caché", "gauge",
+                 lambda: [((), RESPONSE_CACHE.stats()["entries"])])
+metrics.Callback("foodsales_chat_inflight", "Mensajes en proceso o en cola del ejecutor", "gauge",
+                 lambda: [((), CHAT_EXECUTOR.inflight)])
+metrics.Callback("foodsales_chat_sessions", "Sesiones vigentes (en Redis: claves de la base)", "gauge",
+                 lambda: [((), n) for n in (SESSIONS.count(),) if n is not None])
+metrics.Callback("foodsales_catalog_reloads_total", "Recargas en caliente del catálogo", "counter",
+                 lambda: [((), STORE.reloads)])
+metrics.Callback("foodsales_catalog_products", "Productos del snapshot vigente", "gauge",
+                 lambda: [((STORE.version,), len(STORE.current().catalog))], labels=("version",))
+metrics.Callback("foodsales_chat_log_dropped_total", "Registros del historial descartados (cola llena)", "counter",
+                 lambda: [((), dropped_interactions())])
+metrics.Callback("foodsales_trace_dropped_total", "Eventos de traza descartados", "counter",
+                 lambda: [((), tracing.dropped())])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,286 @@
+"""
+Lanzador de producción AI-FoodSales: estado precargado + workers por fork.
+
+`uvicorn --workers N` arranca cada worker desde cero, así que cada uno
+vuelve a leer Catalog.csv y synonyms.json y a compilar sus índices, los
+léxicos de escalamiento, la tabla de reglas y el índice de FAQ. Con este
+lanzador el proceso padre:
+
+1. Desactiva el recolector de basura y precarga la app con todo su estado
+   compilado (app.main.warmup: índice del catálogo, extractor de
+   cantidades, cotizador, tabla de reglas, índice de FAQ y, con
+   CATALOG_MATCHER=tfidf, el matcher de trigramas).
+2. Ejecuta gc.freeze(): los objetos precargados pasan a la generación
+   permanente y el recolector de los workers no vuelve a recorrerlos, de
+   modo que no ensucia (ni copia) las páginas compartidas.
+3. Abre el socket de escucha y hace fork de N workers uvicorn que lo
+   comparten; las páginas de memoria se comparten por copy-on-write.
+4. Supervisa los workers: si uno muere lo reemplaza (otro fork, sin volver
+   a cargar nada) y con SIGTERM/SIGINT los detiene a todos.
+
+Al arrancar imprime el tiempo de cada etapa y la memoria de cada proceso
+(RSS, PSS y privada, de /proc/<pid>/smaps_rollup; solo Linux). SIGUSR1
+vuelve a imprimir el reporte de memoria. La suma de PSS es el consumo
+real del nodo: con precarga crece mucho menos que N × RSS.
+
+Cada worker conserva su propio estado mutable y su vigilancia de recarga
+del catálogo (una recarga en caliente se compila en cada worker):
+
+- sesiones: con SESSION_BACKEND=memory (por defecto) cada worker tiene las
+  suyas y dos turnos seguidos pueden caer en workers distintos, perdiendo
+  carrito y ciudad. Con más de un worker usar SESSION_BACKEND=redis://...;
+  si no, el lanzador lo advierte al arrancar.
+- caché de respuestas (CHAT_CACHE_ENABLED): una por worker; solo baja la
+  tasa de aciertos.
+- métricas: /metrics responde con las del worker que atiende la petición.
+  Para agregarlas definir METRICS_DIR, una carpeta compartida por todos.
+
+Por eso WEB_WORKERS vale 1 por defecto: varios workers son una decisión
+explícita del despliegue.
+
+Uso (desde AI-FoodSales/):
+    python -m app.serve --workers 16 --port 8000
+    WEB_WORKERS=16 python -m app.serve --host 0.0.0.0
+    python -m app.serve --workers 4 --no-preload    # para comparar memoria
+"""
+
+import argparse, gc, os, signal, socket, sys, time
+
+import uvicorn
+
+HOST = os.getenv("WEB_HOST", "127.0.0.1")
+PORT = int(os.getenv("WEB_PORT", "8000"))
+WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+BACKLOG = int(os.getenv("WEB_BACKLOG", "2048"))
+
+
+# ----------------------------------------------------------------------
+# 1️⃣ PRECARGA
+# ----------------------------------------------------------------------
+def preload() -> tuple[object, dict[str, float]]:
+    """Importa la app y construye su estado compilado. Devuelve (app, ms por etapa)."""
+    start = time.perf_counter()
+    from app.main import app, warmup
+    timings = {"import": round((time.perf_counter() - start) * 1000, 1)}
+    timings.update(warmup())
+    return app, timings
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ MEMORIA POR PROCESO
+# ----------------------------------------------------------------------
+def memory_kb(pid: int) -> dict[str, int]:
+    """RSS, PSS, memoria privada y compartida (KiB) de un proceso; {} si no hay /proc."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+    except OSError:
+        return {}
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+def memory_report(pids: list[int]) -> str:
+    rows = [("master" if pid == os.getpid() else "worker", pid, memory_kb(pid)) for pid in pids]
+    if not any(mem for _, _, mem in rows):
+        return "memoria: /proc/<pid>/smaps_rollup no disponible"
+    lines = [f"{'proceso':<8} {'pid':>7} {'RSS MiB':>9} {'PSS MiB':>9} {'privada':>9} {'compartida':>11}"]
+    total = {"rss": 0, "pss": 0, "private": 0}
+    for role, pid, mem in rows:
+        if not mem:
+            continue
+        for k in total:
+            total[k] += mem[k]
+        lines.append(f"{role:<8} {pid:>7} {mem['rss'] / 1024:>9.1f} {mem['pss'] / 1024:>9.1f} "
+                     f"{mem['private'] / 1024:>9.1f} {mem['shared'] / 1024:>11.1f}")
+    lines.append(f"{'total':<8} {'':>7} {total['rss'] / 1024:>9.1f} {total['pss'] / 1024:>9.1f} "
+                 f"{total['private'] / 1024:>9.1f}")
+    return "\n".join(lines)
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ WORKERS
+# ----------------------------------------------------------------------
+def _listen(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, ready_fd: int, log_level: str) -> None:
+    """Cuerpo del proceso hijo: sirve la app sobre el socket heredado."""
+    class Worker(uvicorn.Server):
+        async def startup(self, sockets=None):
+            await super().startup(sockets=sockets)
+            # Aviso al padre: este worker ya atiende peticiones
+            os.write(ready_fd, f"{os.getpid()}\n".encode())
+
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+        signal.signal(sig, signal.SIG_DFL)
+    gc.enable()
+    if app is None:
+        app, _ = preload()
+    config = uvicorn.Config(app, lifespan="on", log_level=log_level, access_log=False)
+    Worker(config).run(sockets=[sock])
+
+    # El hijo sale con os._exit (sin atexit): vaciar las trazas pendientes
+    from app.utils import tracing
+    tracing.flush()
+
+
+class Supervisor:
+    def __init__(self, app, sock: socket.socket, workers: int, log_level: str):
+        self.app = app
+        self.sock = sock
+        self.size = workers
+        self.log_level = log_level
+        self.workers: dict[int, float] = {}  # pid -> instante del fork
+        self.stopping = False
+        self.ready_r, self.ready_w = os.pipe()
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                os.close(self.ready_r)
+                _run_worker(self.app, self.sock, self.ready_w, self.log_level)
+            except BaseException:
+                code = 1
+                import traceback
+                traceback.print_exc()
+            finally:
+                os._exit(code)
+        self.workers[pid] = time.monotonic()
+        return pid
+
+    def wait_ready(self, timeout: float = 60.0) -> list[int]:
+        """PIDs de los workers que avisaron que están listos (en orden de llegada)."""
+        ready, buffer = [], b""
+        deadline = time.monotonic() + timeout
+        os.set_blocking(self.ready_r, False)
+        while len(ready) < self.size and time.monotonic() < deadline:
+            try:
+                chunk = os.read(self.ready_r, 4096)
+            except BlockingIOError:
+                time.sleep(0.01)
+                continue
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            ready += [int(line) for line in lines if line]
+        return ready
+
+    def _drain(self) -> None:
+        # Los avisos de workers reemplazados no se usan; evita llenar el pipe
+        try:
+            while os.read(self.ready_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def stop(self, signum=None, frame=None) -> None:
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def report(self, signum=None, frame=None) -> None:
+        print(memory_report([os.getpid(), *sorted(self.workers)]), flush=True)
+
+    def supervise(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGUSR1, self.report)
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.workers.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            print(f"[serve] worker {pid} terminó (código {code}); se reemplaza", file=sys.stderr, flush=True)
+            # Un worker que muere al arrancar no debe convertirse en un bucle de forks
+            if time.monotonic() - started < 1.0:
+                time.sleep(1.0)
+            self._drain()
+            self.spawn()
+
+
+# ----------------------------------------------------------------------
+# 4️⃣ EJECUCIÓN
+# ----------------------------------------------------------------------
+def shared_state_warnings(workers: int) -> list[str]:
+    """Estado que queda por worker cuando hay más de uno (ver docstring del módulo)."""
+    if workers <= 1:
+        return []
+    warnings = []
+    if os.getenv("SESSION_BACKEND", "memory") == "memory":
+        warnings.append(f"SESSION_BACKEND=memory con {workers} workers: cada uno guarda sus propias "
+                        "sesiones y un turno que cae en otro worker pierde carrito y ciudad; "
+                        "usar SESSION_BACKEND=redis://... o --workers 1")
+    if not os.getenv("METRICS_DIR"):
+        warnings.append("METRICS_DIR sin definir: /metrics muestra solo las métricas del worker que responde")
+    return warnings
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor AI-FoodSales con workers precargados")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--log-level", default="warning", help="nivel de log de uvicorn")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="cada worker carga la app tras el fork (comparación de memoria)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    start = time.perf_counter()
+    for warning in shared_state_warnings(args.workers):
+        print(f"[serve] ⚠️  {warning}", file=sys.stderr, flush=True)
+
+    app, timings = None, {}
+    if not args.no_preload:
+        # Sin recolecciones durante la precarga; lo sobrante se libera y el resto se congela
+        gc.disable()
+        app, timings = preload()
+        gc.collect()
+        gc.freeze()
+    timings["preload_total"] = round((time.perf_counter() - start) * 1000, 1)
+
+    sock = _listen(args.host, args.port)
+    supervisor = Supervisor(app, sock, max(1, args.workers), args.log_level)
+    fork_start = time.perf_counter()
+    for _ in range(supervisor.size):
+        supervisor.spawn()
+    timings["fork"] = round((time.perf_counter() - fork_start) * 1000, 1)
+    ready = supervisor.wait_ready()
+    timings["ready"] = round((time.perf_counter() - start) * 1000, 1)
+
+    print(f"[serve] http://{args.host}:{args.port} · {len(ready)}/{supervisor.size} workers listos"
+          f"{'' if app is not None else ' (sin precarga)'}", flush=True)
+    print("[serve] arranque (ms): " + ", ".join(f"{k}={v}" for k, v in timings.items()), flush=True)
+    supervisor.report()
+    supervisor.supervise()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
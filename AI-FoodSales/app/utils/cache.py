@@ -0,0 +1,89 @@
+"""
+Caché LRU + TTL para respuestas repetidas del chat.
+
+Opcional (CHAT_CACHE_ENABLED=1). Acotada por número de entradas y por
+tamaño aproximado en bytes; expone contadores de aciertos/fallos.
+"""
+
+import copy, json, os, threading, time
+from collections import OrderedDict
+
+CACHE_ENABLED = os.getenv("CHAT_CACHE_ENABLED", "0") == "1"
+CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "2048"))
+CACHE_MAX_BYTES = int(os.getenv("CHAT_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+CACHE_TTL = float(os.getenv("CHAT_CACHE_TTL", "300"))
+
+
+class ResponseCache:
+    """LRU con expiración por entrada; segura entre hilos."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL, enabled=True):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._bytes = 0
+        self._data: OrderedDict = OrderedDict()   # key -> (expira, tamaño, valor)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Devuelve una copia del valor o None si no está o expiró."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            value = entry[2]
+        return copy.deepcopy(value)
+
+    def put(self, key, value) -> None:
+        if not self.enabled:
+            return
+        size = len(key) + len(json.dumps(value, ensure_ascii=False, default=str))
+        if size > self.max_bytes:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def _drop(self, key) -> None:
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+RESPONSE_CACHE = ResponseCache(enabled=CACHE_ENABLED)
@@ -1,18 +1,227 @@
-import json, os
+"""
+Registro de interacciones del chat en JSON Lines (solo anexado).
+
+`log_interaction` encola el registro y retorna de inmediato; un hilo de
+fondo escribe por lotes, hace fsync agrupado y rota el archivo por tamaño o
+antigüedad (los segmentos rotados se comprimen con gzip). Varios workers
+pueden escribir al mismo archivo: cada lote es un único write() con
+O_APPEND y la rotación se serializa con flock.
+"""
+
+import atexit, fcntl, glob, gzip, json, os, queue, shutil, threading, time
 from datetime import datetime
-LOG_FILE = os.path.join('logs','chat_history.json')
+
+from app.utils import tracing
+
+LOG_DIR = os.getenv("CHAT_LOG_DIR", "logs")
+LOG_FILE = os.path.join(LOG_DIR, "chat_history.jsonl")
+LEGACY_LOG_FILE = os.path.join(LOG_DIR, "chat_history.json")
+
+MAX_BYTES = int(os.getenv("CHAT_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+MAX_AGE = float(os.getenv("CHAT_LOG_MAX_AGE", "86400"))
+FSYNC_INTERVAL = float(os.getenv("CHAT_LOG_FSYNC_INTERVAL", "1.0"))
+GZIP_ROTATED = os.getenv("CHAT_LOG_GZIP", "1") == "1"
+QUEUE_SIZE = int(os.getenv("CHAT_LOG_QUEUE_SIZE", "10000"))
+BATCH_SIZE = 512
+
+
+class InteractionLog:
+    """Escritor en segundo plano de un archivo JSONL con rotación."""
+
+    def __init__(self, path=LOG_FILE, max_bytes=MAX_BYTES, max_age=MAX_AGE,
+                 fsync_interval=FSYNC_INTERVAL, gzip_rotated=GZIP_ROTATED, queue_size=QUEUE_SIZE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.fsync_interval = fsync_interval
+        self.gzip_rotated = gzip_rotated
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._fd = None
+        self._ino = None
+        self._started = time.time()
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # --- API ---
+    def write(self, record: dict) -> None:
+        """Encola un registro; si la cola está llena se descarta y se cuenta."""
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Espera a que la cola se vacíe y fuerza fsync."""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def close(self) -> None:
+        self.flush()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    # --- Hilo escritor ---
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="chat-log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.fsync_interval)
+            except queue.Empty:
+                self._maybe_fsync(force=True)
+                continue
+            batch, waiters = [], []
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if len(batch) >= BATCH_SIZE:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                if batch:
+                    self._append(batch)
+                self._maybe_fsync(force=bool(waiters))
+            except OSError as e:
+                tracing.event("chat_log.write_failed", level=tracing.WARNING, path=self.path, error=str(e))
+            for w in waiters:
+                w.set()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._ino = os.fstat(self._fd).st_ino
+        self._started = self._segment_start()
+
+    def _segment_start(self):
+        # Inicio del segmento = timestamp de su primer registro
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                first = f.readline()
+            return datetime.fromisoformat(json.loads(first)["timestamp"]).timestamp()
+        except (OSError, ValueError, KeyError, TypeError):
+            return time.time()
+
+    def _reopen_if_rotated(self):
+        # Otro worker pudo haber rotado el archivo: reabrir la ruta vigente
+        try:
+            current = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            current = None
+        if self._fd is None or current != self._ino:
+            self._open()
+
+    def _append(self, batch):
+        self._reopen_if_rotated()
+        self._maybe_rotate()
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in batch).encode("utf-8")
+        os.write(self._fd, data)
+        self._dirty = True
+
+    def _maybe_fsync(self, force=False):
+        if not self._dirty or self._fd is None:
+            return
+        now = time.monotonic()
+        if force or now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._fd)
+            self._dirty = False
+            self._last_fsync = now
+
+    def _maybe_rotate(self):
+        st = os.fstat(self._fd)
+        too_big = self.max_bytes and st.st_size >= self.max_bytes
+        too_old = self.max_age and st.st_size and time.time() - self._started >= self.max_age
+        if not (too_big or too_old):
+            return
+        with open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # Re-verificar bajo el lock: otro worker pudo rotar primero
+                if os.stat(self.path).st_ino == self._ino:
+                    if self._dirty:
+                        os.fsync(self._fd)
+                        self._dirty = False
+                    rotated = "{}-{}.jsonl".format(
+                        self.path[:-len(".jsonl")], datetime.now().strftime("%Y%m%d-%H%M%S-%f"))
+                    os.rename(self.path, rotated)
+                    if self.gzip_rotated:
+                        _gzip_file(rotated)
+            except FileNotFoundError:
+                pass
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        self._open()
+
+
+def _gzip_file(path):
+    with open(path, "rb") as src, gzip.open(path + ".gz", "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(path)
+
+
+_LOG = InteractionLog()
+atexit.register(_LOG.close)
+
+
 def log_interaction(session_id, user_msg, agent_reply, channel='unknown'):
-    os.makedirs('logs', exist_ok=True)
     record = {'timestamp': datetime.now().isoformat(), 'session_id': session_id, 'channel': channel, 'cliente': user_msg, 'agente': agent_reply}
-    if not os.path.exists(LOG_FILE):
-        with open(LOG_FILE, 'w', encoding='utf-8') as f:
-            json.dump([record], f, ensure_ascii=False, indent=2)
-    else:
-        with open(LOG_FILE, 'r+', encoding='utf-8') as f:
+    _LOG.write(record)
+
+
+def dropped_interactions() -> int:
+    """Registros descartados porque la cola del escritor estaba llena."""
+    return _LOG.dropped
+
+
+def read_interactions(path=LOG_FILE):
+    """
+    Recorre los registros en orden cronológico sin cargarlos todos en memoria:
+    historial legado (JSON), segmentos rotados (.jsonl / .jsonl.gz) y el vigente.
+    """
+    legacy = os.path.join(os.path.dirname(path), os.path.basename(LEGACY_LOG_FILE))
+    if os.path.exists(legacy):
+        with open(legacy, encoding='utf-8') as f:
             try:
-                data = json.load(f)
-            except Exception:
-                data = []
-            data.append(record)
-            f.seek(0)
-            json.dump(data, f, ensure_ascii=False, indent=2)
+                yield from json.load(f)
+            except ValueError:
+                pass
+
+    stem = path[:-len(".jsonl")]
+    segments = sorted(glob.glob(glob.escape(stem) + "-*.jsonl*"))
+    for segment in segments + [path]:
+        if not os.path.exists(segment):
+            continue
+        opener = gzip.open if segment.endswith(".gz") else open
+        with opener(segment, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Línea truncada (p. ej. caída a mitad de escritura)
+                    continue
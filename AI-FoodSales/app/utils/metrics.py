@@ -0,0 +1,315 @@
+"""
+Métricas en formato Prometheus para AI-FoodSales (expuestas en /metrics).
+
+- Contadores e histogramas sin locks: cada hilo escribe en su propio
+  fragmento (dict) y los fragmentos se suman solo al momento del scrape.
+  Registrar una observación cuesta ~1 µs.
+- Valores derivados (caché, recargas del catálogo, descartes de logs) se
+  leen en el scrape mediante funciones registradas, sin instrumentar el
+  camino caliente.
+- Varios workers de uvicorn: con METRICS_DIR definido, cada proceso vuelca
+  periódicamente su estado a `<METRICS_DIR>/metrics-<pid>.db` y el worker
+  que atiende el scrape suma los de todos. Los gauges se reportan por
+  worker (etiqueta `worker`). La carpeta debe vaciarse al desplegar.
+
+Configuración:
+    METRICS_ENABLED         1 | 0                              (1)
+    METRICS_DIR             carpeta compartida entre workers   (sin definir)
+    METRICS_FLUSH_INTERVAL  segundos entre volcados a disco    (1.0)
+"""
+
+import glob, marshal, os, threading, time
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_DIR = os.getenv("METRICS_DIR")
+FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1.0"))
+
+# Segundos; cubren desde aciertos de caché (µs) hasta catálogos grandes
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# ----------------------------------------------------------------------
+# 1️⃣ FRAGMENTOS POR HILO
+# ----------------------------------------------------------------------
+_local = threading.local()
+_shards: list[dict] = []          # un dict por hilo: (nombre, etiquetas) -> valor
+
+
+def _shard() -> dict:
+    try:
+        return _local.shard
+    except AttributeError:
+        shard = _local.shard = {}
+        _shards.append(shard)
+        _ensure_flusher()
+        return shard
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ TIPOS DE MÉTRICA
+# ----------------------------------------------------------------------
+_REGISTRY: dict[str, "_Metric"] = {}
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        _REGISTRY[name] = self
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        if not METRICS_ENABLED:
+            return
+        shard = _shard()
+        key = (self.name, label_values)
+        shard[key] = shard.get(key, 0.0) + amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *label_values: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        shard = _shard()
+        key = (self.name, label_values)
+        series = shard.get(key)
+        if series is None:
+            # conteos por bucket (+Inf al final) y la suma de valores
+            series = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+
+class Callback(_Metric):
+    """Métrica leída en el scrape: `read()` devuelve [(valores_etiquetas, valor)]."""
+
+    def __init__(self, name: str, help: str, kind: str, read: Callable[[], list], labels: Iterable[str] = ()):
+        super().__init__(name, help, labels)
+        self.kind = kind
+        self.read = read
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ AGREGACIÓN
+# ----------------------------------------------------------------------
+def _merge(into: dict, key, value) -> None:
+    current = into.get(key)
+    if current is None:
+        into[key] = list(value) if isinstance(value, list) else value
+    elif isinstance(value, list):
+        for i, v in enumerate(value):
+            current[i] += v
+    else:
+        into[key] = current + value
+
+
+def collect_local() -> dict:
+    """Estado de este proceso: suma de los fragmentos + valores derivados."""
+    totals: dict = {}
+    for shard in list(_shards):
+        for key, value in list(shard.items()):
+            _merge(totals, key, value)
+    for metric in list(_REGISTRY.values()):
+        if isinstance(metric, Callback):
+            try:
+                for label_values, value in metric.read():
+                    totals[(metric.name, tuple(label_values))] = float(value)
+            except Exception:
+                continue
+    return totals
+
+
+def _worker_file(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"metrics-{pid}.db")
+
+
+def flush_to_disk() -> None:
+    """Vuelca el estado del proceso para que otros workers lo agreguen."""
+    if not METRICS_DIR:
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = _worker_file(os.getpid())
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(marshal.dumps(collect_local()))
+    os.replace(tmp, path)
+
+
+_flusher_pid: int | None = None
+
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush_to_disk()
+        except OSError:
+            pass
+
+
+def _ensure_flusher() -> None:
+    global _flusher_pid
+    if not METRICS_DIR or _flusher_pid == os.getpid():
+        return
+    _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_loop, name="metrics-flusher", daemon=True).start()
+
+
+def _reset_after_fork() -> None:
+    # Un worker recién creado no hereda los conteos del proceso padre
+    _shards.clear()
+    _local.__dict__.pop("shard", None)
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect() -> dict:
+    """
+    Estado agregado de todos los workers. Contadores e histogramas se suman;
+    los gauges se reportan por worker.
+    """
+    own = collect_local()
+    per_worker = {os.getpid(): own}
+    if METRICS_DIR:
+        for path in glob.glob(os.path.join(METRICS_DIR, "metrics-*.db")):
+            try:
+                pid = int(os.path.basename(path)[len("metrics-"):-len(".db")])
+            except ValueError:
+                continue
+            if pid == os.getpid():
+                continue
+            try:
+                with open(path, "rb") as f:
+                    per_worker[pid] = marshal.loads(f.read())
+            except (OSError, ValueError, EOFError, TypeError):
+                continue
+
+    totals: dict = {}
+    for pid, series in per_worker.items():
+        for (name, label_values), value in series.items():
+            metric = _REGISTRY.get(name)
+            if metric is None:
+                continue
+            if metric.kind == "gauge":
+                # Los contadores de workers terminados se conservan; sus gauges no
+                if not _alive(pid):
+                    continue
+                key = (name, tuple(label_values) + (str(pid),))
+                totals[key] = value
+            else:
+                _merge(totals, (name, tuple(label_values)), value)
+    return totals
+
+
+# ----------------------------------------------------------------------
+# 4️⃣ FORMATO DE EXPOSICIÓN
+# ----------------------------------------------------------------------
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value: float) -> str:
+    return repr(float(value)) if value != int(value) else f"{int(value)}"
+
+
+def render() -> str:
+    """Texto en el formato de exposición de Prometheus (0.0.4)."""
+    series_by_metric: dict[str, list] = {}
+    for (name, label_values), value in collect().items():
+        series_by_metric.setdefault(name, []).append((label_values, value))
+
+    lines = []
+    for name, metric in _REGISTRY.items():
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        labels = metric.labels + (("worker",) if metric.kind == "gauge" and METRICS_DIR else ())
+        for label_values, value in sorted(series_by_metric.get(name, []), key=lambda s: s[0]):
+            if metric.kind == "gauge" and not METRICS_DIR:
+                label_values = label_values[:len(metric.labels)]
+            if metric.kind != "histogram":
+                lines.append(f"{name}{_labels(labels, label_values)} {_fmt(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (float("inf"),), value[:-1]):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{name}_bucket{_labels(labels, label_values, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels, label_values)} {_fmt(value[-1])}")
+            lines.append(f"{name}_count{_labels(labels, label_values)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# ----------------------------------------------------------------------
+# 5️⃣ MÉTRICAS DE LA APLICACIÓN
+# ----------------------------------------------------------------------
+HTTP_REQUESTS = Counter(
+    "foodsales_http_requests_total", "Peticiones HTTP atendidas", ("route", "method", "status"))
+HTTP_LATENCY = Histogram(
+    "foodsales_http_request_duration_seconds", "Latencia de las peticiones HTTP por ruta", ("route", "method"))
+STAGE_LATENCY = Histogram(
+    "foodsales_chat_stage_duration_seconds", "Duración de cada etapa del pipeline de chat", ("stage",))
+CHAT_MESSAGES = Counter(
+    "foodsales_chat_messages_total", "Mensajes procesados por el chat", ("escalated",))
+CHAT_REJECTED = Counter(
+    "foodsales_chat_rejected_total", "Peticiones de chat rechazadas (saturación o plazo vencido)", ("reason",))
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: conteo y latencia por ruta (plantilla, no URL cruda)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope.get("method", "")
+            HTTP_LATENCY.observe(time.perf_counter() - start, route, method)
+            HTTP_REQUESTS.inc(route, method, str(status))
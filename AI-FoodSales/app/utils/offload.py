@@ -0,0 +1,109 @@
+"""
+Ejecución acotada de trabajo CPU fuera del event loop.
+
+El pipeline de chat (difflib, regex, SequenceMatcher) es CPU puro; si corre
+dentro de un endpoint `async` bloquea a todas las peticiones concurrentes
+del worker. `BoundedExecutor` lo envía a un pool de hilos o de procesos con:
+
+- Contrapresión: como máximo `workers + max_pending` tareas en vuelo; por
+  encima de eso `run` falla de inmediato con `Overloaded` (→ HTTP 503).
+- Tiempo límite por petición: `run` espera como máximo `timeout` segundos
+  (→ HTTP 504). La tarea no se interrumpe, pero sigue contando como en
+  vuelo hasta que termina, así que la contrapresión la tiene en cuenta.
+
+Modos: "thread" (por defecto; comparte cachés e índices con el proceso),
+"process" (paralelismo real; cada proceso tiene su propia copia del
+estado) e "inline" (ejecuta en el event loop, como antes).
+"""
+
+import asyncio, contextvars, os
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+
+class Overloaded(Exception):
+    """Hay demasiadas tareas en vuelo; el cliente debe reintentar luego."""
+
+
+class BoundedExecutor:
+    def __init__(self, kind: str = "thread", workers: int = 4, max_pending: int = 64, timeout: float = 10.0):
+        if kind not in ("thread", "process", "inline"):
+            raise ValueError(f"Modo de ejecución desconocido: {kind}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_pending = max(0, max_pending)
+        self.timeout = timeout
+        self.inflight = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._pool: Executor | None = None
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.max_pending
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                from concurrent.futures import ProcessPoolExecutor  # multiprocessing solo en este modo
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="chat-cpu")
+        return self._pool
+
+    def _release(self, _future=None) -> None:
+        self.inflight -= 1
+
+    async def run(self, fn, *args, timeout: float | None = None):
+        """
+        Ejecuta `fn(*args)` en el pool. Debe llamarse desde el event loop
+        (el contador de tareas en vuelo no usa locks). `timeout` reemplaza
+        el plazo por defecto (p. ej. tareas de un lote).
+        """
+        if self.kind == "inline":
+            return fn(*args)
+        if self.inflight >= self.capacity:
+            self.rejected += 1
+            raise Overloaded(f"{self.inflight} tareas en vuelo (máximo {self.capacity})")
+
+        if self.kind == "thread":
+            # Los hilos heredan el contexto (trace_id de la petición)
+            future = self._get_pool().submit(contextvars.copy_context().run, fn, *args)
+        else:
+            future = self._get_pool().submit(fn, *args)
+        self.inflight += 1
+        loop = asyncio.get_running_loop()
+        # El contador se libera cuando la tarea termina de verdad, no al vencer el plazo
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self._release))
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)),
+                                          self.timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "timeout": self.timeout,
+            "inflight": self.inflight,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def from_env(prefix: str = "CHAT") -> BoundedExecutor:
+    """Construye el ejecutor a partir de <PREFIX>_EXECUTOR, _WORKERS, _MAX_PENDING y _TIMEOUT."""
+    return BoundedExecutor(
+        kind=os.getenv(f"{prefix}_EXECUTOR", "thread"),
+        workers=int(os.getenv(f"{prefix}_WORKERS", "4")),
+        max_pending=int(os.getenv(f"{prefix}_MAX_PENDING", "64")),
+        timeout=float(os.getenv(f"{prefix}_TIMEOUT", "10")),
+    )
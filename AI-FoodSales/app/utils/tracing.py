@@ -0,0 +1,272 @@
+"""
+Trazas estructuradas del pipeline de chat (reemplaza los print de depuración).
+
+- Eventos con nivel (`event`) y tramos con duración (`span`); por debajo
+  del nivel configurado no hacen más que una comparación de enteros.
+- Muestreo por petición: `trace` abre el tramo raíz y decide una vez si
+  la petición se registra; eventos y tramos anidados heredan la decisión.
+  WARNING y ERROR se emiten siempre.
+- Salida no bloqueante: cada registro se serializa y va a una cola
+  acotada; un hilo de fondo la escribe por lotes (JSON Lines o texto).
+  Si la cola se llena se descarta y se cuenta en `dropped()`.
+
+Configuración (variables de entorno):
+    TRACE_LEVEL        debug | info | warning | error   (info)
+    TRACE_SAMPLE_RATE  fracción de peticiones trazadas   (1.0)
+    TRACE_OUTPUT       stderr | stdout | ruta de archivo (stderr)
+    TRACE_FORMAT       json | text                       (json)
+    TRACE_QUEUE_SIZE   registros en cola antes de descartar (10000)
+"""
+
+import atexit, json, os, queue, random, sys, threading, time
+from contextvars import ContextVar
+from datetime import datetime
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+LEVEL_NAMES = {v: k for k, v in LEVELS.items()}
+
+_level = LEVELS.get(os.getenv("TRACE_LEVEL", "info").lower(), INFO)
+_sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+_output = os.getenv("TRACE_OUTPUT", "stderr")
+_format = os.getenv("TRACE_FORMAT", "json").lower()
+QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "10000"))
+BATCH_SIZE = 256
+
+# Traza activa: (trace_id, muestreada)
+_current: ContextVar[tuple[str, bool] | None] = ContextVar("trace", default=None)
+
+
+# ----------------------------------------------------------------------
+# 1️⃣ ESCRITOR EN SEGUNDO PLANO
+# ----------------------------------------------------------------------
+class _Writer:
+    """Cola acotada + hilo que escribe los registros por lotes."""
+
+    def __init__(self, queue_size=QUEUE_SIZE):
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stream = None
+
+    def put(self, line: str) -> None:
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def _after_fork(self):
+        # El hilo escritor no sobrevive a fork: el hijo arranca el suyo con cola nueva
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+                self._thread.start()
+
+    def _open(self):
+        if _output == "stderr":
+            return sys.stderr
+        if _output == "stdout":
+            return sys.stdout
+        os.makedirs(os.path.dirname(_output) or ".", exist_ok=True)
+        return open(_output, "a", encoding="utf-8")
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch, waiters = [], []
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if len(batch) >= BATCH_SIZE:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    if self._stream is None:
+                        self._stream = self._open()
+                    self._stream.write("".join(batch))
+                    self._stream.flush()
+                except (OSError, ValueError):
+                    self.dropped += len(batch)
+            for w in waiters:
+                w.set()
+
+
+def _render(record: dict) -> str:
+    if _format == "text":
+        head = f"{record['ts']} {record['level'].upper():<7} {record['event']}"
+        rest = " ".join(f"{k}={v}" for k, v in record.items() if k not in ("ts", "level", "event"))
+        return f"{head} {rest}" if rest else head
+    return json.dumps(record, ensure_ascii=False, default=str)
+
+
+_WRITER = _Writer()
+atexit.register(_WRITER.flush)
+os.register_at_fork(after_in_child=_WRITER._after_fork)
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ API
+# ----------------------------------------------------------------------
+def configure(level: str | None = None, sample_rate: float | None = None,
+              output: str | None = None, fmt: str | None = None) -> None:
+    """Cambia la configuración en caliente (p. ej. desde un script o consola)."""
+    global _level, _sample_rate, _output, _format
+    if level is not None:
+        _level = LEVELS[level.lower()]
+    if sample_rate is not None:
+        _sample_rate = sample_rate
+    if output is not None and output != _output:
+        _output = output
+        _WRITER._stream = None
+    if fmt is not None:
+        _format = fmt.lower()
+
+
+def enabled(level: int = DEBUG) -> bool:
+    """True si un registro de este nivel se emitiría (para evitar trabajo caro)."""
+    return level >= _level
+
+
+def _sampled(level: int) -> bool:
+    if level >= WARNING:
+        return True
+    ctx = _current.get()
+    if ctx is not None:
+        return ctx[1]
+    return _sample_rate >= 1.0 or random.random() < _sample_rate
+
+
+def _emit(level: int, name: str, fields: dict) -> None:
+    record = {
+        "ts": datetime.now().isoformat(timespec="milliseconds"),
+        "level": LEVEL_NAMES[level],
+        "event": name,
+    }
+    ctx = _current.get()
+    if ctx is not None:
+        record["trace_id"] = ctx[0]
+    record.update(fields)
+    # Se serializa aquí: los campos pueden ser objetos que el llamador modifica después
+    _WRITER.put(_render(record) + "\n")
+
+
+def event(name: str, level: int = DEBUG, **fields) -> None:
+    """Registra un evento estructurado si el nivel y el muestreo lo permiten."""
+    if level < _level or not _sampled(level):
+        return
+    _emit(level, name, fields)
+
+
+class _Discard(dict):
+    """Campos de un tramo desactivado: se aceptan y se ignoran."""
+    def __setitem__(self, key, value):
+        pass
+
+    def update(self, *args, **kwargs):
+        pass
+
+
+class _NoopSpan:
+    __slots__ = ()
+    _fields = _Discard()
+
+    def __enter__(self):
+        return self._fields
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("name", "level", "fields", "start", "token", "root")
+
+    def __init__(self, name, level, fields, root=False):
+        self.name = name
+        self.level = level
+        self.fields = fields
+        self.root = root
+        self.token = None
+
+    def __enter__(self):
+        if self.root:
+            self.token = _current.set((os.urandom(8).hex(), True))
+        self.start = time.perf_counter()
+        return self.fields
+
+    def __exit__(self, exc_type, exc, tb):
+        self.fields["dur_ms"] = round((time.perf_counter() - self.start) * 1000, 3)
+        if exc_type is not None:
+            self.fields["error"] = repr(exc)
+        _emit(self.level, self.name, self.fields)
+        if self.token is not None:
+            _current.reset(self.token)
+        return False
+
+
+def span(name: str, level: int = DEBUG, **fields):
+    """
+    Tramo con duración: `with span("pricing", items=3) as f: f["total"] = ...`.
+    Al salir emite un evento con `dur_ms`. Desactivado, no mide nada.
+    """
+    if level < _level or not _sampled(level):
+        return _NOOP
+    return _Span(name, level, fields)
+
+
+class _Unsampled:
+    """Raíz de una petición no muestreada: suprime los tramos anidados."""
+    __slots__ = ("token",)
+
+    def __enter__(self):
+        self.token = _current.set(("", False))
+        return _NoopSpan._fields
+
+    def __exit__(self, *exc):
+        _current.reset(self.token)
+        return False
+
+
+def trace(name: str, level: int = DEBUG, **fields):
+    """Tramo raíz de una petición: asigna trace_id y decide el muestreo."""
+    if level < _level:
+        return _NOOP
+    if _sample_rate < 1.0 and random.random() >= _sample_rate:
+        return _Unsampled()
+    return _Span(name, level, fields, root=True)
+
+
+def flush(timeout: float = 5.0) -> None:
+    """Espera a que se escriban los registros encolados."""
+    _WRITER.flush(timeout)
+
+
+def dropped() -> int:
+    """Registros descartados por cola llena o error de escritura."""
+    return _WRITER.dropped
@@ -0,0 +1,308 @@
+"""
+Micro-benchmark del pipeline de chat AI-FoodSales.
+
+Mide, para cada tamaño de catálogo, la latencia (p50/p95/p99), el
+rendimiento y las asignaciones de memoria por llamada de:
+
+    chat_endpoint, find_product_from_message,
+    extract_products_and_quantities, should_escalate, calculate_total
+
+sobre un corpus sintético (ver benchmarks/corpus.py). Los resultados se
+guardan en JSON; con --baseline se comparan contra una corrida previa y
+el proceso termina con código 1 si algún p95 empeora más de lo permitido.
+
+Uso (desde AI-FoodSales/):
+    python -m benchmarks.bench_chat
+    python -m benchmarks.bench_chat --sizes 50,5000 --messages 500
+    python -m benchmarks.bench_chat --baseline benchmarks/results/base.json
+    python -m benchmarks.bench_chat --matcher tfidf --sizes 5000,100000
+"""
+
+import argparse, asyncio, contextlib, json, os, platform, statistics, sys, tempfile, time, tracemalloc
+from datetime import datetime
+
+# El entorno se fija antes de importar la app: logs, snapshots y vigilancia
+_TMP = tempfile.mkdtemp(prefix="foodsales-bench-")
+os.environ.setdefault("CHAT_LOG_DIR", os.path.join(_TMP, "logs"))
+os.environ.setdefault("CATALOG_SNAPSHOT_DIR", os.path.join(_TMP, "snapshots"))
+os.environ.setdefault("CHAT_CACHE_ENABLED", "0")
+
+from benchmarks.corpus import build_corpus, build_quotes, synthetic_catalog, write_catalog
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+DEFAULT_SIZES = "50,500,5000,50000"
+STAGES = ["chat_endpoint", "find_product", "extract", "should_escalate", "calculate_total"]
+
+
+# ----------------------------------------------------------------------
+# 1️⃣ MEDICIÓN
+# ----------------------------------------------------------------------
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def _time_calls(fn, inputs, warmup: int, budget: float) -> tuple[list[float], int, float]:
+    """
+    Latencias en µs por llamada, número de errores y tiempo total (s).
+    Se detiene al agotar `budget` segundos (catálogos grandes).
+    """
+    for args in inputs[:warmup]:
+        try:
+            fn(*args)
+        except Exception:
+            pass
+
+    latencies, errors = [], 0
+    perf = time.perf_counter_ns
+    wall = time.perf_counter()
+    deadline = wall + budget if budget > 0 else None
+    for args in inputs:
+        start = perf()
+        try:
+            fn(*args)
+        except Exception:
+            errors += 1
+        latencies.append((perf() - start) / 1000)
+        if deadline and time.perf_counter() > deadline:
+            break
+    return latencies, errors, time.perf_counter() - wall
+
+
+def _alloc_calls(fn, inputs) -> tuple[list[float], list[float]]:
+    """Pico y saldo neto de memoria (KiB) por llamada, vía tracemalloc."""
+    peaks, nets = [], []
+    tracemalloc.start()
+    try:
+        for args in inputs:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            try:
+                fn(*args)
+            except Exception:
+                pass
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append((peak - before) / 1024)
+            nets.append((current - before) / 1024)
+    finally:
+        tracemalloc.stop()
+    return peaks, nets
+
+
+def measure(fn, inputs, warmup: int, alloc_sample: int, budget: float = 0) -> dict:
+    latencies, errors, elapsed = _time_calls(fn, inputs, warmup, budget)
+    latencies.sort()
+    peaks, nets = _alloc_calls(fn, inputs[:alloc_sample]) if alloc_sample else ([], [])
+    peaks.sort()
+    return {
+        "n": len(latencies),
+        "truncated": len(latencies) < len(inputs),
+        "errors": errors,
+        "p50_us": round(_percentile(latencies, 50), 2),
+        "p95_us": round(_percentile(latencies, 95), 2),
+        "p99_us": round(_percentile(latencies, 99), 2),
+        "mean_us": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+        "max_us": round(latencies[-1], 2) if latencies else 0.0,
+        "throughput_per_s": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "alloc_peak_kib_mean": round(statistics.fmean(peaks), 2) if peaks else 0.0,
+        "alloc_peak_kib_p95": round(_percentile(peaks, 95), 2),
+        "alloc_net_kib_mean": round(statistics.fmean(nets), 3) if nets else 0.0,
+    }
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ CORRIDA POR TAMAÑO DE CATÁLOGO
+# ----------------------------------------------------------------------
+def run_size(size: int, args, base_rows, base_synonyms) -> dict:
+    from app.core.catalog import find_product_from_message
+    from app.core.catalog_store import STORE
+    from app.core.escalation import should_escalate
+    from app.core.nlp_rules import current_extractor, extract_products_and_quantities
+    from app.core.pricing import calculate_total, current_pricing
+    from app.routers.chat import ChatMessage, chat_endpoint
+
+    rows, synonyms = synthetic_catalog(base_rows, base_synonyms, size, seed=args.seed)
+    data_dir = os.path.join(_TMP, f"catalog-{size}")
+    os.makedirs(data_dir, exist_ok=True)
+    STORE.catalog_file = os.path.join(data_dir, "Catalog.csv")
+    STORE.synonyms_file = os.path.join(data_dir, "synonyms.json")
+    write_catalog(rows, synonyms, STORE.catalog_file, STORE.synonyms_file)
+
+    # Costo de arranque: la recarga incluye a los suscriptores (índice del catálogo)
+    build = {}
+    start = time.perf_counter()
+    STORE.reload(force=True)
+    build["reload_ms"] = (time.perf_counter() - start) * 1000
+    builders = [("quantity_extractor_ms", current_extractor), ("pricing_engine_ms", current_pricing)]
+    if os.getenv("CATALOG_MATCHER") == "tfidf":
+        from app.core.ngram_matcher import current_matcher
+        builders.append(("ngram_matcher_ms", current_matcher))
+    for name, builder in builders:
+        start = time.perf_counter()
+        builder()
+        build[name] = (time.perf_counter() - start) * 1000
+    build = {k: round(v, 2) for k, v in build.items()}
+
+    corpus = build_corpus(rows, synonyms, args.messages, seed=args.seed)
+    messages = [(msg,) for _, msg in corpus]
+    snap = STORE.current()
+    quotes = build_quotes(snap.catalog, args.messages, seed=args.seed)
+
+    loop = asyncio.new_event_loop()
+
+    def chat(msg):
+        return loop.run_until_complete(chat_endpoint(ChatMessage(message=msg, channel="bench")))
+
+    stage_fns = {
+        "chat_endpoint": (chat, messages),
+        "find_product": (find_product_from_message, messages),
+        "extract": (extract_products_and_quantities, messages),
+        "should_escalate": (should_escalate, messages),
+        "calculate_total": (calculate_total, quotes),
+    }
+
+    stages = {}
+    # Los print de depuración del pipeline no deben ensuciar el reporte
+    sink = open(os.devnull, "w") if not args.verbose else sys.stdout
+    try:
+        for name in args.stages:
+            fn, inputs = stage_fns[name]
+            with contextlib.redirect_stdout(sink):
+                stages[name] = measure(fn, inputs, args.warmup, args.alloc_sample, args.stage_budget)
+    finally:
+        loop.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+    return {"catalog_size": len(snap.catalog), "build": build, "stages": stages}
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ REPORTE Y COMPARACIÓN
+# ----------------------------------------------------------------------
+def print_report(results: dict) -> None:
+    header = f"{'SKUs':>7} {'etapa':<16} {'p50 µs':>10} {'p95 µs':>10} {'p99 µs':>10} {'msg/s':>10} {'KiB pico':>9} {'err':>5}"
+    print(header)
+    print("-" * len(header))
+    for size, run in results["sizes"].items():
+        for name, s in run["stages"].items():
+            print(f"{size:>7} {name:<16} {s['p50_us']:>10.1f} {s['p95_us']:>10.1f} {s['p99_us']:>10.1f} "
+                  f"{s['throughput_per_s']:>10.1f} {s['alloc_peak_kib_mean']:>9.1f} {s['errors']:>5}"
+                  + (f"  (truncado: n={s['n']})" if s.get("truncated") else ""))
+        build = ", ".join(f"{k}={v}" for k, v in run["build"].items())
+        print(f"{size:>7} {'arranque':<16} {build}")
+
+
+def compare(results: dict, baseline: dict, max_regression: float, min_delta_us: float = 0.0) -> list[str]:
+    """
+    Etapas cuyo p95 empeoró más de `max_regression` (fracción) vs la base.
+    Diferencias absolutas menores a `min_delta_us` se consideran ruido.
+    """
+    regressions = []
+    for size, run in results["sizes"].items():
+        base_run = baseline.get("sizes", {}).get(size)
+        if not base_run:
+            continue
+        for name, s in run["stages"].items():
+            base = base_run["stages"].get(name)
+            if not base or not base["p95_us"]:
+                continue
+            ratio = s["p95_us"] / base["p95_us"]
+            if ratio > 1 + max_regression and s["p95_us"] - base["p95_us"] >= min_delta_us:
+                regressions.append(
+                    f"{size} SKUs / {name}: p95 {base['p95_us']:.1f} → {s['p95_us']:.1f} µs (x{ratio:.2f})")
+    return regressions
+
+
+def _git_revision() -> str | None:
+    try:
+        import subprocess
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de chat AI-FoodSales")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="tamaños de catálogo, separados por coma")
+    parser.add_argument("--messages", type=int, default=1000, help="mensajes por tamaño de catálogo")
+    parser.add_argument("--warmup", type=int, default=100, help="llamadas de calentamiento por etapa")
+    parser.add_argument("--alloc-sample", type=int, default=200, help="llamadas medidas con tracemalloc (0 = omitir)")
+    parser.add_argument("--stages", default=",".join(STAGES), help="etapas a medir")
+    parser.add_argument("--stage-budget", type=float, default=60.0,
+                        help="segundos máximos medidos por etapa y tamaño (0 = sin límite)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="ruta del JSON de resultados (por defecto benchmarks/results/)")
+    parser.add_argument("--baseline", help="JSON de una corrida previa para detectar regresiones")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="empeoramiento permitido del p95 (0.25 = 25%%)")
+    parser.add_argument("--min-delta-us", type=float, default=50.0,
+                        help="diferencia mínima de p95 (µs) para contar como regresión")
+    parser.add_argument("--matcher", choices=("difflib", "tfidf"),
+                        help="etapa difusa del catálogo (por defecto, CATALOG_MATCHER)")
+    parser.add_argument("--verbose", action="store_true", help="no silenciar la salida del pipeline")
+    args = parser.parse_args(argv)
+    args.sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    args.stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"etapas desconocidas: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.matcher:
+        os.environ["CATALOG_MATCHER"] = args.matcher
+
+    from app.core.catalog_store import STORE
+    base_rows = list(STORE.current().catalog)
+    base_synonyms = dict(STORE.current().synonyms)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "messages": args.messages,
+            "warmup": args.warmup,
+            "alloc_sample": args.alloc_sample,
+            "stage_budget_s": args.stage_budget,
+            "seed": args.seed,
+            "matcher": os.getenv("CATALOG_MATCHER", "difflib"),
+        },
+        "sizes": {},
+    }
+    for size in args.sizes:
+        print(f"▶ catálogo de {size} SKUs ...", flush=True)
+        results["sizes"][str(size)] = run_size(size, args, base_rows, base_synonyms)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"bench-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    print_report(results)
+    print(f"\nResultados guardados en {out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_regression, args.min_delta_us)
+        if regressions:
+            print("\n❌ Regresiones de latencia (p95):")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print(f"\n✅ Sin regresiones frente a {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
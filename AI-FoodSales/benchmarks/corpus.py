@@ -0,0 +1,217 @@
+"""
+Generadores sintéticos para los benchmarks de AI-FoodSales.
+
+- `synthetic_catalog`: amplía el catálogo real a N SKUs (con sinónimos)
+  para medir cómo escalan los índices con el tamaño del catálogo.
+- `build_corpus`: mensajes en español/inglés con la mezcla habitual del
+  canal (saludos, reclamos, sarcasmo, pedidos multiproducto, logística).
+  Opcionalmente arma reclamos sarcásticos con los marcadores reales de
+  escalation.SARCASM_POS_MARKERS e introduce errores de escritura tomados
+  de escalation.COMMON_FIXES (la forma correcta se cambia por su error).
+
+Todo es determinista a partir de `seed`.
+"""
+
+import csv, json, random
+
+VARIANTS = [
+    "premium", "light", "orgánico", "familiar", "institucional", "gourmet",
+    "artesanal", "clásico", "integral", "económico", "tradicional", "selecto",
+    "extra", "natural", "especial", "casero", "fino", "campestre", "andino", "costeño",
+]
+
+CITIES = [
+    "bogotá", "medellín", "cali", "barranquilla", "cartagena", "bucaramanga",
+    "pereira", "manizales", "cúcuta", "villavicencio", "pasto", "santa marta",
+]
+
+GREETINGS = [
+    "hola", "buenos días", "buenas tardes, ¿cómo están?", "hola, muchas gracias",
+    "muy amable, gracias", "perfecto, de acuerdo", "ok, entendido", "listo",
+    "hello, good morning", "hi there", "thanks a lot",
+]
+
+COMPLAINTS = [
+    "el pedido llegó tarde otra vez",
+    "estoy muy molesto, el producto vino dañado",
+    "me cobraron de más en la factura",
+    "el producto llegó vencido y nadie responde",
+    "quiero poner una queja, el pedido llegó incompleto",
+    "pésimo servicio, llevo una semana esperando",
+    "my order arrived damaged",
+    "the delivery was late again and nobody answers",
+    "I was charged twice for the same order",
+]
+
+SARCASM = [
+    "qué maravilla, otra vez llegó tarde",
+    "genial, el pedido llegó incompleto 🙃",
+    "excelente servicio, solo tres semanas de espera",
+    "gracias por nada, súper rápido el envío 😒",
+    "claro, porque esperar diez días es normal",
+    "great, another late delivery",
+    "wow, amazing service, my order is lost again",
+]
+
+ORDER_TEMPLATES = [
+    "quiero {q1} {p1} y {q2} {p2}",
+    "necesito {q1} {p1}, {q2} {p2} y {q3} {p3}",
+    "me envías {q1} {p1} por favor",
+    "cotízame {q1} unidades de {p1} y {q2} de {p2}",
+    "I need {q1} {p1} and {q2} {p2}",
+    "please send {q1} {p1}",
+]
+
+PRODUCT_TEMPLATES = [
+    "precio de {p1}",
+    "¿tienen {p1}?",
+    "cuánto cuesta {p1}",
+    "info del {p1}",
+    "how much is {p1}?",
+]
+
+LOGISTICS = [
+    "¿hacen envíos a {city}?",
+    "cuánto tarda la entrega en {city}",
+    "cuál es el pedido mínimo",
+    "tienen cobertura nacional",
+    "¿el precio incluye iva?",
+    "do you deliver to {city}?",
+    "cuánto cuesta el envío para {city}",
+]
+
+# Proporciones de la mezcla de tráfico
+MIX = {
+    "greeting": 0.10,
+    "complaint": 0.15,
+    "sarcasm": 0.10,
+    "order": 0.30,
+    "product": 0.20,
+    "logistics": 0.15,
+}
+
+
+def synthetic_catalog(base_rows: list[dict], base_synonyms: dict, size: int, seed: int = 7):
+    """
+    Devuelve (filas, sinónimos) con `size` SKUs. Las primeras filas son las
+    reales; el resto son variantes con nombre y SKU únicos.
+    """
+    rng = random.Random(seed)
+    rows = [dict(r) for r in base_rows[:size]]
+    synonyms = {name: list(v) for name, v in base_synonyms.items()
+                if any(r.get("nombre") == name for r in rows)}
+
+    i = 0
+    while len(rows) < size:
+        base = base_rows[i % len(base_rows)]
+        variant = VARIANTS[(i // len(base_rows)) % len(VARIANTS)]
+        lot = i // (len(base_rows) * len(VARIANTS))
+        name = f"{base['nombre']} {variant}" + (f" lote {lot}" if lot else "")
+        row = dict(base)
+        row["sku"] = f"SY-{len(rows):05d}"
+        row["nombre"] = name
+        row["precio_lista"] = str(int(float(base.get("precio_lista") or 0) * rng.uniform(0.8, 1.3)))
+        rows.append(row)
+        synonyms[name] = [name.lower()]
+        i += 1
+    return rows, synonyms
+
+
+def write_catalog(rows: list[dict], synonyms: dict, catalog_path: str, synonyms_path: str) -> None:
+    with open(catalog_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(synonyms_path, "w", encoding="utf-8") as f:
+        json.dump(synonyms, f, ensure_ascii=False)
+
+
+def _product_mentions(rows: list[dict], synonyms: dict) -> list[str]:
+    """Formas en que un cliente nombra productos: sinónimos y nombres reales."""
+    mentions = [v.lower() for variants in synonyms.values() for v in variants]
+    mentions += [r["nombre"].lower() for r in rows if r.get("nombre")]
+    return mentions
+
+
+# Reclamos base para el sarcasmo con marcadores ("ah genial, {queja}")
+SARCASM_TEMPLATES = [
+    "{marker}, {complaint}",
+    "{marker}... {complaint}",
+    "{complaint}, {marker} 🙃",
+    "{marker} 👏 {complaint}",
+]
+
+
+def _typo_table(fixes: dict) -> dict[str, list[str]]:
+    """Invierte COMMON_FIXES: forma correcta -> errores de escritura conocidos."""
+    table: dict[str, list[str]] = {}
+    for wrong, right in fixes.items():
+        if wrong != right and " " not in wrong:
+            table.setdefault(right, []).append(wrong)
+    return {right: sorted(wrongs) for right, wrongs in table.items()}
+
+
+def _add_typos(msg: str, table: dict[str, list[str]], rng: random.Random, rate: float) -> str:
+    """Cambia cada palabra con error conocido por uno de ellos, con probabilidad `rate`."""
+    words = msg.split(" ")
+    for i, w in enumerate(words):
+        wrongs = table.get(w.lower())
+        if wrongs and rng.random() < rate:
+            words[i] = rng.choice(wrongs)
+    return " ".join(words)
+
+
+def build_corpus(rows: list[dict], synonyms: dict, size: int, seed: int = 7,
+                 sarcasm_markers=None, common_fixes: dict | None = None,
+                 typo_rate: float = 0.3) -> list[tuple[str, str]]:
+    """
+    Lista de (tipo, mensaje) con la mezcla de MIX.
+
+    Con `sarcasm_markers` los mensajes "sarcasm" combinan un marcador con un
+    reclamo; con `common_fixes` una fracción `typo_rate` de las palabras que
+    tienen error conocido se escriben mal. Sin ellos el corpus es el mismo
+    de siempre para una misma semilla.
+    """
+    rng = random.Random(seed)
+    # Generador aparte: activar los errores no cambia qué mensajes salen
+    typo_rng = random.Random(seed + 1)
+    markers = sorted(sarcasm_markers) if sarcasm_markers else None
+    typos = _typo_table(common_fixes) if common_fixes else None
+    mentions = _product_mentions(rows, synonyms)
+    kinds, weights = zip(*MIX.items())
+
+    def product():
+        return rng.choice(mentions)
+
+    def qty():
+        return rng.choice([1, 2, 5, 10, 12, 24, 30, 45, 60, 100])
+
+    corpus = []
+    for _ in range(size):
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "greeting":
+            msg = rng.choice(GREETINGS)
+        elif kind == "complaint":
+            msg = rng.choice(COMPLAINTS)
+        elif kind == "sarcasm" and markers:
+            msg = rng.choice(SARCASM_TEMPLATES).format(
+                marker=rng.choice(markers), complaint=rng.choice(COMPLAINTS[:6]))
+        elif kind == "sarcasm":
+            msg = rng.choice(SARCASM)
+        elif kind == "order":
+            msg = rng.choice(ORDER_TEMPLATES).format(
+                q1=qty(), p1=product(), q2=qty(), p2=product(), q3=qty(), p3=product())
+        elif kind == "product":
+            msg = rng.choice(PRODUCT_TEMPLATES).format(p1=product())
+        else:
+            msg = rng.choice(LOGISTICS).format(city=rng.choice(CITIES))
+        if typos:
+            msg = _add_typos(msg, typos, typo_rng, typo_rate)
+        corpus.append((kind, msg))
+    return corpus
+
+
+def build_quotes(rows: list[dict], size: int, seed: int = 7) -> list[tuple[dict, int]]:
+    """Pares (fila, cantidad) para medir el cotizador."""
+    rng = random.Random(seed)
+    return [(rng.choice(rows), rng.randint(1, 120)) for _ in range(size)]
@@ -0,0 +1,134 @@
+"""
+Presupuesto de arranque en frío de AI-FoodSales (`python -X importtime`).
+
+Importa `app.main` en un intérprete nuevo varias veces y, con el mejor
+tiempo de cada módulo, reporta:
+
+- el tiempo propio de los módulos de la app (`app.*`), sin FastAPI ni
+  pydantic, que no dependen de este código;
+- los módulos más lentos de la app;
+- módulos prohibidos en el arranque (importaciones sueltas o pesadas que
+  deben cargarse solo bajo demanda: pydoc, unittest, multiprocessing...);
+- el tiempo de `app.main.warmup()` por etapa (índices y regex que se
+  compilan antes de aceptar peticiones).
+
+Termina con código 1 si se excede el presupuesto o aparece un módulo
+prohibido, para usarse como verificación en CI.
+
+Uso (desde AI-FoodSales/):
+    python -m benchmarks.import_budget
+    python -m benchmarks.import_budget --budget-ms 40 --runs 7
+"""
+
+import argparse, json, os, subprocess, sys, tempfile
+
+APP_DIR = os.path.join(os.path.dirname(__file__), "..")
+# El tiempo absoluto depende de la máquina: ajustar con IMPORT_BUDGET_MS en CI
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "90"))
+# Nunca deben cargarse al importar la app
+FORBIDDEN = ("pydoc", "unittest", "multiprocessing", "numpy", "redis", "httpx", "uvicorn")
+
+_WARMUP_MARK = "--- warmup"
+_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import app.main as main
+imported = time.perf_counter() - start
+sys.stderr.write("{_WARMUP_MARK}\\n")
+print(json.dumps({{"import_ms": round(imported * 1000, 1), "warmup": main.warmup()}}))
+"""
+
+
+def parse_importtime(stderr: str) -> dict[str, tuple[int, int]]:
+    """módulo -> (µs propios, µs acumulados) a partir de la salida de -X importtime."""
+    modules = {}
+    # Lo que importe el calentamiento (p. ej. numpy con tfidf) no cuenta
+    for line in stderr.split(_WARMUP_MARK, 1)[0].splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # encabezado
+        modules[parts[2].strip()] = (int(parts[0]), int(parts[1]))
+    return modules
+
+
+def measure(runs: int) -> tuple[dict[str, tuple[int, int]], list[dict]]:
+    """Mejor tiempo por módulo entre `runs` intérpretes nuevos, y la salida de cada uno."""
+    tmp = tempfile.mkdtemp(prefix="foodsales-import-")
+    env = dict(os.environ)
+    env.setdefault("CHAT_LOG_DIR", os.path.join(tmp, "logs"))
+    env.setdefault("CATALOG_SNAPSHOT_DIR", os.path.join(tmp, "snapshots"))
+    env.setdefault("TRACE_LEVEL", "error")
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (APP_DIR, env.get("PYTHONPATH")) if p)
+
+    best: dict[str, tuple[int, int]] = {}
+    probes = []
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _PROBE], cwd=APP_DIR, env=env,
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"Falló la importación de app.main:\n{proc.stderr[-2000:]}")
+        probes.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        for name, (own, total) in parse_importtime(proc.stderr).items():
+            prev = best.get(name)
+            best[name] = (own, total) if prev is None else (min(prev[0], own), min(prev[1], total))
+    return best, probes
+
+
+def app_own_ms(modules: dict[str, tuple[int, int]]) -> float:
+    """Tiempo propio (ms) de los módulos app.*."""
+    return sum(own for name, (own, _) in modules.items() if name == "app" or name.startswith("app.")) / 1000
+
+
+def forbidden_modules(modules: dict[str, tuple[int, int]]) -> list[str]:
+    """Paquetes de FORBIDDEN que aparecieron al importar la app."""
+    roots = set(FORBIDDEN)
+    if os.getenv("CATALOG_MATCHER", "difflib").lower() == "tfidf":
+        roots.discard("numpy")  # el matcher de trigramas lo necesita desde el arranque
+    return sorted({n.split(".")[0] for n in modules} & roots)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Presupuesto de importación de app.main")
+    parser.add_argument("--runs", type=int, default=5, help="intérpretes nuevos a medir (se toma el mejor)")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="tiempo propio máximo de los módulos app.*")
+    parser.add_argument("--top", type=int, default=10, help="módulos de la app a listar")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    modules, probes = measure(max(1, args.runs))
+
+    app_modules = {n: t for n, t in modules.items() if n == "app" or n.startswith("app.")}
+    app_ms = app_own_ms(modules)
+    total_ms = modules.get("app.main", (0, 0))[1] / 1000
+    forbidden = forbidden_modules(modules)
+
+    print(f"app.main acumulado: {total_ms:8.1f} ms  (incluye FastAPI/pydantic)")
+    print(f"módulos app.*:      {app_ms:8.1f} ms  (presupuesto {args.budget_ms:.1f} ms)")
+    print(f"import (reloj):     {min(p['import_ms'] for p in probes):8.1f} ms")
+    print(f"\n{'módulo':<32} {'propio ms':>10} {'acum. ms':>10}")
+    for name, (own, total) in sorted(app_modules.items(), key=lambda kv: -kv[1][0])[:args.top]:
+        print(f"{name:<32} {own / 1000:>10.1f} {total / 1000:>10.1f}")
+
+    warmup = {step: min(p["warmup"][step] for p in probes) for step in probes[0]["warmup"]}
+    print(f"\nwarmup (ms): " + ", ".join(f"{k}={v}" for k, v in warmup.items())
+          + f"  · total {sum(warmup.values()):.1f}")
+
+    failed = False
+    if forbidden:
+        print(f"\n❌ Módulos prohibidos al importar: {', '.join(forbidden)}")
+        failed = True
+    if app_ms > args.budget_ms:
+        print(f"\n❌ Los módulos app.* tardan {app_ms:.1f} ms (presupuesto {args.budget_ms:.1f} ms)")
+        failed = True
+    if not failed:
+        print("\n✅ Dentro del presupuesto")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
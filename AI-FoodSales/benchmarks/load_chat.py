@@ -0,0 +1,154 @@
+"""
+Prueba de carga en proceso de /chat/ (sin red: httpx + ASGITransport).
+
+Para cada modo del ejecutor (inline, thread, process) y cada nivel de
+concurrencia lanza N clientes que envían mensajes del corpus sintético a
+/chat/ mientras una sonda consulta /health/ cada pocos milisegundos.
+
+- La sonda mide si el event loop queda libre (latencia de /health/,
+  número de sondas atendidas y retraso del loop al despertar): con
+  "inline" el loop queda bloqueado mientras corre el pipeline; con el
+  pipeline fuera del loop se mantiene plana.
+- La latencia de /chat/ queda acotada por la contrapresión: por encima de
+  la capacidad del ejecutor las peticiones reciben 503 en lugar de
+  acumularse en cola.
+
+Uso (desde AI-FoodSales/):
+    python -m benchmarks.load_chat
+    python -m benchmarks.load_chat --modes thread --concurrency 1,8,32,128 --requests 400
+"""
+
+import argparse, asyncio, json, os, sys, tempfile, time
+from collections import Counter
+
+_TMP = tempfile.mkdtemp(prefix="foodsales-load-")
+os.environ.setdefault("CHAT_LOG_DIR", os.path.join(_TMP, "logs"))
+os.environ.setdefault("CHAT_CACHE_ENABLED", "0")
+
+try:
+    import httpx
+except ImportError:  # dependencia solo de desarrollo
+    sys.exit("Se requiere httpx para la prueba de carga: pip install httpx")
+
+from benchmarks.bench_chat import _percentile
+from benchmarks.corpus import build_corpus
+
+
+def _summary(latencies: list[float]) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "n": len(latencies),
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p95_ms": round(_percentile(latencies, 95), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+    }
+
+
+async def _run_level(app, messages: list[str], concurrency: int, total: int, probe_interval: float) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load") as client:
+        queue = asyncio.Queue()
+        for i in range(total):
+            queue.put_nowait(messages[i % len(messages)])
+
+        chat_ms, statuses = [], Counter()
+        health_ms, lag_ms = [], []
+        done = asyncio.Event()
+
+        async def user():
+            while True:
+                try:
+                    msg = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                start = time.perf_counter()
+                r = await client.post("/chat/", json={"message": msg, "channel": "load"})
+                chat_ms.append((time.perf_counter() - start) * 1000)
+                statuses[r.status_code] += 1
+
+        async def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/health/")
+                health_ms.append((time.perf_counter() - start) * 1000)
+                # Retraso del loop: cuánto tarda en despertar respecto a lo pedido
+                wake = time.perf_counter() + probe_interval
+                await asyncio.sleep(probe_interval)
+                lag_ms.append(max(0.0, time.perf_counter() - wake) * 1000)
+
+        prober = asyncio.create_task(probe())
+        wall = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - wall
+        done.set()
+        await prober
+
+    ok = statuses.get(200, 0)
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "throughput_per_s": round(ok / elapsed, 1) if elapsed else 0.0,
+        "status": {str(k): v for k, v in sorted(statuses.items())},
+        "chat": _summary(chat_ms),
+        "health_probe": _summary(health_ms),
+        "loop_lag": _summary(lag_ms),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga en proceso de /chat/")
+    parser.add_argument("--modes", default="inline,thread,process", help="modos del ejecutor a comparar")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="clientes concurrentes")
+    parser.add_argument("--requests", type=int, default=300, help="peticiones por nivel")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="workers del ejecutor")
+    parser.add_argument("--max-pending", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--probe-interval", type=float, default=0.005, help="segundos entre sondas a /health/")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="ruta del JSON de resultados")
+    args = parser.parse_args(argv)
+    args.modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    args.concurrency = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    from app.core.catalog_store import STORE
+    from app.main import app
+    from app.routers import chat
+    from app.utils.offload import BoundedExecutor
+
+    snap = STORE.current()
+    messages = [m for _, m in build_corpus(snap.catalog, snap.synonyms, args.requests, seed=args.seed)]
+
+    results = {"workers": args.workers, "max_pending": args.max_pending, "timeout": args.timeout, "modes": {}}
+    print(f"{'modo':<8} {'conc':>5} {'ok/s':>8} {'chat p50':>9} {'chat p99':>9} {'health p99':>11} "
+          f"{'sondas':>7} {'lag p99':>8}  estados")
+    for mode in args.modes:
+        chat.CHAT_EXECUTOR = BoundedExecutor(mode, args.workers, args.max_pending, args.timeout)
+        rows = []
+        try:
+            # Calentamiento: índices, extractor y (en modo proceso) arranque del pool
+            asyncio.run(_run_level(app, messages, args.workers, min(len(messages), 4 * args.workers), 1.0))
+            for c in args.concurrency:
+                row = asyncio.run(_run_level(app, messages, c, args.requests, args.probe_interval))
+                rows.append(row)
+                print(f"{mode:<8} {c:>5} {row['throughput_per_s']:>8.1f} {row['chat']['p50_ms']:>9.1f} "
+                      f"{row['chat']['p99_ms']:>9.1f} {row['health_probe']['p99_ms']:>11.2f} "
+                      f"{row['health_probe']['n']:>7} {row['loop_lag']['p99_ms']:>8.2f}  {row['status']}", flush=True)
+        finally:
+            chat.CHAT_EXECUTOR.shutdown()
+        results["modes"][mode] = rows
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados guardados en {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
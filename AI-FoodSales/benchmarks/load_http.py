@@ -0,0 +1,283 @@
+"""
+Prueba de carga HTTP de AI-FoodSales contra uvicorn local (sin servicios externos).
+
+Para cada número de workers de uvicorn levanta el servidor en un puerto
+libre y, para cada nivel de concurrencia, lanza N usuarios virtuales que
+durante `--duration` segundos reproducen la mezcla de tráfico real:
+
+- /chat/ con el corpus sintético (benchmarks/corpus.py) construido sobre
+  Catalog.csv, con errores de escritura de escalation.COMMON_FIXES y
+  reclamos sarcásticos con escalation.SARCASM_POS_MARKERS.
+- /health/ en la proporción `--health-ratio` (sondas de balanceador).
+
+Por nivel reporta rendimiento (peticiones OK/s), latencia p50/p95/p99 por
+endpoint, tasa de error (estado distinto de 200 o fallo de conexión) y el
+CPU consumido por cada proceso del servidor (maestro y workers), leído de
+/proc (solo Linux; en otros sistemas queda vacío).
+
+Uso (desde AI-FoodSales/):
+    python -m benchmarks.load_http
+    python -m benchmarks.load_http --workers 1,2,4 --concurrency 1,8,32,128 --duration 15
+    python -m benchmarks.load_http --out benchmarks/results/load_http.json
+"""
+
+import argparse, asyncio, json, os, random, signal, socket, subprocess, sys, tempfile, time
+from collections import Counter
+from datetime import datetime
+
+# El entorno se fija antes de importar la app; el servidor lo hereda
+_TMP = tempfile.mkdtemp(prefix="foodsales-load-http-")
+os.environ.setdefault("CHAT_LOG_DIR", os.path.join(_TMP, "logs"))
+os.environ.setdefault("CATALOG_SNAPSHOT_DIR", os.path.join(_TMP, "snapshots"))
+os.environ.setdefault("CHAT_CACHE_ENABLED", "0")
+os.environ.setdefault("TRACE_LEVEL", "error")
+
+try:
+    import httpx
+except ImportError:  # dependencia solo de desarrollo
+    sys.exit("Se requiere httpx para la prueba de carga: pip install httpx")
+
+from benchmarks.bench_chat import _percentile
+from benchmarks.corpus import build_corpus
+
+APP_DIR = os.path.join(os.path.dirname(__file__), "..")
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def _summary(latencies: list[float]) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "n": len(latencies),
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p95_ms": round(_percentile(latencies, 95), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+    }
+
+
+# ----------------------------------------------------------------------
+# 1️⃣ SERVIDOR
+# ----------------------------------------------------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _process_tree(root: int) -> list[int]:
+    """PID del servidor y de todos sus descendientes (workers de uvicorn)."""
+    parents: dict[int, list[int]] = {}
+    try:
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    stat = f.read()
+            except OSError:
+                continue
+            ppid = int(stat.rsplit(")", 1)[1].split()[1])
+            parents.setdefault(ppid, []).append(int(entry))
+    except OSError:
+        return [root]
+    tree, pending = [], [root]
+    while pending:
+        pid = pending.pop()
+        tree.append(pid)
+        pending.extend(parents.get(pid, ()))
+    return sorted(tree)
+
+
+def _cpu_seconds(pids: list[int]) -> dict[int, float]:
+    """CPU (usuario + sistema) acumulado por proceso, en segundos."""
+    usage = {}
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        usage[pid] = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    return usage
+
+
+class Server:
+    """uvicorn app.main:app en un subproceso, con N workers."""
+
+    def __init__(self, workers: int, env: dict):
+        self.workers = workers
+        self.port = _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+               "--port", str(self.port), "--log-level", "warning", "--no-access-log"]
+        if workers > 1:
+            cmd += ["--workers", str(workers)]
+        self.proc = subprocess.Popen(cmd, cwd=APP_DIR, env=env, start_new_session=True)
+
+    def wait_ready(self, timeout: float = 60.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"uvicorn terminó al arrancar (código {self.proc.returncode})")
+            try:
+                ready = httpx.get(self.base_url + "/health/", timeout=1.0).status_code == 200
+                # Con varios workers, esperar también a que todos estén vivos
+                if ready and (self.workers == 1 or len(self.pids()) > self.workers):
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError("uvicorn no respondió a /health/ a tiempo")
+
+    def pids(self) -> list[int]:
+        return _process_tree(self.proc.pid)
+
+    def stop(self) -> None:
+        if self.proc.poll() is None:
+            os.killpg(self.proc.pid, signal.SIGINT)
+            try:
+                self.proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+                self.proc.wait()
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ USUARIOS VIRTUALES
+# ----------------------------------------------------------------------
+async def _run_level(base_url: str, messages: list[str], concurrency: int, duration: float,
+                     health_ratio: float, think: float, timeout: float, seed: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        latencies: dict[str, list[float]] = {"chat": [], "health": []}
+        statuses: dict[str, Counter] = {"chat": Counter(), "health": Counter()}
+        deadline = time.perf_counter() + duration
+
+        async def user(uid: int):
+            rng = random.Random(seed * 1000 + uid)
+            session = f"load-{uid}"
+            while time.perf_counter() < deadline:
+                if rng.random() < health_ratio:
+                    endpoint, call = "health", client.get("/health/")
+                else:
+                    msg = rng.choice(messages)
+                    endpoint, call = "chat", client.post(
+                        "/chat/", json={"message": msg, "session_id": session, "channel": "load"})
+                start = time.perf_counter()
+                try:
+                    status = (await call).status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies[endpoint].append((time.perf_counter() - start) * 1000)
+                statuses[endpoint][status] += 1
+                if think:
+                    await asyncio.sleep(rng.expovariate(1 / think))
+
+        wall = time.perf_counter()
+        await asyncio.gather(*(user(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - wall
+
+    total = sum(sum(c.values()) for c in statuses.values())
+    ok = sum(c.get(200, 0) for c in statuses.values())
+    return {
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "requests": total,
+        "throughput_per_s": round(ok / elapsed, 1) if elapsed else 0.0,
+        "error_rate": round((total - ok) / total, 4) if total else 0.0,
+        "status": {ep: {str(k): v for k, v in sorted(c.items(), key=str)} for ep, c in statuses.items()},
+        "chat": _summary(latencies["chat"]),
+        "health": _summary(latencies["health"]),
+    }
+
+
+def _measure(server: Server, *level_args) -> dict:
+    pids = server.pids()
+    before, wall = _cpu_seconds(pids), time.perf_counter()
+    row = asyncio.run(_run_level(server.base_url, *level_args))
+    after, elapsed = _cpu_seconds(pids), time.perf_counter() - wall
+    # Porcentaje de un núcleo por proceso: el maestro de uvicorn y cada worker
+    row["cpu_pct"] = {
+        ("master" if pid == server.proc.pid else f"worker-{pid}"): round(100 * (after[pid] - before[pid]) / elapsed, 1)
+        for pid in pids if pid in before and pid in after
+    }
+    return row
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ EJECUCIÓN
+# ----------------------------------------------------------------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga HTTP contra uvicorn local")
+    parser.add_argument("--workers", default="1", help="workers de uvicorn a comparar, p. ej. 1,2,4")
+    parser.add_argument("--concurrency", default="1,8,32", help="usuarios virtuales concurrentes")
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos por nivel")
+    parser.add_argument("--warmup", type=float, default=2.0, help="segundos de calentamiento por servidor")
+    parser.add_argument("--health-ratio", type=float, default=0.1, help="fracción de peticiones a /health/")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="pausa media entre peticiones de un usuario")
+    parser.add_argument("--timeout", type=float, default=30.0, help="timeout del cliente (s)")
+    parser.add_argument("--messages", type=int, default=2000, help="tamaño del corpus")
+    parser.add_argument("--typo-rate", type=float, default=0.3, help="fracción de palabras con error conocido")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="ruta del JSON de resultados")
+    args = parser.parse_args(argv)
+    args.workers = [int(w) for w in args.workers.split(",") if w.strip()]
+    args.concurrency = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    return args
+
+
+def load_messages(size: int, seed: int, typo_rate: float) -> list[str]:
+    from app.core.catalog_store import STORE
+    from app.core.escalation import COMMON_FIXES, SARCASM_POS_MARKERS
+
+    snap = STORE.current()
+    corpus = build_corpus(snap.catalog, snap.synonyms, size, seed=seed, sarcasm_markers=SARCASM_POS_MARKERS,
+                          common_fixes=COMMON_FIXES, typo_rate=typo_rate)
+    return [m for _, m in corpus]
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    messages = load_messages(args.messages, args.seed, args.typo_rate)
+
+    env = dict(os.environ)
+
+    results = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "cpu_count": os.cpu_count(),
+        "duration_s": args.duration,
+        "health_ratio": args.health_ratio,
+        "think_ms": args.think_ms,
+        "messages": len(messages),
+        "runs": [],
+    }
+    print(f"{'workers':>7} {'conc':>5} {'ok/s':>8} {'error %':>8} {'chat p50':>9} {'chat p95':>9} "
+          f"{'chat p99':>9} {'health p99':>11}  cpu % por proceso")
+    for workers in args.workers:
+        server = Server(workers, env)
+        try:
+            server.wait_ready()
+            level = (messages, max(workers, 2), args.warmup, args.health_ratio, 0.0, args.timeout, args.seed)
+            asyncio.run(_run_level(server.base_url, *level))
+            for c in args.concurrency:
+                row = _measure(server, messages, c, args.duration, args.health_ratio,
+                               args.think_ms / 1000, args.timeout, args.seed)
+                row["workers"] = workers
+                results["runs"].append(row)
+                cpu = " ".join(f"{v:.0f}" for v in row["cpu_pct"].values())
+                print(f"{workers:>7} {c:>5} {row['throughput_per_s']:>8.1f} {100 * row['error_rate']:>8.2f} "
+                      f"{row['chat']['p50_ms']:>9.1f} {row['chat']['p95_ms']:>9.1f} "
+                      f"{row['chat']['p99_ms']:>9.1f} {row['health']['p99_ms']:>11.2f}  {cpu}", flush=True)
+        finally:
+            server.stop()
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados guardados en {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,346 @@
+"""
+Paridad de la tabla de reglas (app/core/intent_rules.py) con los
+detectores originales de intención, intención de compra, intenciones
+adicionales, logística y ciudad de entrega.
+
+Las implementaciones originales se conservan aquí, sin cambios, como
+referencia. Se comparan sobre el corpus sintético de benchmarks/corpus.py
+y sobre mensajes aleatorios armados con las propias palabras clave de la
+tabla (mayúsculas, tildes, signos y combinaciones). Termina con código 1
+si algún resultado difiere.
+
+Uso (desde AI-FoodSales/):
+    python -m benchmarks.rules_parity
+    python -m benchmarks.rules_parity --messages 50000 --seed 3
+"""
+
+import argparse, json, os, random, re, sys, tempfile, time
+
+_TMP = tempfile.mkdtemp(prefix="foodsales-rules-")
+os.environ.setdefault("CHAT_LOG_DIR", os.path.join(_TMP, "logs"))
+os.environ.setdefault("CATALOG_SNAPSHOT_DIR", os.path.join(_TMP, "snapshots"))
+
+from benchmarks.corpus import CITIES, COMPLAINTS, GREETINGS, LOGISTICS, SARCASM, build_corpus
+
+
+# ----------------------------------------------------------------------
+# 1️⃣ DETECTORES ORIGINALES (referencia)
+# ----------------------------------------------------------------------
+def legacy_detect_intent(text: str) -> str:
+    text = text.lower()
+    if any(k in text for k in ['precio', 'cuánto', 'cotiza', 'total', 'cuenta']):
+        return 'quote'
+    if any(k in text for k in ['tiempo', 'entrega', 'mínimo', 'pago', 'invima', 'certificado']):
+        return 'faq'
+    return 'other'
+
+
+# -------------------------------------------------------------
+# INTENCIÓN DE COMPRA
+# -------------------------------------------------------------
+def legacy_detect_purchase_intent(text: str) -> str:
+    text = text.lower()
+
+    high_intent = [
+        "envíame", "hazme la cuenta", "quiero pedir", "cotízame",
+        "necesito para", "urgente", "mándame la cotización",
+        "cómo te pago", "cuánto me sale", "ya tengo pedido"
+    ]
+
+    medium_intent = [
+        "me interesa", "cuánto vale", "qué precio tiene",
+        "pueden enviar", "cuánto demora", "quiero saber si tienen",
+        "podrían cotizarme", "estoy mirando precios"
+    ]
+
+    if any(p in text for p in high_intent):
+        return "high"
+    elif any(p in text for p in medium_intent):
+        intent = "medium"
+    else:
+        intent = "low"
+
+    # Detección de pedidos grandes
+    if re.search(r'(\b\d+\s*(unidades?|cajas?|bultos?|litros?|kilos?|sacos?)\b|\bpedido grande\b|\ben cantidad\b)', text):
+        return "high"
+
+    return intent
+
+
+# -------------------------------------------------------------
+# INTENCIÓN LOGÍSTICA
+# -------------------------------------------------------------
+def legacy_detect_logistics_intent(text: str) -> tuple[bool, dict]:
+    """
+    Detecta si el mensaje se refiere a temas logísticos (entrega, cobertura, etc.).
+    Retorna (True/False, {"type": str, "city": Optional[str]}).
+    """
+    if not text:
+        return False, {}
+
+    import unicodedata
+
+    text = text.lower().strip()
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = text.replace("¿", "").replace("?", "").replace("¡", "").replace("!", "")
+
+    logistics_keywords = [
+        r"\b(entrega|entregan|entregar|entregado|entregas)\b",
+        r"\b(envio|envian|enviar|enviarlo|envios)\b",
+        r"\b(despacho|despachos|despachan|despachar)\b",
+        r"\b(reparto|repartos|domicilio|domicilios|mensajeria|repartidor)\b",
+        r"\b(cobertura|cubren|alcance)\b",
+        r"\b(horario|hora|horas|mañana|tarde|noche|noches|fines?\s+de\s+semana|sabados?|domingos?)\b"
+    ]
+
+    if not any(re.search(pat, text) for pat in logistics_keywords):
+        return False, {}
+
+    # Tipificación logística
+    if re.search(r"\b(fines?\s+de\s+semana|sabados?|domingos?)\b", text):
+        subtype = "weekend"
+    elif re.search(r"\b(horario|hora|horas|mañana|tarde|noche|noches)\b", text):
+        subtype = "time_window"
+    elif re.search(r"\b(cobertura|cubren|alcance|otras?\s+ciudades|fuera|nacional|envian\s+a)\b", text):
+        subtype = "coverage"
+    elif re.search(r"\b(cuanto\s+tardan?|tiempos?\s+de\s+entrega|plazo)\b", text):
+        subtype = "delivery_time"
+    else:
+        subtype = "generic"
+
+    city_match = re.search(
+        r"\b(en|a)\s+(bogota|medellin|cali|barranquilla|cartagena|bucaramanga|pereira|manizales|cucuta)\b",
+        text,
+    )
+    city = city_match.group(2).title() if city_match else None
+    if city and subtype == "generic":
+        subtype = "city_delivery"
+
+    return True, {"type": subtype, "city": city}
+
+
+
+def legacy_detect_additional_intents(text: str) -> dict:
+    """
+    Detecta intenciones adicionales: FAQ, discount_info, should_escalate.
+    Prioridad: should_escalate > logistics > faq > discount.
+    """
+    text = text.lower()
+    intents = {"faq": False, "discount_info": False, "should_escalate": False}
+
+    # --- FAQ detection ---
+    faq_keywords = [
+        "mínimo", "minimos", "compra mínima", "pedido mínimo",
+        "forma de pago", "formas de pago", "pago", "pagos",
+        "contraentrega", "efectivo", "tarjeta", "crédito", "débito",
+        "devolución", "devoluciones", "cambio", "cambios",
+        "reembolso", "reembolsos", "tiempo de entrega", "entregan",
+        "cuánto se demora la entrega", "disponibilidad", "stock", "existencias",
+        "dañado", "mal olor", "defectuoso", "combinar", "mezclar", "mismo pedido",
+        "certificado", "invima", "iva"
+    ]
+    if any(k in text for k in faq_keywords):
+        intents["faq"] = True
+
+    # --- Discounts detection ---
+    discount_keywords = [
+        "promocion", "promoción", "oferta", "descuento", "descuentos",
+        "rebaja", "promo", "en oferta"
+    ]
+    if any(k in text for k in discount_keywords):
+        intents["discount_info"] = True
+
+    # --- Escalation detection ---
+    escalate_keywords = [
+        "reclamo", "problema", "queja", "error", "equivocado",
+        "confusión", "pedido incorrecto", "producto equivocado",
+        "pedido incompleto", "demora", "retraso", "no ha llegado", "todavía no llega",
+        "repartidor", "cobrado", "cobro incorrecto", "precio distinto",
+        "olvidó", "olvido", "esperando", "falta", "dañado", "cambio", "incompleto otra vez"
+    ]
+
+    if any(k in text for k in escalate_keywords):
+        intents["should_escalate"] = True
+
+    # --- Priority rules ---
+    if intents["should_escalate"]:
+        intents["faq"] = False
+        intents["discount_info"] = False
+
+    # --- Safe overrides ---
+    # Frases informativas que nunca deben escalar
+    safe_keywords = ["invima", "certificado invima", "iva", "descuento", "promoción", "oferta", "certificado"]
+    if any(sk in text for sk in safe_keywords):
+        intents["should_escalate"] = False
+        intents["faq"] = True
+
+    return intents
+
+
+def legacy_delivery_city(message: str) -> str:
+    # Detecta ciudad tras "en", "a" o "para", incluso con frases intermedias
+    match = re.search(
+        r"(?:en|a|para)\s+(?:la\s+entrega\s+a\s+)?([A-ZÁÉÍÓÚÑa-záéíóúñ]{3,}(?:\s+[A-ZÁÉÍÓÚÑa-záéíóúñ]+)*)",
+        message,
+        re.UNICODE | re.IGNORECASE
+    )
+
+    ciudad = ""
+    if match:
+        posible = match.group(1).strip()
+        # Evita falsos positivos como "entrega", "pedido", etc.
+        if not re.search(r"\b(entrega|pedido|compra|envío|orden|la|el|los|las|para|en|a)\b", posible, re.IGNORECASE):
+            ciudad = " ".join([p.capitalize() for p in posible.split()])
+
+    # Si no detectó ciudad pero la frase tiene 'para' seguido de un nombre, capturarlo igualmente
+    if not ciudad:
+        match_alt = re.search(
+            r"para\s+([A-ZÁÉÍÓÚÑa-záéíóúñ]{3,}(?:\s+[A-ZÁÉÍÓÚÑa-záéíóúñ]+)*)",
+            message,
+            re.UNICODE | re.IGNORECASE
+        )
+        if match_alt:
+            posible = match_alt.group(1).strip()
+            if not re.search(r"\b(entrega|pedido|compra|envío|orden|la|el|los|las|para|en|a)\b", posible, re.IGNORECASE):
+                ciudad = " ".join([p.capitalize() for p in posible.split()])
+    return ciudad
+
+
+# ----------------------------------------------------------------------
+# 2️⃣ MENSAJES
+# ----------------------------------------------------------------------
+# Ejemplos concretos para las reglas regex (las de subcadena se toman tal cual)
+REGEX_SAMPLES = [
+    "entrega", "entregan", "entregas", "envio", "envios", "envian a", "despacho", "despachan",
+    "reparto", "domicilio", "mensajeria", "repartidor", "cobertura", "cubren", "alcance",
+    "horario", "hora", "horas", "mañana", "manana", "tarde", "noche", "fin de semana",
+    "fines  de semana", "sabado", "sábados", "domingo", "otras ciudades", "otra ciudad", "fuera",
+    "nacional", "cuanto tarda", "cuánto tardan", "tiempo de entrega", "tiempos de entrega", "plazo",
+    "20 cajas", "3unidades", "12 litros", "5 kilos", "2 sacos", "pedido grande", "en cantidad",
+    "la entrega a", "para", "en", "a", "ahora", "entregado", "enviarlo",
+]
+FILLER = ["hola", "quiero", "el", "la", "de", "por favor", "mi", "pedido", "gracias", "ya", "que",
+          "productos", "precio", "sí", "no", "mañana", "cuándo", "llega", "pasto", "villavicencio"]
+
+
+def _keywords(spec: dict) -> list[str]:
+    words = []
+    for section in spec.values():
+        for rule in section.get("rules", {}).values():
+            words.extend(rule.get("substring", ()))
+    return words + REGEX_SAMPLES
+
+
+def _mutate(rng: random.Random, word: str) -> str:
+    choice = rng.random()
+    if choice < 0.15:
+        return word.upper()
+    if choice < 0.3:
+        return word.capitalize()
+    if choice < 0.4:
+        return word.translate(str.maketrans("áéíóú", "aeiou"))
+    if choice < 0.5:
+        return word.translate(str.maketrans("aeiou", "áéíóú"))
+    return word
+
+
+def random_messages(spec: dict, size: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    vocab = _keywords(spec)
+    cities = CITIES + ["Bogota", "MEDELLIN", "Cúcuta"]
+    messages = []
+    for _ in range(size):
+        parts = []
+        for _ in range(rng.randint(1, 6)):
+            r = rng.random()
+            if r < 0.5:
+                parts.append(_mutate(rng, rng.choice(vocab)))
+            elif r < 0.75:
+                parts.append(rng.choice(FILLER))
+            else:
+                parts.append(rng.choice(["en", "a", "para"]) + " " + _mutate(rng, rng.choice(cities)))
+        sep = rng.choice([" ", " ", ", ", "", "? ", "¿"])
+        msg = sep.join(parts)
+        if rng.random() < 0.3:
+            msg = f"¿{msg}?"
+        messages.append(msg)
+    return messages
+
+
+# ----------------------------------------------------------------------
+# 3️⃣ COMPARACIÓN
+# ----------------------------------------------------------------------
+def parity_messages(random_size: int, seed: int, corpus_size: int = 2000) -> list[str]:
+    """Corpus sintético, mensajes fijos del canal y `random_size` mensajes aleatorios."""
+    from app.core.catalog_store import STORE
+    from app.core.intent_rules import RULES_FILE
+
+    with open(RULES_FILE, encoding="utf-8-sig") as f:
+        spec = json.load(f)
+
+    snap = STORE.current()
+    messages = [m for _, m in build_corpus(snap.catalog, snap.synonyms, corpus_size, seed=seed)]
+    messages += GREETINGS + COMPLAINTS + SARCASM + [t.format(city=c) for t in LOGISTICS for c in CITIES]
+    messages += random_messages(spec, random_size, seed)
+    messages += ["", "   ", "?", "¿¡!?"]
+    return messages
+
+
+def parity_checks() -> list[tuple[str, object, object]]:
+    """(nombre, detector original, regla de la tabla) de cada detector."""
+    from app.core.intent_rules import RULES
+
+    return [
+        ("detect_intent", legacy_detect_intent, RULES.intent),
+        ("detect_purchase_intent", legacy_detect_purchase_intent, RULES.purchase_intent),
+        ("detect_additional_intents", legacy_detect_additional_intents, RULES.additional_intents),
+        ("detect_logistics_intent", legacy_detect_logistics_intent, RULES.logistics),
+        ("delivery_city", legacy_delivery_city, RULES.delivery_city),
+    ]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Paridad de la tabla de reglas con los detectores originales")
+    parser.add_argument("--messages", type=int, default=20000, help="mensajes aleatorios a comparar")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--show", type=int, default=10, help="diferencias a mostrar")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    from app.core.intent_rules import RULES
+
+    messages = parity_messages(args.messages, args.seed)
+    checks = parity_checks()
+    failures = 0
+    for name, legacy, new in checks:
+        diffs = [(m, legacy(m), new(m)) for m in messages if legacy(m) != new(m)]
+        failures += len(diffs)
+        print(f"{name:<28} {len(messages):>7} mensajes  {len(diffs):>5} diferencias")
+        for m, old, cur in diffs[:args.show]:
+            print(f"    {m!r}\n      original: {old}\n      tabla:    {cur}")
+
+    # Costo: los cinco detectores originales frente a una pasada de RULES.scan
+    start = time.perf_counter()
+    for m in messages:
+        for _, legacy, _ in checks[:4]:
+            legacy(m)
+    legacy_us = (time.perf_counter() - start) / len(messages) * 1e6
+    start = time.perf_counter()
+    for m in messages:
+        RULES.scan(m)
+    scan_us = (time.perf_counter() - start) / len(messages) * 1e6
+    print(f"\nµs por mensaje: originales {legacy_us:.1f}  |  RULES.scan {scan_us:.1f}")
+
+    if failures:
+        print(f"\n❌ {failures} diferencias")
+        return 1
+    print("\n✅ Paridad completa")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,17 @@
+"""
+Configuración común de las pruebas de AI-FoodSales.
+
+Uso (desde AI-FoodSales/):
+    python -m pytest -q
+"""
+
+import os, sys, tempfile
+
+# El entorno se fija antes de importar la app: logs y snapshots en un
+# directorio temporal, sin trazas informativas en la salida
+_TMP = tempfile.mkdtemp(prefix="foodsales-tests-")
+os.environ.setdefault("CHAT_LOG_DIR", os.path.join(_TMP, "logs"))
+os.environ.setdefault("CATALOG_SNAPSHOT_DIR", os.path.join(_TMP, "snapshots"))
+os.environ.setdefault("TRACE_LEVEL", "error")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
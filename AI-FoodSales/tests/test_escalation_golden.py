@@ -0,0 +1,78 @@
+"""
+Regresión de app/core/escalation.py contra resultados fijos.
+
+tests/golden/escalation_corpus.json es un corpus cerrado de mensajes
+(saludos, reclamos, sarcasmo, errores de escritura, pedidos y logística);
+tests/golden/escalation_golden.json guarda, por mensaje, la decisión, los
+puntajes y las cues que producía should_escalate al fijarse el corpus.
+Cualquier cambio en léxicos, pesos o reglas que mueva un resultado hace
+fallar la prueba.
+
+Las cues se comparan sin orden: varias salen de recorrer conjuntos, así que
+su orden depende de PYTHONHASHSEED (igual que en la versión original).
+
+Para regenerar el archivo tras un cambio de comportamiento intencional
+(desde AI-FoodSales/):
+    python -m tests.test_escalation_golden --update
+"""
+
+import json, os, sys
+
+import pytest
+
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), "golden")
+CORPUS_FILE = os.path.join(GOLDEN_DIR, "escalation_corpus.json")
+GOLDEN_FILE = os.path.join(GOLDEN_DIR, "escalation_golden.json")
+
+
+def _load(path: str):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def snapshot(message: str) -> dict:
+    """Decisión, puntajes y cues (ordenadas) de un mensaje."""
+    from app.core.escalation import should_escalate
+
+    result = should_escalate(message)
+    summary = result["summary"]
+    return {
+        "message": message,
+        "should_escalate": result["should_escalate"],
+        "scores": summary["scores"],
+        "cues": {kind: sorted(cues) for kind, cues in sorted(summary["cues"].items())},
+    }
+
+
+GOLDEN = _load(GOLDEN_FILE) if os.path.exists(GOLDEN_FILE) else []
+
+
+def test_golden_covers_corpus():
+    assert [case["message"] for case in GOLDEN] == _load(CORPUS_FILE)
+
+
+@pytest.mark.parametrize("expected", GOLDEN, ids=lambda case: case["message"][:40])
+def test_escalation_matches_golden(expected):
+    assert snapshot(expected["message"]) == expected
+
+
+def test_empty_message_is_not_escalated():
+    from app.core.escalation import should_escalate
+
+    assert should_escalate("") == {"agent_response": "", "should_escalate": False, "summary": {}}
+
+
+def update() -> int:
+    cases = [snapshot(m) for m in _load(CORPUS_FILE)]
+    with open(GOLDEN_FILE, "w", encoding="utf-8") as f:
+        json.dump(cases, f, ensure_ascii=False, indent=1)
+        f.write("\n")
+    print(f"{len(cases)} casos escritos en {GOLDEN_FILE}")
+    return 0
+
+
+if __name__ == "__main__":
+    if "--update" not in sys.argv[1:]:
+        sys.exit("Uso: python -m tests.test_escalation_golden --update")
+    import tests.conftest  # noqa: F401  (mismo entorno que pytest)
+    sys.exit(update())
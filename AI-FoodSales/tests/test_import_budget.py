@@ -0,0 +1,33 @@
+"""
+Arranque en frío de app.main (ver benchmarks/import_budget.py): sin módulos
+prohibidos y, si se pide, con los módulos app.* dentro de IMPORT_BUDGET_MS.
+
+Los módulos prohibidos se verifican siempre. El tiempo depende de la
+máquina y de la carga, así que solo se verifica cuando IMPORT_BUDGET_MS
+está definido (fijado para la máquina de CI):
+    IMPORT_BUDGET_MS=90 python -m pytest -q tests/test_import_budget.py
+"""
+
+import os
+
+import pytest
+
+from benchmarks import import_budget
+
+
+@pytest.fixture(scope="module")
+def modules():
+    best, _ = import_budget.measure(runs=3)
+    return best
+
+
+def test_no_forbidden_modules_on_import(modules):
+    assert import_budget.forbidden_modules(modules) == []
+
+
+@pytest.mark.skipif("IMPORT_BUDGET_MS" not in os.environ,
+                    reason="presupuesto de tiempo opcional: definir IMPORT_BUDGET_MS")
+def test_app_modules_within_budget(modules):
+    app_ms = import_budget.app_own_ms(modules)
+    assert app_ms <= import_budget.DEFAULT_BUDGET_MS, (
+        f"app.* tarda {app_ms:.1f} ms (presupuesto {import_budget.DEFAULT_BUDGET_MS:.1f} ms)")
@@ -0,0 +1,21 @@
+"""
+La tabla de reglas (app/core/intent_rules.py) debe dar exactamente lo mismo
+que los detectores originales; ver benchmarks/rules_parity.py.
+"""
+
+import pytest
+
+from benchmarks import rules_parity
+
+CHECKS = rules_parity.parity_checks()
+
+
+@pytest.fixture(scope="module")
+def messages():
+    return rules_parity.parity_messages(random_size=5000, seed=7, corpus_size=500)
+
+
+@pytest.mark.parametrize("name, legacy, rule", CHECKS, ids=[name for name, *_ in CHECKS])
+def test_rules_match_legacy_detectors(messages, name, legacy, rule):
+    diffs = [(m, legacy(m), rule(m)) for m in messages if legacy(m) != rule(m)]
+    assert not diffs, f"{name}: {len(diffs)} diferencias, p. ej. {diffs[:3]}"